@@ -0,0 +1,495 @@
+import argparse
+import gzip
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块, 不统计常驻内存
+    resource = None
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+
+import mock_server
+from kivy.clock import Clock
+from my_phone_app_kivy import (
+    ALARM_RULES, AlarmEngine, ApiClient, CsvExporter, DrillingApp, HistoryDataset, LiveStream,
+    PARAM_CODES, REALTIME_MAX_RATE, fetch_drilling_data, iter_column_chunks, iter_ndjson_chunks
+)
+
+# 性能基准测试 - 使用模拟数据和本地模拟服务器, 不需要连接树莓派
+# 运行: python benchmark.py [--rows 1000 10000 100000] [--only wire_format screen startup live export alarms]
+#                           [--output result.json] [--compare last.json]
+# 界面部分不打开窗口, 只测量构建绘图指令 (顶点计算等) 的耗时, 不包括GPU上传和渲染
+
+DEFAULT_ROWS = (1000, 10000, 100000)
+LIVE_SUBSCRIBERS = (1, 10, 50)
+LIVE_SECONDS = 3.0
+ALARM_WELLS = (1, 5, 20)
+ALARM_SECONDS = 600
+START_TS = 1700000000
+GRAPH_SIZE = (720, 600)
+
+
+def best_time(func, repeat=3):
+    # 多次运行取最短耗时, 减少偶然波动
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def traced_peak(func):
+    # tracemalloc 会明显拖慢运行, 内存峰值单独运行一次统计
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def peak_rss_kb():
+    # 进程启动以来的最大常驻内存 (Linux 下单位为 KB)
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(benchmark, name, rows, func, repeat=3):
+    elapsed, _ = best_time(func, repeat)
+    return {
+        'benchmark': benchmark,
+        'name': name,
+        'rows': rows,
+        'seconds': elapsed,
+        'tracemalloc_peak': traced_peak(func),
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+
+def consume(chunks):
+    # 把逐批产出的数据集合并为一个
+    chunks = iter(chunks)
+    next(chunks)
+    dataset = None
+    for chunk in chunks:
+        if dataset is None:
+            dataset = chunk
+        else:
+            dataset.merge(chunk)
+    return dataset
+
+
+def make_rows(count):
+    return mock_server.generate_rows(1, START_TS, START_TS + count - 1)
+
+
+def bench_wire_format(row_counts):
+    # 比较各传输格式的字节数和解码耗时
+    results = []
+    for count in row_counts:
+        rows = make_rows(count)
+        meta = {'status': 'success', 'well_name': '模拟1井'}
+
+        json_body = json.dumps(dict(meta, data=rows), ensure_ascii=False).encode('utf-8')
+        ndjson_body = b''.join(
+            json.dumps(item, ensure_ascii=False).encode('utf-8') + b'\n'
+            for item in [meta] + rows
+        )
+        columns_raw = b''.join(mock_server.encode_column_stream(meta, rows, compress=False))
+        columns_zlib = b''.join(mock_server.encode_column_stream(meta, rows, compress=True))
+
+        formats = {
+            'json': (len(json_body), len(gzip.compress(json_body)),
+                     lambda: HistoryDataset.from_result(json.loads(json_body))),
+            'ndjson': (len(ndjson_body), len(gzip.compress(ndjson_body)),
+                       lambda: consume(iter_ndjson_chunks([ndjson_body]))),
+            'columns': (len(columns_raw), len(columns_raw),
+                        lambda: consume(iter_column_chunks([columns_raw]))),
+            'columns_zlib': (len(columns_zlib), len(columns_zlib),
+                             lambda: consume(iter_column_chunks([columns_zlib]))),
+        }
+        for name, (body_bytes, wire_bytes, decode) in formats.items():
+            elapsed, dataset = best_time(decode)
+            assert len(dataset) == count
+            results.append({
+                'benchmark': 'wire_format',
+                'format': name,
+                'rows': count,
+                'bytes': body_bytes,
+                'wire_bytes': wire_bytes,
+                'decode_seconds': elapsed,
+            })
+    return results
+
+
+def bench_json_decode(row_counts):
+    # JSON 响应的解码分为两步: 解析文本, 构建列式数据集
+    results = []
+    for count in row_counts:
+        rows = make_rows(count)
+        body = json.dumps({'status': 'success', 'well_name': '模拟1井', 'data': rows},
+                          ensure_ascii=False).encode('utf-8')
+        parsed = json.loads(body)
+        results.append(measure('json_decode', 'json_loads', count, lambda: json.loads(body)))
+        results.append(measure('json_decode', 'build_dataset', count,
+                               lambda: HistoryDataset.from_result(parsed)))
+    return results
+
+
+def bench_fetch(row_counts):
+    # 通过本地模拟服务器完整请求一次: 网络传输 + 解码, 按服务器支持的格式分别测试
+    # 耗时包括模拟服务器编码数据的时间, 生成的模拟数据则预先缓存
+    variants = {
+        'columns': {},
+        'ndjson': {'supports_columns': False},
+        'json': {'supports_columns': False, 'supports_stream': False},
+    }
+    results = []
+    for name, options in variants.items():
+        server = mock_server.MockServer(cache_rows=True, **options)
+        server.start()
+        api = ApiClient(server.url)
+        try:
+            for count in row_counts:
+                data = {
+                    'well_id': 1,
+                    'start_time': datetime.fromtimestamp(START_TS).strftime('%Y-%m-%d %H:%M:%S'),
+                    'end_time': datetime.fromtimestamp(START_TS + count - 1).strftime('%Y-%m-%d %H:%M:%S'),
+                }
+
+                def fetch():
+                    meta, dataset = fetch_drilling_data(api, data)
+                    assert len(dataset) == count
+                    return dataset
+
+                fetch()  # 预热: 服务器生成并缓存模拟数据
+                api.stats.clear()
+                result = measure('fetch', name, count, fetch)
+                stats = api.get_stats()['/api/drilling_data']
+                result['wire_bytes'] = stats['wire_bytes'] // stats['count']
+                results.append(result)
+        finally:
+            api.close()
+            server.stop()
+    return results
+
+
+class BenchmarkApp(DrillingApp):
+    # 本地存储放在临时目录, 不影响真实的应用数据
+    def __init__(self, data_dir, **kwargs):
+        super().__init__(**kwargs)
+        self.bench_data_dir = data_dir
+
+    @property
+    def user_data_dir(self):
+        return self.bench_data_dir
+
+
+def bench_screen(row_counts):
+    # 历史数据界面: 显示数据、切换参数和曲线重绘分别计时
+    server = mock_server.MockServer()
+    server.start()
+    results = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        app = BenchmarkApp(data_dir)
+        app.build()
+        app.api.close()
+        app.api = ApiClient(server.url)
+        screen = app.sm.get_screen('history')
+        graph = screen.graph
+        graph.size = GRAPH_SIZE
+        try:
+            for count in row_counts:
+                dataset = HistoryDataset.from_rows(make_rows(count), '模拟1井')
+
+                def display_data():
+                    dataset.x_cache = None
+                    screen.dataset = dataset
+                    screen.display_data()
+
+                def draw_line_cold():
+                    # 极值金字塔需要重新构建
+                    for series in graph.series.values():
+                        series.pyramid = None
+                    graph.view_key = None
+                    graph.draw_line()
+
+                def draw_line():
+                    graph.view_key = None
+                    graph.draw_line()
+
+                def redraw():
+                    graph.redraw()
+                    graph.flush_redraw()
+
+                def toggle_parameter():
+                    screen.toggle_parameter('A03', False)
+                    graph.flush_redraw()
+                    screen.toggle_parameter('A03', True)
+                    graph.flush_redraw()
+
+                def pan_frame():
+                    graph.pan_by(-5 if graph.view_end >= 100 else 5)
+                    graph.flush_redraw()
+
+                results.append(measure('screen', 'display_data', count, display_data))
+                graph.flush_redraw()
+                results.append(measure('screen', 'select_parameter', count,
+                                       lambda: screen.select_parameter(PARAM_CODES[2])))
+                results.append(measure('screen', 'toggle_parameter', count, toggle_parameter))
+                results.append(measure('screen', 'draw_line_cold', count, draw_line_cold))
+                results.append(measure('screen', 'draw_line', count, draw_line))
+                results.append(measure('screen', 'redraw', count, redraw))
+                graph.set_view(45, 55)
+                graph.flush_redraw()
+                results.append(measure('screen', 'pan_frame', count, pan_frame, repeat=20))
+                graph.reset_view()
+        finally:
+            app.on_stop()
+            server.stop()
+    return results
+
+
+def bench_live(row_counts):
+    # 实时推送: 多个客户端同时订阅模拟服务器的10Hz数据, 统计每个客户端的接收速率和
+    # 从样本产生到交给界面的延迟 (与数据行数无关)
+    results = []
+    for subscribers in LIVE_SUBSCRIBERS:
+        server = mock_server.MockServer()
+        server.start()
+        latencies = []
+        counts = [0] * subscribers
+        streams = []
+
+        def on_samples(dataset, i):
+            now = time.time()
+            counts[i] += len(dataset)
+            latencies.extend(now - ts for ts in dataset.timestamps)
+
+        try:
+            for i in range(subscribers):
+                stream = LiveStream(ApiClient(server.url), 1, lambda dataset, i=i: on_samples(dataset, i))
+                stream.start()
+                streams.append(stream)
+            # 等待全部连接建立后再开始计数
+            deadline = time.time() + 5
+            while any(stream.state != 'connected' for stream in streams) and time.time() < deadline:
+                time.sleep(0.01)
+            Clock.tick()
+            latencies.clear()
+            counts[:] = [0] * subscribers
+            start = time.perf_counter()
+            while time.perf_counter() - start < LIVE_SECONDS:
+                time.sleep(0.005)
+                Clock.tick()
+            elapsed = time.perf_counter() - start
+        finally:
+            for stream in streams:
+                stream.stop()
+                stream.api.close()
+            server.stop()
+        latencies.sort()
+        results.append({
+            'benchmark': 'live',
+            'name': f"subscribers_{subscribers}",
+            'rows': 0,
+            'seconds': latencies[len(latencies) // 2] if latencies else None,
+            'p99_seconds': latencies[int(len(latencies) * 0.99)] if latencies else None,
+            'samples_per_second': sum(counts) / elapsed / subscribers,
+        })
+    return results
+
+
+def bench_export(row_counts):
+    # 导出CSV的吞吐量 (行/秒): 从内存中的数据集写出 (普通/gzip), 以及从模拟服务器边下载边写出
+    # tracemalloc 峰值应与行数无关, 只取决于每批的行数
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'export.csv')
+        server = mock_server.MockServer(cache_rows=True)
+        server.start()
+        api = ApiClient(server.url)
+        try:
+            for count in row_counts:
+                dataset = consume(iter_column_chunks(mock_server.encode_column_stream({}, make_rows(count))))
+                data = {
+                    'well_id': 1,
+                    'start_time': datetime.fromtimestamp(START_TS).strftime('%Y-%m-%d %H:%M:%S'),
+                    'end_time': datetime.fromtimestamp(START_TS + count - 1).strftime('%Y-%m-%d %H:%M:%S'),
+                }
+
+                def export_local(compress):
+                    exporter = CsvExporter(path, compress)
+                    exporter.write(dataset)
+                    exporter.finish()
+                    assert exporter.rows == count
+
+                def export_stream():
+                    exporter = CsvExporter(path)
+                    _, tail = fetch_drilling_data(api, data, lambda meta, chunk: exporter.write(chunk))
+                    exporter.write(tail)
+                    exporter.finish()
+                    assert exporter.rows == count
+
+                fetch_drilling_data(api, data)  # 预热: 服务器生成并缓存模拟数据
+                variants = {
+                    'local_csv': lambda: export_local(False),
+                    'local_gzip': lambda: export_local(True),
+                    'stream_csv': export_stream,
+                }
+                for name, func in variants.items():
+                    result = measure('export', name, count, func)
+                    result['rows_per_second'] = count / result['seconds']
+                    result['file_bytes'] = os.path.getsize(path)
+                    results.append(result)
+        finally:
+            api.close()
+            server.stop()
+    return results
+
+
+def bench_alarms(row_counts):
+    # 报警引擎: 多口井各5个参数以10Hz连续输入 ALARM_SECONDS 秒 (与数据行数无关), 每秒一批
+    # 统计每秒能处理的样本数 (井数 x 参数 x 采样), 内存峰值应只取决于井数, 与时长无关
+    batches = []
+    for second in range(ALARM_SECONDS):
+        rows = [mock_server.sample_row(1, START_TS + second + k / REALTIME_MAX_RATE)
+                for k in range(REALTIME_MAX_RATE)]
+        batches.append(HistoryDataset.from_rows(rows))
+    results = []
+    for wells in ALARM_WELLS:
+        def run():
+            engine = AlarmEngine(ALARM_RULES)
+            for batch in batches:
+                for well_id in range(wells):
+                    engine.feed(well_id, batch)
+
+        result = measure('alarms', f"wells_{wells}", 0, run)
+        samples = wells * len(PARAM_CODES) * REALTIME_MAX_RATE * ALARM_SECONDS
+        result['samples_per_second'] = samples / result['seconds']
+        results.append(result)
+    return results
+
+
+# 在新进程中启动应用, 登录界面第一帧显示后输出各阶段耗时并退出
+STARTUP_SCRIPT = """
+import json
+from kivy.clock import Clock
+from my_phone_app_kivy import DrillingApp
+
+app = DrillingApp()
+
+def check(dt):
+    if 'first_frame' in app.startup_times:
+        print('STARTUP ' + json.dumps(app.startup_times))
+        app.stop()
+
+Clock.schedule_interval(check, 0)
+app.run()
+"""
+
+
+def bench_startup(row_counts, repeat=3):
+    # 冷启动: 导入模块、构建界面和显示第一帧的耗时 (与数据行数无关), 多次启动取最短
+    best = {}
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', STARTUP_SCRIPT],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout
+        line = next(line for line in output.splitlines() if line.startswith('STARTUP '))
+        for name, seconds in json.loads(line[len('STARTUP '):]).items():
+            best[name] = min(seconds, best.get(name, seconds))
+    return [{'benchmark': 'startup', 'name': name, 'rows': 0, 'seconds': seconds}
+            for name, seconds in best.items()]
+
+
+BENCHMARKS = {
+    'wire_format': bench_wire_format,
+    'json_decode': bench_json_decode,
+    'fetch': bench_fetch,
+    'screen': bench_screen,
+    'startup': bench_startup,
+    'live': bench_live,
+    'export': bench_export,
+    'alarms': bench_alarms,
+}
+
+
+def result_key(item):
+    return (item['benchmark'], item.get('name') or item.get('format'), item['rows'])
+
+
+def result_seconds(item):
+    return item.get('seconds', item.get('decode_seconds'))
+
+
+def print_results(results):
+    for item in results:
+        fields = ', '.join(f"{key}={value:.4f}" if isinstance(value, float) else f"{key}={value}"
+                           for key, value in item.items() if key != 'benchmark')
+        print(f"[{item['benchmark']}] {fields}")
+
+
+def print_comparison(results, previous):
+    # 与上一次的结果比较耗时, 变慢超过20%的标记出来
+    baseline = {result_key(item): result_seconds(item) for item in previous}
+    for item in results:
+        key = result_key(item)
+        before = baseline.get(key)
+        after = result_seconds(item)
+        if not before or after is None:
+            continue
+        ratio = after / before
+        flag = '  <-- 变慢' if ratio > 1.2 else ''
+        print(f"[{key[0]}] {key[1]} rows={key[2]}: {before:.4f}s -> {after:.4f}s ({ratio:.2f}x){flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='钻井数据性能基准测试')
+    parser.add_argument('--rows', type=int, nargs='+', default=list(DEFAULT_ROWS))
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='只运行指定的测试')
+    parser.add_argument('--output', help='结果保存为JSON文件')
+    parser.add_argument('--compare', help='与之前保存的JSON结果比较')
+    args = parser.parse_args()
+
+    results = []
+    for name, bench in BENCHMARKS.items():
+        if args.only and name not in args.only:
+            continue
+        results.extend(bench(args.rows))
+    print_results(results)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+        print_comparison(results, previous['results'] if isinstance(previous, dict) else previous)
+    if args.output:
+        report = {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'rows': args.rows,
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -14,6 +14,9 @@ source.dir = .
 # (list) Source files to include (let empty to include all the files)
 source.include_exts = py,png,jpg,kv,atlas,ttf,json
 
+# (list) Source files to exclude (本地模拟服务器和基准测试仅用于开发调试)
+source.exclude_patterns = mock_server.py,benchmark.py,test_connections.py,test_history.py
+
 # (str) Application versioning (method 1)
 version = 1.0
 
@@ -26,7 +29,9 @@ requirements =
     chardet,
     idna,
     urllib3,
-    openssl
+    plyer,
+    openssl,
+    sqlite3
 
 # (str) Presplash of the application
 presplash.filename = %(source.dir)s/data/presplash.png
@@ -0,0 +1,497 @@
+import gzip
+import hashlib
+import json
+import math
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# 本地模拟服务器 - 在没有树莓派的情况下代替 SERVER_URL 进行开发和测试
+# 运行: python mock_server.py [端口]
+
+WELLS = [
+    {'ID': 1, 'WELL': '模拟1井'},
+    {'ID': 2, 'WELL': '模拟2井'},
+    {'ID': 3, 'WELL': '模拟3井'},
+]
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+NDJSON_TYPE = 'application/x-ndjson'
+STREAM_BATCH_ROWS = 500
+
+# 列式二进制格式的参考编码实现, 格式说明见客户端 COLUMNS_TYPE
+COLUMNS_TYPE = 'application/x-drilling-columns'
+COLUMNS_MAGIC = b'DRC1'
+COLUMNS_FRAME = struct.Struct('<IBI')
+COLUMNS_FLAG_ZLIB = 1
+COLUMNS_BATCH_ROWS = 2000
+PARAM_CODES = ('A01', 'A02', 'A03', 'A04', 'A05')
+
+# 样本 index 以0.1秒为单位: 历史数据每秒一条, 实时推送每秒10条, 两者的 index 可以直接比较
+INDEX_RATE = 10
+
+# 实时推送 (Server-Sent Events): 按 live_rate 生成样本, 没有数据时定期发送心跳注释
+LIVE_STREAM_TYPE = 'text/event-stream'
+LIVE_HEARTBEAT = 5.0
+
+# 聚合查询: 请求中带 buckets (桶数) 时按时间桶返回各参数的最小/最大/平均值 (JSON列式)
+BUCKET_STEPS = (1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200, 21600, 43200, 86400)
+BUCKET_CACHE_SIZE = 200000
+
+
+def noise(index, well_id, k):
+    # 由 index 散列得到的确定扰动 (-1, 1); 比每个时刻创建一个 random.Random 快得多, 聚合查询需要生成大量样本
+    h = (index * 2654435761 + well_id * 40503 + k * 2246822519) & 0xffffffff
+    h = ((h ^ (h >> 15)) * 2246822519) & 0xffffffff
+    h ^= h >> 13
+    return h / 2147483648.0 - 1
+
+
+def sample_values(well_id, ts):
+    # 根据井号和时间戳生成确定的模拟数据, 同一时刻多次查询结果一致
+    index = int(round(ts * INDEX_RATE))
+    phase = ts / 300.0 + well_id
+    return index, (
+        round(80 + 10 * math.sin(phase) + noise(index, well_id, 1), 2),
+        round(15 + 3 * math.sin(phase * 1.7) + 0.3 * noise(index, well_id, 2), 2),
+        round(8 + 2 * math.cos(phase * 0.9) + 0.2 * noise(index, well_id, 3), 2),
+        round(30 + 5 * math.sin(phase * 0.5) + 0.5 * noise(index, well_id, 4), 2),
+        round(120 + 20 * math.cos(phase * 0.3) + 2 * noise(index, well_id, 5), 2),
+    )
+
+
+def sample_row(well_id, ts):
+    index, values = sample_values(well_id, ts)
+    row = dict(zip(PARAM_CODES, values))
+    row['index'] = index
+    row['DT'] = datetime.fromtimestamp(ts).strftime(TIME_FORMAT)
+    return row
+
+
+def generate_rows(well_id, start_ts, end_ts, step=1):
+    return [sample_row(well_id, ts) for ts in range(math.ceil(start_ts), int(end_ts) + 1, step)]
+
+
+def live_event(well_id, index):
+    # 一个推送事件: id 为样本 index, 数据带有浮点时间戳 ts, 不含 DT 字符串
+    ts = index / INDEX_RATE
+    sample = sample_row(well_id, ts)
+    del sample['DT']
+    sample['ts'] = ts
+    data = json.dumps(sample, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {index}\ndata: {data}\n\n".encode('utf-8')
+
+
+def bucket_seconds_for(start_ts, end_ts, buckets):
+    # 桶宽取不小于 时间范围/桶数 的整齐值, 桶边界从 UNIX 纪元起对齐, 不同查询的同一个桶结果相同
+    needed = (end_ts - start_ts) / max(1, buckets)
+    for seconds in BUCKET_STEPS:
+        if seconds >= needed:
+            return seconds
+    return math.ceil(needed / BUCKET_STEPS[-1]) * BUCKET_STEPS[-1]
+
+
+def aggregate_bucket(well_id, start_ts, end_ts):
+    # 参考聚合实现: [start_ts, end_ts) 内每秒一条原始数据的样本数和各参数最小/最大/平均值
+    rows = [sample_values(well_id, ts)[1] for ts in range(math.ceil(start_ts), math.ceil(end_ts))]
+    if not rows:
+        return None
+    columns = list(zip(*rows))
+    return (len(rows), [min(column) for column in columns], [max(column) for column in columns],
+            [round(sum(column) / len(rows), 3) for column in columns])
+
+
+def delta_encode(values):
+    previous = 0
+    deltas = array('q')
+    for value in values:
+        deltas.append(value - previous)
+        previous = value
+    return deltas
+
+
+def encode_column_header(meta):
+    body = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+    return COLUMNS_MAGIC + struct.pack('<I', len(body)) + body
+
+
+def encode_column_frame(rows, compress=True):
+    # 一帧内各列连续存放: index/时间戳做差分后按 int64 存放, 参数值按 float32 存放
+    # 时间戳按本机时区把 DT 转为秒数, 与客户端解析 JSON 时的方式一致
+    columns = [
+        delta_encode(int(row['index']) for row in rows),
+        delta_encode(int(datetime.strptime(row['DT'], TIME_FORMAT).timestamp()) for row in rows),
+    ]
+    columns.extend(array('f', (row[code] for row in rows)) for code in PARAM_CODES)
+    if sys.byteorder != 'little':
+        for column in columns:
+            column.byteswap()
+    payload = b''.join(column.tobytes() for column in columns)
+    flags = 0
+    if compress:
+        payload = zlib.compress(payload, 6)
+        flags |= COLUMNS_FLAG_ZLIB
+    return COLUMNS_FRAME.pack(len(rows), flags, len(payload)) + payload
+
+
+def encode_column_stream(meta, rows, batch_rows=COLUMNS_BATCH_ROWS, compress=True):
+    yield encode_column_header(meta)
+    for start in range(0, len(rows), batch_rows):
+        yield encode_column_frame(rows[start:start + batch_rows], compress)
+    yield COLUMNS_FRAME.pack(0, 0, 0)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 以支持 keep-alive 连接复用
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connection_count += 1
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length).decode('utf-8'))
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_body(body, 'application/json; charset=utf-8', status)
+
+    def send_body(self, body, content_type, status=200, extra_headers=None):
+        accept_encoding = self.headers.get('Accept-Encoding', '')
+        compressed = 'gzip' in accept_encoding and len(body) > 256
+        if compressed:
+            body = gzip.compress(body)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        if compressed:
+            self.send_header('Content-Encoding', 'gzip')
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_ndjson(self, meta, rows):
+        # 分块传输 NDJSON: 首行为元数据, 之后每行一条记录
+        # 启用gzip时每批数据做一次同步刷新, 客户端可以边收边解压
+        compressor = None
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        self.send_response(200)
+        self.send_header('Content-Type', f"{NDJSON_TYPE}; charset=utf-8")
+        if compressor:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def write_chunk(data):
+            if compressor:
+                data = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+
+        write_chunk(json.dumps(meta, ensure_ascii=False).encode('utf-8') + b"\n")
+        for start in range(0, len(rows), STREAM_BATCH_ROWS):
+            batch = rows[start:start + STREAM_BATCH_ROWS]
+            write_chunk(''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in batch).encode('utf-8'))
+            if self.server.stream_delay:
+                time.sleep(self.server.stream_delay)
+        if compressor:
+            tail = compressor.flush()
+            self.wfile.write(f"{len(tail):x}\r\n".encode('ascii') + tail + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def send_columns(self, meta, rows):
+        # 列式二进制数据已按帧压缩, 不再使用gzip
+        self.send_response(200)
+        self.send_header('Content-Type', COLUMNS_TYPE)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for data in encode_column_stream(meta, rows, compress=self.server.compress_columns):
+            self.write_chunk(data)
+            if self.server.stream_delay:
+                time.sleep(self.server.stream_delay)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def send_not_modified(self, etag):
+        self.send_response(304)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/api/stream' and self.server.supports_push:
+            self.handle_stream({key: values[-1] for key, values in parse_qs(url.query).items()})
+        elif url.path == '/api/wells':
+            # 井号列表带 ETag, 客户端缓存未过期时返回 304, 不发送内容
+            body = json.dumps(self.server.wells, ensure_ascii=False).encode('utf-8')
+            etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+            if etag in self.headers.get('If-None-Match', ''):
+                self.send_not_modified(etag)
+                return
+            self.send_body(body, 'application/json; charset=utf-8', extra_headers={'ETag': etag})
+        else:
+            self.send_json({'status': 'error', 'message': '接口不存在'}, 404)
+
+    def do_POST(self):
+        try:
+            payload = self.read_json()
+        except ValueError:
+            self.send_json({'status': 'error', 'message': '请求格式错误'}, 400)
+            return
+
+        if self.path == '/api/login':
+            self.handle_login(payload)
+        elif self.path == '/api/register':
+            self.handle_register(payload)
+        elif self.path == '/api/drilling_data':
+            with self.server.lock:
+                self.server.in_flight += 1
+                self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+            try:
+                self.handle_drilling_data(payload)
+            finally:
+                with self.server.lock:
+                    self.server.in_flight -= 1
+        else:
+            self.send_json({'status': 'error', 'message': '接口不存在'}, 404)
+
+    def handle_stream(self, query):
+        # 按 live_rate 回放模拟的实时数据; 带 Last-Event-ID 时先补发之后的样本 (最多 live_backlog 秒)
+        well = self.server.find_well(query.get('well_id'))
+        if well is None:
+            self.send_json({'status': 'error', 'message': '井号不存在'}, 400)
+            return
+        rate = self.server.live_rate
+        step = INDEX_RATE // rate
+        now = time.time()
+        next_index = int(now * INDEX_RATE) // step * step
+        last_id = self.headers.get('Last-Event-ID') or query.get('since_index')
+        if last_id and last_id.isdigit():
+            oldest = int((now - self.server.live_backlog) * INDEX_RATE)
+            next_index = max(int(last_id) + 1, oldest)
+            next_index = -(-next_index // step) * step
+
+        self.send_response(200)
+        self.send_header('Content-Type', LIVE_STREAM_TYPE)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        self.close_connection = True
+        with self.server.lock:
+            self.server.live_clients += 1
+        started = last_write = time.time()
+        try:
+            self.write_chunk(f"retry: {int(self.server.live_retry * 1000)}\n\n".encode('ascii'))
+            while not self.server.live_stopped:
+                now = time.time()
+                end_index = int(now * INDEX_RATE)
+                if next_index <= end_index:
+                    indices = range(next_index, end_index + 1, step)
+                    self.write_chunk(b''.join(live_event(well['ID'], index) for index in indices))
+                    next_index = indices[-1] + step
+                    last_write = now
+                    with self.server.lock:
+                        self.server.live_events += len(indices)
+                elif now - last_write >= LIVE_HEARTBEAT:
+                    self.write_chunk(b': ping\n\n')
+                    last_write = now
+                if self.server.live_drop_after and now - started >= self.server.live_drop_after:
+                    break  # 模拟断线, 用于测试客户端重连
+                time.sleep(max(0.0, next_index / INDEX_RATE - time.time()))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with self.server.lock:
+                self.server.live_clients -= 1
+
+    def send_aggregate(self, well, start_ts, end_ts, buckets):
+        seconds = bucket_seconds_for(start_ts, end_ts, buckets)
+        result = {'bucket_seconds': seconds, 'ts': [], 'count': []}
+        for key in ('min', 'max', 'mean'):
+            result[key] = {code: [] for code in PARAM_CODES}
+        bucket_start = start_ts // seconds * seconds
+        while bucket_start <= end_ts:
+            # 首尾两个桶按查询范围截取
+            bucket = self.server.bucket(well['ID'], max(bucket_start, start_ts),
+                                        min(bucket_start + seconds, end_ts + 1))
+            if bucket is not None:
+                count, lows, highs, means = bucket
+                result['ts'].append(bucket_start)
+                result['count'].append(count)
+                for k, code in enumerate(PARAM_CODES):
+                    result['min'][code].append(lows[k])
+                    result['max'][code].append(highs[k])
+                    result['mean'][code].append(means[k])
+            bucket_start += seconds
+        self.send_json({'status': 'success', 'well_name': well['WELL'], 'aggregate': result})
+
+    def handle_login(self, payload):
+        user = self.server.users.get(payload.get('phone'))
+        if user is None:
+            self.send_json({'status': 'error', 'message': '用户不存在'}, 404)
+        else:
+            self.send_json(user)
+
+    def handle_register(self, payload):
+        phone = payload.get('phone')
+        if not phone or phone in self.server.users:
+            self.send_json({'status': 'error', 'message': '手机号已注册'}, 400)
+            return
+        with self.server.lock:
+            self.server.users[phone] = {
+                'Name': payload.get('name', ''),
+                'Phone': phone,
+                'Company': payload.get('company', ''),
+            }
+        self.send_json({'status': 'success'})
+
+    def handle_drilling_data(self, payload):
+        well = self.server.find_well(payload.get('well_id'))
+        if well is None:
+            self.send_json({'status': 'error', 'message': '井号不存在'})
+            return
+        try:
+            start_ts = datetime.strptime(payload['start_time'], TIME_FORMAT).timestamp()
+            end_ts = datetime.strptime(payload['end_time'], TIME_FORMAT).timestamp()
+        except (KeyError, ValueError):
+            self.send_json({'status': 'error', 'message': '时间格式错误'})
+            return
+        if payload.get('buckets') and self.server.supports_aggregate:
+            self.send_aggregate(well, start_ts, end_ts, int(payload['buckets']))
+            return
+        since_index = payload.get('since_index')
+        if since_index is not None and self.server.supports_cursor:
+            # 增量查询: 只返回 index 大于 since_index 的数据 (模拟数据的 index 即时间戳)
+            start_ts = max(start_ts, (int(since_index) + 1) / INDEX_RATE)
+        rows = self.server.rows(well['ID'], start_ts, end_ts)
+        accept = self.headers.get('Accept', '')
+        meta = {'status': 'success', 'well_name': well['WELL']}
+        if self.server.supports_cursor:
+            meta['cursor'] = since_index
+        if self.server.supports_columns and COLUMNS_TYPE in accept:
+            self.send_columns(meta, rows)
+            return
+        if self.server.supports_stream and NDJSON_TYPE in accept:
+            self.send_ndjson(meta, rows)
+            return
+        result = {'status': 'success', 'well_name': well['WELL'], 'data': rows}
+        if self.server.supports_cursor:
+            result['cursor'] = rows[-1]['index'] if rows else since_index
+        self.send_json(result)
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), verbose=False, supports_cursor=True,
+                 supports_stream=True, supports_columns=True, compress_columns=True,
+                 stream_delay=0, cache_rows=False, supports_push=True, live_rate=INDEX_RATE,
+                 live_backlog=60, live_retry=1.0, live_drop_after=0, supports_aggregate=True):
+        super().__init__(address, MockHandler)
+        self.lock = threading.Lock()
+        self.verbose = verbose
+        # 关闭后模拟不支持增量查询/流式返回/列式二进制格式/聚合查询的旧版服务器
+        self.supports_cursor = supports_cursor
+        self.supports_stream = supports_stream
+        self.supports_columns = supports_columns
+        self.compress_columns = compress_columns
+        self.supports_aggregate = supports_aggregate
+        # 每批流式数据之间的延迟 (秒), 用于模拟慢速网络
+        self.stream_delay = stream_delay
+        self.connection_count = 0  # 已建立的TCP连接数, 用于验证连接复用
+        self.in_flight = 0         # 正在处理的数据查询数, 及其最大值 (验证客户端的并发上限)
+        self.max_in_flight = 0
+        # 缓存生成的模拟数据, 基准测试重复请求时不计入服务器生成数据的耗时
+        self.cache_rows = cache_rows
+        self.row_cache = {}
+        self.bucket_cache = {}
+        self.wells = list(WELLS)  # 可修改, 用于测试井号列表变化后的重新验证
+        # 实时推送: 每秒样本数 (须整除 INDEX_RATE)、重连时最多补发的秒数、建议的重连间隔
+        # live_drop_after 秒后主动断开连接, 用于测试重连; 关闭 supports_push 模拟没有推送接口的旧版服务器
+        self.supports_push = supports_push
+        self.live_rate = live_rate
+        self.live_backlog = live_backlog
+        self.live_retry = live_retry
+        self.live_drop_after = live_drop_after
+        self.live_stopped = False
+        self.live_clients = 0   # 当前推送连接数
+        self.live_events = 0    # 已推送的样本数
+        self.users = {
+            '13800000000': {'Name': '测试用户', 'Phone': '13800000000', 'Company': '测试公司'},
+        }
+
+    def rows(self, well_id, start_ts, end_ts):
+        if not self.cache_rows:
+            return generate_rows(well_id, start_ts, end_ts)
+        key = (well_id, int(start_ts), int(end_ts))
+        with self.lock:
+            rows = self.row_cache.get(key)
+        if rows is None:
+            rows = generate_rows(well_id, start_ts, end_ts)
+            with self.lock:
+                self.row_cache[key] = rows
+        return rows
+
+    def bucket(self, well_id, start_ts, end_ts):
+        # 已经结束的桶缓存聚合结果, 重复查询同一时间段时不再重新生成样本
+        if end_ts > time.time():
+            return aggregate_bucket(well_id, start_ts, end_ts)
+        key = (well_id, start_ts, end_ts)
+        with self.lock:
+            if key in self.bucket_cache:
+                return self.bucket_cache[key]
+        bucket = aggregate_bucket(well_id, start_ts, end_ts)
+        with self.lock:
+            if len(self.bucket_cache) >= BUCKET_CACHE_SIZE:
+                self.bucket_cache.clear()
+            self.bucket_cache[key] = bucket
+        return bucket
+
+    def find_well(self, well_id):
+        return next((w for w in self.wells if str(w['ID']) == str(well_id)), None)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.live_stopped = True
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == '__main__':
+    import sys
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    server = MockServer(('0.0.0.0', port), verbose=True)
+    print(f"模拟服务器运行于 {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -1,4 +1,8 @@
-import requests
+import time
+
+# 进程启动时刻 (在导入 Kivy 之前记录), 用于统计冷启动耗时
+STARTUP_TIME = time.perf_counter()
+
 from kivy.app import App
 from kivy.uix.screenmanager import ScreenManager, Screen
 from kivy.uix.widget import Widget
@@ -10,173 +14,2337 @@ from kivy.uix.textinput import TextInput
 from kivy.uix.spinner import Spinner
 from kivy.uix.togglebutton import ToggleButton
 from kivy.uix.scrollview import ScrollView
-from kivy.graphics import Color, Line, Rectangle, Ellipse
+from kivy.uix.relativelayout import RelativeLayout
+from kivy.uix.floatlayout import FloatLayout
+from kivy.graphics import Color, Line, Rectangle, Mesh
+from kivy.graphics import PushMatrix, PopMatrix, Translate, Scale
+from kivy.graphics import StencilPush, StencilUse, StencilUnUse, StencilPop
 from kivy.clock import Clock
-from kivy.properties import NumericProperty, ListProperty
+from kivy.core.window import Window
+from kivy.properties import NumericProperty, ListProperty, OptionProperty, StringProperty
 from datetime import datetime, timedelta
 from kivy.graphics import InstructionGroup
 from kivy.core.text import Label as CoreLabel
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import wraps
+from array import array
+from collections import OrderedDict, deque
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, chain, groupby
+import threading
+import sqlite3
+import csv
+import gzip
+import os
+import json
+import zlib
+import struct
+import sys
 import math
 
 # 配置树莓派服务器地址 - 需要根据实际IP修改
 SERVER_URL = "http://192.168.4.1:8080"  # 替换为树莓派实际IP
 
+# 钻井参数代码: 指重、泵压、扭矩、排量、转速
+PARAM_CODES = ('A01', 'A02', 'A03', 'A04', 'A05')
+PARAM_NAMES = {'A01': '指重', 'A02': '泵压', 'A03': '扭矩', 'A04': '排量', 'A05': '转速'}
+PARAM_COLORS = {
+    'A01': (0, 1, 0, 1),     # green
+    'A02': (0.5, 0, 0.5, 1), # purple
+    'A03': (1, 0, 0, 1),     # red
+    'A04': (1, 1, 0, 1),     # yellow
+    'A05': (0, 0, 0, 1)      # black
+}
+
+# 实时数据: 显示最近10分钟, 按最高10Hz预分配缓冲区
+REALTIME_WINDOW = 600
+REALTIME_MAX_RATE = 10
+REALTIME_POLL_INTERVAL = 1.0
+
+# 实时推送 (Server-Sent Events): 断线后按指数退避重连; 服务器每隔几秒发送心跳, 超过读取超时视为断线
+LIVE_STREAM_TYPE = 'text/event-stream'
+LIVE_RETRY_MIN = 1.0
+LIVE_RETRY_MAX = 30.0
+LIVE_READ_TIMEOUT = 15
+
+# 流式下载: 每累积一定行数或间隔一定时间就交给界面显示一次
+STREAM_CHUNK_ROWS = 2000
+STREAM_CHUNK_INTERVAL = 0.3
+NDJSON_TYPE = 'application/x-ndjson'
+
+# 列式二进制格式: 'DRC1' + 元数据长度(u32) + 元数据JSON, 之后为若干数据帧, 行数为0的帧表示结束
+# 帧: 行数(u32) + 标志(u8) + 负载长度(u32) + 负载 (标志位1表示负载经过zlib压缩)
+# 负载: index 差分(int64) + 时间戳秒数差分(int64) + A01-A05(float32), 均为小端序
+COLUMNS_TYPE = 'application/x-drilling-columns'
+COLUMNS_MAGIC = b'DRC1'
+COLUMNS_FRAME = struct.Struct('<IBI')
+COLUMNS_FLAG_ZLIB = 1
+DRILLING_DATA_ACCEPT = f"{COLUMNS_TYPE}, {NDJSON_TYPE};q=0.9, application/json;q=0.5"
+
+# 时间范围查询: 可选最近 HISTORY_RANGE_DAYS 天内的任意时段, 历史数据每 HISTORY_SAMPLE_SECONDS 秒一条
+# 预计原始数据超过 曲线宽度(像素) × RAW_ROWS_PER_PIXEL 行时, 请求服务器按时间桶聚合 (每像素一个桶)
+HISTORY_RANGE_DAYS = 30
+HISTORY_SAMPLE_SECONDS = 1
+RAW_ROWS_PER_PIXEL = 4
+AGGREGATE_MAX_BUCKETS = 2000
+
+# 多井对比: 最多同时显示的井数, 以及同时向服务器发出的查询数上限 (避免树莓派过载)
+COMPARE_MAX_WELLS = 6
+COMPARE_MAX_IN_FLIGHT = 3
+
+# 本地历史数据存储: 容量上限, 以及最近一段时间内的数据可能尚未写入服务器, 不计入已缓存区间
+HISTORY_STORE_BUDGET = 50 * 1024 * 1024
+HISTORY_STORE_SETTLE = 60
+
+# 内存中的历史数据块缓存: 按固定10分钟时间块对齐, 容量上限按字节计算
+HISTORY_TILE_SECONDS = 600
+HISTORY_TILE_BUDGET = 16 * 1024 * 1024
+
+# 登录状态和井号列表保存在本地, 启动时直接恢复, 超过有效期后需要重新登录
+SESSION_MAX_AGE = 30 * 24 * 3600
+
+# 导出CSV: 每批格式化并写入的行数 (内存中只保留一批), gzip 压缩级别
+EXPORT_CHUNK_ROWS = 5000
+EXPORT_GZIP_LEVEL = 6
+
+# 报警: 各参数的滑动统计窗口 (秒) 和默认规则, 规则可在 alarms.json 中修改 (格式相同)
+# high/low 比较最新值, rate 比较窗口内平均变化率 (每秒) 的绝对值; 超过 limit 时报警, 回到 clear 以内才解除
+ALARM_WINDOW = 10
+# 用户可选择在后台监测报警的井数上限 (每口井一个推送长连接, 与当前界面无关)
+ALARM_MAX_WELLS = 8
+# 服务器不支持推送或推送正在重连时, 轮询报警监测井的基本间隔 (秒), 出错时由调度器退避
+ALARM_POLL_INTERVAL = 10
+ALARM_RULES = (
+    {'code': 'A02', 'kind': 'high', 'limit': 17.5, 'clear': 17.0},
+    {'code': 'A02', 'kind': 'low', 'limit': 12.5, 'clear': 13.0},
+    {'code': 'A02', 'kind': 'rate', 'limit': 0.5, 'clear': 0.3},
+    {'code': 'A03', 'kind': 'high', 'limit': 9.7, 'clear': 9.4},
+    {'code': 'A03', 'kind': 'rate', 'limit': 0.3, 'clear': 0.2},
+)
+ALARM_KIND_NAMES = {'high': '过高', 'low': '过低', 'rate': '变化过快'}
+
+# 周期刷新调度: 出错或超时后间隔按2的幂延长 (不超过 REFRESH_MAX_INTERVAL, 或任务本身更长的间隔),
+# 间隔至少为平滑往返时间的 REFRESH_RTT_MULTIPLE 倍, 电量低于 REFRESH_LOW_BATTERY% 且未充电时间隔加倍
+REFRESH_MAX_INTERVAL = 60
+REFRESH_RTT_MULTIPLE = 3
+REFRESH_RTT_SMOOTHING = 0.2
+REFRESH_LOW_BATTERY = 20
+REFRESH_LOW_BATTERY_FACTOR = 2
+# 井号列表重新验证 (带 ETag, 未变化时服务器只返回 304, 兼作空闲时的心跳), 登录状态验证, 电量检查
+WELLS_REFRESH_INTERVAL = 300
+SESSION_REFRESH_INTERVAL = 3600
+BATTERY_CHECK_INTERVAL = 300
+
+
+# 性能记录 (默认关闭): 设置环境变量 DRILLING_PROFILE=1 后记录各环节耗时和帧间隔, 并显示调试浮层
+PROFILE_ENABLED = os.environ.get('DRILLING_PROFILE') == '1'
+PROFILE_SPAN_CAPACITY = 5000
+PROFILE_FRAME_CAPACITY = 600
+FRAME_BUDGET = 1 / 60.0
+
+
+class ProfileSpan:
+    def __init__(self, profiler, name, category):
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.category, self.start, time.perf_counter())
+        return False
+
+
+class Profiler:
+    # 耗时区间和帧间隔分别保存在固定容量的环形缓冲区中, 可以导出为 Chrome trace 格式 (chrome://tracing)
+    # 未启用时 span() 返回共享的空上下文, 几乎没有开销
+    NULL_SPAN = nullcontext()
+
+    def __init__(self, enabled=False, capacity=PROFILE_SPAN_CAPACITY, frame_capacity=PROFILE_FRAME_CAPACITY):
+        self.enabled = enabled
+        self.origin = time.perf_counter()
+        self.spans = deque(maxlen=capacity)    # (名称, 类别, 开始, 耗时, 线程)
+        self.frames = deque(maxlen=frame_capacity)    # (时刻, 帧间隔)
+        self.frame_count = 0
+        self.dropped_frames = 0
+        self.thread_names = {}
+        self.frame_event = None
+
+    def span(self, name, category='app'):
+        if not self.enabled:
+            return self.NULL_SPAN
+        return ProfileSpan(self, name, category)
+
+    def record(self, name, category, start, end):
+        thread = threading.current_thread()
+        self.thread_names.setdefault(thread.ident, thread.name)
+        self.spans.append((name, category, start, end - start, thread.ident))
+
+    def start_frame_timer(self):
+        # 每帧调用一次, 记录帧间隔; 超过帧预算的部分计为丢帧
+        if self.enabled and self.frame_event is None:
+            self.frame_event = Clock.schedule_interval(self.on_frame, 0)
+
+    def stop_frame_timer(self):
+        if self.frame_event is not None:
+            self.frame_event.cancel()
+            self.frame_event = None
+
+    def on_frame(self, dt):
+        self.frame_count += 1
+        self.frames.append((time.perf_counter(), dt))
+        if dt > FRAME_BUDGET * 1.5:
+            self.dropped_frames += int(dt / FRAME_BUDGET + 0.5) - 1
+
+    def frame_stats(self):
+        intervals = [dt for _, dt in self.frames]
+        if not intervals:
+            return {'fps': 0, 'avg_ms': 0, 'max_ms': 0, 'dropped': self.dropped_frames}
+        average = sum(intervals) / len(intervals)
+        return {
+            'fps': 1 / average if average else 0,
+            'avg_ms': average * 1000,
+            'max_ms': max(intervals) * 1000,
+            'dropped': self.dropped_frames,
+        }
+
+    def span_summary(self, window=5.0):
+        # 最近 window 秒内各区间的次数、总耗时和最大耗时, 按总耗时降序
+        since = time.perf_counter() - window
+        summary = {}
+        for name, category, start, duration, _ in list(self.spans):
+            if start < since:
+                continue
+            entry = summary.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += duration
+            entry[2] = max(entry[2], duration)
+        return sorted(summary.items(), key=lambda item: -item[1][1])
+
+    def chrome_trace(self):
+        origin = self.origin
+        events = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': ident, 'args': {'name': name}}
+            for ident, name in self.thread_names.items()
+        ]
+        for name, category, start, duration, ident in list(self.spans):
+            events.append({
+                'name': name, 'cat': category, 'ph': 'X', 'pid': 1, 'tid': ident,
+                'ts': (start - origin) * 1e6, 'dur': duration * 1e6,
+            })
+        for moment, dt in list(self.frames):
+            events.append({
+                'name': 'frame_ms', 'ph': 'C', 'pid': 1,
+                'ts': (moment - origin) * 1e6, 'args': {'ms': dt * 1000},
+            })
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'dropped_frames': self.dropped_frames, 'frame_count': self.frame_count},
+        }
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f, ensure_ascii=False)
+        return path
+
+
+PROFILER = Profiler(PROFILE_ENABLED)
+
+
+def profiled(name, category='app'):
+    # 装饰器: 把整个函数调用记录为一个区间 (不适用于生成器)
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return func(*args, **kwargs)
+            with PROFILER.span(name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class RequestExecutor:
+    # 后台请求执行器: 网络请求在线程池中运行, 结果通过 Clock 回到 UI 线程
+    # 同一 key 的新请求会取代仍在执行的旧请求, 签名相同的重复请求会被合并
+    def __init__(self, max_workers=2):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='http')
+        self.lock = threading.Lock()
+        self.generations = {}  # key -> 最新请求的编号
+        self.pending = {}      # key -> (签名, future)
+
+    def submit(self, key, func, on_success=None, on_error=None, signature=None, on_progress=None):
+        # 提供 on_progress 时 func 会收到 report 回调, 用于分批交付中间结果
+        with self.lock:
+            current = self.pending.get(key)
+            if current and signature is not None and current[0] == signature and not current[1].done():
+                # 相同请求仍在执行, 不再重复发送
+                return current[1]
+            if current:
+                # 尚未开始的旧请求直接取消, 已开始的结果将被丢弃
+                current[1].cancel()
+            generation = self.generations.get(key, 0) + 1
+            self.generations[key] = generation
+            if on_progress is not None:
+                report = lambda value: self._report(key, generation, value, on_progress)
+                future = self.pool.submit(func, report)
+            else:
+                future = self.pool.submit(func)
+            self.pending[key] = (signature, future)
+        future.add_done_callback(
+            lambda f: self._deliver(key, generation, f, on_success, on_error)
+        )
+        return future
+
+    def cancel(self, key):
+        with self.lock:
+            self.generations[key] = self.generations.get(key, 0) + 1
+            current = self.pending.pop(key, None)
+        if current:
+            current[1].cancel()
+
+    def is_busy(self, key):
+        with self.lock:
+            return key in self.pending
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _report(self, key, generation, value, on_progress):
+        # 在后台线程中调用, 返回 False 表示请求已被取消或取代, 应停止下载
+        if self.generations.get(key) != generation:
+            return False
+
+        def dispatch(dt):
+            if self.generations.get(key) == generation:
+                on_progress(value)
+
+        Clock.schedule_once(dispatch)
+        return True
+
+    def _deliver(self, key, generation, future, on_success, on_error):
+        if future.cancelled():
+            return
+
+        def dispatch(dt):
+            with self.lock:
+                if self.generations.get(key) != generation:
+                    return  # 已被更新的请求取代
+                self.pending.pop(key, None)
+            error = future.exception()
+            if error is not None:
+                if on_error:
+                    on_error(error)
+            elif on_success:
+                on_success(future.result())
+
+        Clock.schedule_once(dispatch)
+
+
+class ApiClient:
+    # 共享HTTP客户端: 复用 keep-alive 连接, 启用gzip压缩, GET 请求失败时退避重试
+    # 同时按接口记录请求次数、耗时和流量
+    TIMEOUTS = {
+        '/api/login': (3, 10),
+        '/api/register': (3, 10),
+        '/api/wells': (3, 5),
+        '/api/drilling_data': (3, 30),
+        '/api/stream': (3, LIVE_READ_TIMEOUT),
+    }
+    DEFAULT_TIMEOUT = (3, 10)  # (连接超时, 读取超时)
+
+    def __init__(self, base_url=SERVER_URL, pool_size=4, retries=3, backoff=0.3):
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        self.session = None
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    def ensure_session(self):
+        # requests 及其依赖导入约需0.1秒, 推迟到第一次请求时 (在后台线程中) 再导入和建立会话
+        with self.lock:
+            if self.session is not None:
+                return self.session
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            session = requests.Session()
+            session.headers.update({
+                'Accept-Encoding': 'gzip, deflate',
+                'Connection': 'keep-alive',
+            })
+            retry = Retry(
+                total=self.retries,
+                backoff_factor=self.backoff,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=frozenset(['GET', 'HEAD']),
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self.session = session
+            return session
+
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault('timeout', self.TIMEOUTS.get(path, self.DEFAULT_TIMEOUT))
+        session = self.ensure_session()
+        start = time.perf_counter()
+        try:
+            with PROFILER.span(f"{method} {path}", 'network'):
+                response = session.request(method, self.base_url + path, **kwargs)
+        except Exception:
+            self._record(path, time.perf_counter() - start, 0, 0, error=True)
+            raise
+        if kwargs.get('stream'):
+            body_bytes = wire_bytes = 0
+        else:
+            body_bytes = len(response.content)
+            wire_bytes = int(response.headers.get('Content-Length') or body_bytes)
+        self._record(path, time.perf_counter() - start, body_bytes, wire_bytes,
+                     error=response.status_code >= 500)
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def _record(self, path, elapsed, body_bytes, wire_bytes, error=False):
+        with self.lock:
+            entry = self.stats.setdefault(path, {
+                'count': 0, 'errors': 0, 'total_time': 0.0, 'max_time': 0.0,
+                'bytes': 0, 'wire_bytes': 0
+            })
+            entry['count'] += 1
+            entry['errors'] += int(error)
+            entry['total_time'] += elapsed
+            entry['max_time'] = max(entry['max_time'], elapsed)
+            entry['bytes'] += body_bytes
+            entry['wire_bytes'] += wire_bytes
+
+    def add_bytes(self, path, body_bytes, wire_bytes):
+        # 流式响应在读取完成后补记流量
+        with self.lock:
+            entry = self.stats.get(path)
+            if entry is not None:
+                entry['bytes'] += body_bytes
+                entry['wire_bytes'] += wire_bytes
+
+    def get_stats(self):
+        with self.lock:
+            return {path: dict(entry) for path, entry in self.stats.items()}
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+
+
+def is_connection_error(error):
+    # 未导入 requests 时不可能是它抛出的异常, 不必为判断而导入
+    requests = sys.modules.get('requests')
+    return requests is not None and isinstance(error, requests.exceptions.ConnectionError)
+
+
+def iter_raw_chunks(response, counter):
+    # 自行读取并解压分块数据, 以便统计实际传输的字节数 (counter: [原始字节, 解压后字节])
+    # 请求头声明了 gzip 和 deflate, 两种都要能解; deflate 按规范带 zlib 头, 部分服务器发送裸 deflate 流
+    encoding = response.headers.get('Content-Encoding', '').strip().lower()
+    decompressor = None
+    if encoding == 'gzip':
+        decompressor = zlib.decompressobj(31)
+    elif encoding == 'deflate':
+        decompressor = zlib.decompressobj(15)
+    started = False
+    for chunk in response.raw.stream(65536, decode_content=False):
+        counter[0] += len(chunk)
+        if decompressor:
+            try:
+                data = decompressor.decompress(chunk)
+            except zlib.error:
+                if encoding != 'deflate' or started:
+                    raise
+                decompressor = zlib.decompressobj(-15)
+                data = decompressor.decompress(chunk)
+            started = True
+            chunk = data
+        counter[1] += len(chunk)
+        if chunk:
+            yield chunk
+    if decompressor:
+        tail = decompressor.flush()
+        counter[1] += len(tail)
+        if tail:
+            yield tail
+
+
+def drain(chunks):
+    # 列式格式在结束帧处停止读取; 读完剩余内容 (包括分块传输的结束标记) 后连接才会放回连接池复用
+    for _ in chunks:
+        pass
+
+
+def iter_ndjson_chunks(chunks):
+    # 输入为字节块迭代器; 先产出元数据, 之后按行数或时间间隔分批产出数据集
+    pending = b''
+    meta = None
+    rows = []
+    last_report = time.perf_counter()
+    for chunk in chunks:
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            if not line:
+                continue
+            if meta is None:
+                meta = json.loads(line)
+                yield meta
+                continue
+            rows.append(json.loads(line))
+            if (len(rows) >= STREAM_CHUNK_ROWS
+                    or time.perf_counter() - last_report >= STREAM_CHUNK_INTERVAL):
+                yield HistoryDataset.from_rows(rows, meta.get('well_name', ''))
+                rows = []
+                last_report = time.perf_counter()
+    if pending.strip():
+        rows.append(json.loads(pending))
+    if rows:
+        yield HistoryDataset.from_rows(rows, meta.get('well_name', ''))
+
+
+def iter_column_chunks(chunks):
+    # 输入为字节块迭代器; 先产出元数据, 之后每个数据帧直接解码为一个数据集, 不创建逐行对象
+    chunks = iter(chunks)
+    buffer = bytearray()
+
+    def read(size):
+        while len(buffer) < size:
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise ValueError("数据不完整")
+            buffer.extend(chunk)
+        data = bytes(buffer[:size])
+        del buffer[:size]
+        return data
+
+    if read(4) != COLUMNS_MAGIC:
+        raise ValueError("数据格式错误")
+    meta = json.loads(read(struct.unpack('<I', read(4))[0]).decode('utf-8'))
+    yield meta
+    well_name = meta.get('well_name', '')
+    while True:
+        rows, flags, length = COLUMNS_FRAME.unpack(read(COLUMNS_FRAME.size))
+        if not rows:
+            break
+        yield decode_column_frame(read(length), rows, flags, well_name)
+
+
+@profiled('decode_column_frame', 'decode')
+def decode_column_frame(payload, rows, flags, well_name=''):
+    if flags & COLUMNS_FLAG_ZLIB:
+        payload = zlib.decompress(payload)
+    view = memoryview(payload)
+    swap = sys.byteorder != 'little'
+
+    def column(typecode, offset, itemsize):
+        values = array(typecode)
+        values.frombytes(view[offset:offset + rows * itemsize])
+        if swap:
+            values.byteswap()
+        return values
+
+    dataset = HistoryDataset(well_name)
+    # 差分编码的 index 和时间戳通过累加还原
+    dataset.index = array('q', accumulate(column('q', 0, 8)))
+    dataset.timestamps = array('d', accumulate(column('q', rows * 8, 8)))
+    offset = rows * 16
+    for code in PARAM_CODES:
+        dataset.columns[code] = array('d', column('f', offset, 4))
+        offset += rows * 4
+    dataset.refresh()
+    return dataset
+
+
+def encode_column_frame(dataset, compress=True):
+    # 与服务器相同的列式帧格式 (含帧头), 用于本地存储
+    def delta_encode(values):
+        return array('q', [value - previous for previous, value in zip(chain((0,), values), values)])
+
+    columns = [
+        delta_encode(dataset.index),
+        delta_encode([int(t) for t in dataset.timestamps]),
+    ]
+    columns.extend(array('f', dataset.columns[code]) for code in PARAM_CODES)
+    if sys.byteorder != 'little':
+        for column in columns:
+            column.byteswap()
+    payload = b''.join(column.tobytes() for column in columns)
+    flags = 0
+    if compress:
+        payload = zlib.compress(payload, 6)
+        flags |= COLUMNS_FLAG_ZLIB
+    return COLUMNS_FRAME.pack(len(dataset), flags, len(payload)) + payload
+
+
+def decode_column_blob(blob, well_name=''):
+    rows, flags, length = COLUMNS_FRAME.unpack_from(blob)
+    return decode_column_frame(blob[COLUMNS_FRAME.size:COLUMNS_FRAME.size + length], rows, flags, well_name)
+
+
+@profiled('fetch_drilling_data', 'network')
+def fetch_drilling_data(api, data, report=None):
+    # 请求钻井数据并按服务器返回的格式解码: 列式二进制 > NDJSON 流 > 完整JSON
+    # 每解码出一批数据调用 report(meta, dataset), 返回 False 时停止下载并返回 (None, None)
+    # 返回 (meta, 最后一批数据集); 未提供 report 时所有数据合并为一个数据集返回
+    response = api.post(
+        '/api/drilling_data', json=data, stream=True,
+        headers={'Accept': DRILLING_DATA_ACCEPT}
+    )
+    with response:
+        if response.status_code != 200:
+            raise RuntimeError(f"服务器错误: {response.status_code}")
+        content_type = response.headers.get('Content-Type', '')
+        counter = [0, 0]
+        raw = iter_raw_chunks(response, counter)
+        if COLUMNS_TYPE in content_type:
+            chunks = iter_column_chunks(raw)
+        elif NDJSON_TYPE in content_type:
+            chunks = iter_ndjson_chunks(raw)
+        else:
+            # 服务器不支持流式返回, 按完整JSON处理
+            with PROFILER.span('json_parse', 'decode'):
+                result = response.json()
+            api.add_bytes('/api/drilling_data', len(response.content), response.raw.tell())
+            meta = {key: value for key, value in result.items() if key != 'data'}
+            if result.get('status') != 'success':
+                return meta, None
+            return meta, HistoryDataset.from_result(result)
+
+        meta = next(chunks)
+        if meta.get('status') != 'success':
+            drain(raw)
+            return meta, None
+        last = None
+        for dataset in chunks:
+            if last is None:
+                last = dataset
+            elif report is None:
+                last.merge(dataset)
+            elif not report(meta, last):
+                # 查询已取消或被新的查询取代, 停止下载
+                return None, None
+            else:
+                last = dataset
+        drain(raw)
+        api.add_bytes('/api/drilling_data', counter[1], counter[0])
+        if last is None:
+            last = HistoryDataset(meta.get('well_name', ''))
+        return meta, last
+
+
+def fetch_aggregate(api, data, buckets):
+    # 请求按时间桶聚合的数据 (JSON列式); 不支持聚合的旧版服务器会忽略 buckets, 返回原始数据
+    response = api.post(
+        '/api/drilling_data', json=dict(data, buckets=buckets),
+        headers={'Accept': 'application/json'}
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"服务器错误: {response.status_code}")
+    with PROFILER.span('json_parse', 'decode'):
+        result = response.json()
+    meta = {key: value for key, value in result.items() if key not in ('data', 'aggregate')}
+    if result.get('status') != 'success':
+        return meta, None
+    if 'aggregate' in result:
+        return meta, AggregateDataset.from_result(result)
+    return meta, HistoryDataset.from_result(result)
+
+
+class LiveStream:
+    # 实时推送通道: 后台线程保持 /api/stream 长连接, 每个事件是一个样本, 事件 id 为样本 index
+    # 样本在后台线程解析后暂存, 每帧最多交给界面一次 (on_samples 收到 HistoryDataset)
+    # 断线后自动重连, 通过 Last-Event-ID 从最后收到的 index 继续; 服务器不支持时状态变为 'unsupported'
+    def __init__(self, api, well_id, on_samples, on_state=None, last_index=None):
+        self.api = api
+        self.well_id = well_id
+        self.on_samples = on_samples
+        self.on_state = on_state
+        self.last_index = last_index
+        self.state = 'connecting'
+        self.retry = LIVE_RETRY_MIN
+        self.lock = threading.Lock()
+        self.pending = []
+        self.flush_scheduled = False
+        self.stopped = threading.Event()
+        self.response = None
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='live-stream', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        response = self.response
+        if response is not None:
+            # 关闭连接使阻塞的读取立即返回
+            response.close()
+
+    def resume_from(self, index):
+        # 断线期间轮询取得的数据不必再推送一遍
+        if index is not None and (self.last_index is None or index > self.last_index):
+            self.last_index = index
+
+    def run(self):
+        delay = self.retry
+        while not self.stopped.is_set():
+            headers = {'Accept': LIVE_STREAM_TYPE}
+            if self.last_index is not None:
+                headers['Last-Event-ID'] = str(self.last_index)
+            try:
+                response = self.api.get('/api/stream', params={'well_id': self.well_id},
+                                        headers=headers, stream=True)
+                with response:
+                    if (response.status_code in (404, 405, 501)
+                            or LIVE_STREAM_TYPE not in response.headers.get('Content-Type', '')):
+                        self.set_state('unsupported')
+                        return
+                    if response.status_code != 200:
+                        raise RuntimeError(f"服务器错误: {response.status_code}")
+                    self.response = response
+                    self.set_state('connected')
+                    delay = self.retry
+                    self.read_events(response)
+            except Exception as e:
+                if not self.stopped.is_set():
+                    print(f"推送连接中断: {str(e)}")
+            finally:
+                self.response = None
+            if self.stopped.is_set():
+                return
+            self.set_state('reconnecting')
+            self.stopped.wait(delay)
+            delay = min(delay * 2, LIVE_RETRY_MAX)
+
+    def read_events(self, response):
+        # 按 SSE 格式逐行解析: 空行结束一个事件, 以冒号开头的是心跳注释
+        event_id = None
+        data = []
+        for line in response.iter_lines(chunk_size=None):
+            if self.stopped.is_set():
+                return
+            if not line:
+                if data:
+                    self.receive(event_id, b'\n'.join(data))
+                event_id = None
+                data = []
+                continue
+            if line.startswith(b':'):
+                continue
+            field, _, value = line.partition(b':')
+            if value.startswith(b' '):
+                value = value[1:]
+            if field == b'data':
+                data.append(value)
+            elif field == b'id':
+                event_id = value
+            elif field == b'retry' and value.isdigit():
+                self.retry = min(max(int(value) / 1000, LIVE_RETRY_MIN), LIVE_RETRY_MAX)
+
+    def receive(self, event_id, data):
+        sample = json.loads(data)
+        with self.lock:
+            self.pending.append(sample)
+            if event_id:
+                self.last_index = int(event_id)
+            if self.flush_scheduled:
+                return
+            self.flush_scheduled = True
+        Clock.schedule_once(self.flush)
+
+    def flush(self, dt):
+        with self.lock:
+            samples = self.pending
+            self.pending = []
+            self.flush_scheduled = False
+        if not samples or self.stopped.is_set():
+            return
+        dataset = HistoryDataset()
+        dataset.index = array('q', (sample['index'] for sample in samples))
+        dataset.timestamps = array('d', (sample['ts'] for sample in samples))
+        for code in PARAM_CODES:
+            dataset.columns[code] = array('d', (sample[code] for sample in samples))
+        dataset.refresh()
+        self.on_samples(dataset)
+
+    def set_state(self, state):
+        self.state = state
+        if self.on_state is None:
+            return
+
+        def dispatch(dt):
+            if not self.stopped.is_set():
+                self.on_state(state)
+
+        Clock.schedule_once(dispatch)
+
+
+def format_value(value):
+    # 整数值不显示小数部分; 保留7位有效数字, 二进制格式的 float32 数值不显示多余尾数
+    if isinstance(value, float):
+        if value.is_integer():
+            return str(int(value))
+        return f"{value:.7g}"
+    return str(value)
+
+
+class HistoryDataset:
+    # 列式存储的历史数据: 时间戳只解析一次为秒数, 各参数保存在 array('d') 中
+    # 加载时预先计算各列最小/最大值和归一化横坐标, 切换参数时无需重新扫描
+    def __init__(self, well_name=''):
+        self.well_name = well_name
+        # 查询的时间窗口 (秒), 用于判断能否增量刷新
+        self.start_time = None
+        self.end_time = None
+        self.index = array('q')
+        self.timestamps = array('d')
+        self.columns = {code: array('d') for code in PARAM_CODES}
+        self.x_cache = None
+        self.min_values = {}
+        self.max_values = {}
+
+    @classmethod
+    def from_result(cls, result):
+        return cls.from_rows(result.get('data') or [], result.get('well_name', ''))
+
+    @classmethod
+    def from_rows(cls, rows, well_name=''):
+        dataset = cls(well_name)
+        dataset.extend_rows(rows)
+        return dataset
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def cursor(self):
+        # 已获取数据的最大 index (high-water mark)
+        return self.index[-1] if self.index else None
+
+    def merge(self, other, start_time=None):
+        # 追加另一个数据集中更新的样本, 并裁掉早于 start_time 的数据
+        cursor = self.cursor
+        skip = 0
+        if cursor is not None:
+            while skip < len(other) and other.index[skip] <= cursor:
+                skip += 1
+        was_empty = not self.index
+        if not self.well_name:
+            self.well_name = other.well_name
+        self.index.extend(other.index[skip:])
+        self.timestamps.extend(other.timestamps[skip:])
+        for code, column in self.columns.items():
+            column.extend(other.columns[code][skip:])
+        cut = 0
+        if start_time is not None:
+            cut = bisect_left(self.timestamps, start_time)
+            if cut:
+                del self.index[:cut]
+                del self.timestamps[:cut]
+                for column in self.columns.values():
+                    del column[:cut]
+            self.start_time = start_time
+        if other.end_time is not None:
+            self.end_time = other.end_time
+
+        if cut or skip or was_empty:
+            self.refresh()
+        elif len(other):
+            # 只追加数据时直接合并两边的极值, 无需重新扫描
+            # (没有新数据时统计值不变; 空数据集的极值可能未计算或为默认的 0/100, 不能参与合并)
+            for code in PARAM_CODES:
+                self.min_values[code] = min(self.min_values[code], other.min_values[code])
+                self.max_values[code] = max(self.max_values[code], other.max_values[code])
+            self.x_cache = None
+        return len(other) - skip
+
+    def between(self, start_time, end_time):
+        # 截取 [start_time, end_time] 内的数据, 返回新的数据集
+        part = self.slice(bisect_left(self.timestamps, start_time),
+                          bisect_right(self.timestamps, end_time))
+        part.start_time = start_time
+        part.end_time = end_time
+        return part
+
+    def slice(self, low, high):
+        # 复制第 low 到 high-1 行
+        part = HistoryDataset(self.well_name)
+        part.index = self.index[low:high]
+        part.timestamps = self.timestamps[low:high]
+        for code in PARAM_CODES:
+            part.columns[code] = self.columns[code][low:high]
+        part.refresh()
+        return part
+
+    @property
+    def nbytes(self):
+        # 列数据占用的内存 (不含横坐标和曲线点缓存)
+        size = self.index.itemsize * len(self.index) + self.timestamps.itemsize * len(self.timestamps)
+        return size + sum(column.itemsize * len(column) for column in self.columns.values())
+
+    @profiled('extend_rows', 'decode')
+    def extend_rows(self, rows):
+        parse = datetime.fromisoformat
+        index = self.index
+        timestamps = self.timestamps
+        columns = [(code, self.columns[code]) for code in PARAM_CODES]
+        for row in rows:
+            index.append(int(row['index']))
+            timestamps.append(parse(row['DT']).timestamp())
+            for code, column in columns:
+                column.append(float(row[code]))
+        self.refresh()
+
+    def refresh(self):
+        # 重新计算统计值, 横坐标在下次使用时重新计算
+        for code, column in self.columns.items():
+            self.min_values[code] = min(column) if column else 0
+            self.max_values[code] = max(column) if column else 100
+        self.x_cache = None
+
+    @property
+    def x_positions(self):
+        # 归一化横坐标 (0-100%), 多次追加数据时只在需要显示时计算一次
+        if self.x_cache is None:
+            timestamps = self.timestamps
+            if timestamps:
+                min_time = min(timestamps)
+                time_range = max(timestamps) - min_time
+            else:
+                min_time = time_range = 0
+            if time_range > 0:
+                scale = 100.0 / time_range
+                self.x_cache = array('d', [(t - min_time) * scale for t in timestamps])
+            else:
+                self.x_cache = array('d', range(len(timestamps)))
+        return self.x_cache
+
+    def row_values(self, i):
+        values = [str(self.index[i])]
+        values.extend(format_value(self.columns[code][i]) for code in PARAM_CODES)
+        # 时间只显示时分秒
+        values.append(datetime.fromtimestamp(self.timestamps[i]).strftime('%H:%M:%S'))
+        return values
+
+    def table_source(self):
+        return self
+
+
+class AggregateDataset(HistoryDataset):
+    # 服务器按时间桶聚合的数据: 每桶的样本数和各参数最小/最大/平均值
+    # 曲线每桶画两个点 (最小值和最大值), 放大后获取的明细数据 (detail) 替换所覆盖的桶
+    def __init__(self, well_name='', bucket_seconds=0):
+        super().__init__(well_name)
+        self.bucket_seconds = bucket_seconds
+        self.bucket_starts = array('d')
+        self.counts = array('q')
+        self.lows = {code: array('d') for code in PARAM_CODES}
+        self.highs = {code: array('d') for code in PARAM_CODES}
+        self.means = {code: array('d') for code in PARAM_CODES}
+        self.detail = None
+
+    @classmethod
+    def from_result(cls, result):
+        aggregate = result['aggregate']
+        dataset = cls(result.get('well_name', ''), aggregate['bucket_seconds'])
+        dataset.bucket_starts = array('d', aggregate['ts'])
+        dataset.counts = array('q', aggregate['count'])
+        for code in PARAM_CODES:
+            dataset.lows[code] = array('d', aggregate['min'][code])
+            dataset.highs[code] = array('d', aggregate['max'][code])
+            dataset.means[code] = array('d', aggregate['mean'][code])
+        dataset.add_points(dataset, 0, len(dataset.bucket_starts))
+        dataset.refresh()
+        return dataset
+
+    def add_points(self, source, low, high):
+        # 桶内前1/4处放最小值, 后1/4处放最大值, 曲线保留每个桶的峰值; index 为桶的序号
+        seconds = source.bucket_seconds
+        for i in range(low, high):
+            start = source.bucket_starts[i]
+            self.index.extend((i, i))
+            self.timestamps.extend((start + seconds * 0.25, start + seconds * 0.75))
+        for code in PARAM_CODES:
+            column = self.columns[code]
+            lows = source.lows[code]
+            highs = source.highs[code]
+            for i in range(low, high):
+                column.extend((lows[i], highs[i]))
+
+    def with_detail(self, detail):
+        # 返回新的数据集: detail 时间窗口 (start_time-end_time) 内的桶换成明细数据
+        spliced = AggregateDataset(self.well_name, self.bucket_seconds)
+        spliced.start_time = self.start_time
+        spliced.end_time = self.end_time
+        spliced.bucket_starts = self.bucket_starts
+        spliced.counts = self.counts
+        spliced.lows = self.lows
+        spliced.highs = self.highs
+        spliced.means = self.means
+        spliced.detail = detail
+        # 与明细窗口有重叠的桶都去掉: 窗口起点被限制在未对齐的查询起点时, 第一个桶可能跨过窗口起点,
+        # 保留它会使时间戳不再递增
+        low = bisect_right(self.bucket_starts, detail.start_time - self.bucket_seconds)
+        high = bisect_right(self.bucket_starts, detail.end_time)
+        spliced.add_points(self, 0, low)
+        spliced.index.extend(detail.index)
+        spliced.timestamps.extend(detail.timestamps)
+        for code in PARAM_CODES:
+            spliced.columns[code].extend(detail.columns[code])
+        spliced.add_points(self, high, len(self.bucket_starts))
+        spliced.refresh()
+        return spliced
+
+    def table_source(self):
+        # 明细为原始数据时表格显示明细, 否则每个桶一行
+        if self.detail is not None and not isinstance(self.detail, AggregateDataset):
+            return self.detail
+        return BucketRows(self)
+
+
+class BucketRows:
+    # 聚合数据的表格数据源: 每个时间桶一行, 显示各参数平均值和桶的起始时间
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def __len__(self):
+        return len(self.dataset.bucket_starts)
+
+    def row_values(self, i):
+        dataset = self.dataset
+        values = [str(i + 1)]
+        values.extend(format_value(dataset.means[code][i]) for code in PARAM_CODES)
+        values.append(datetime.fromtimestamp(dataset.bucket_starts[i]).strftime('%m-%d %H:%M'))
+        return values
+
+
+class MinMaxPyramid:
+    # 多分辨率极值金字塔: 第 k 层每 2**k 个样本只保留最小值和最大值两个点 (按出现顺序), 尖峰不会丢失
+    # 横坐标数组由多条曲线共用, 各层只保存选中样本的序号; 各层在首次使用时构建并缓存
+    def __init__(self, xs, ys):
+        self.xs = xs
+        self.ys = ys
+        self.count = len(ys)
+        self.levels = {}
+
+    def level(self, k):
+        indices = self.levels.get(k)
+        if indices is None:
+            return self.build_level(k)
+        return indices
+
+    @profiled('pyramid.build_level', 'graph')
+    def build_level(self, k):
+        step = 1 << k
+        ys = self.ys
+        indices = array('q')
+        for start in range(0, self.count, step):
+            segment = ys[start:start + step]
+            low = segment.index(min(segment))
+            high = segment.index(max(segment))
+            if low > high:
+                low, high = high, low
+            indices.append(start + low)
+            if high != low:
+                indices.append(start + high)
+        self.levels[k] = indices
+        return indices
+
+    def visible(self, x_start, x_end, columns):
+        # 返回 (可见范围内样本的序号, 抽稀层级), 两侧各多取一个点使曲线延伸到边界
+        low = max(0, bisect_left(self.xs, x_start, 0, self.count) - 1)
+        high = min(self.count, bisect_right(self.xs, x_end, 0, self.count) + 1)
+        k = max(0, ((high - low) // max(1, columns)).bit_length() - 1)
+        if k == 0:
+            return range(low, high), 0
+        indices = self.level(k)
+        first = max(0, bisect_left(indices, low) - 1)
+        last = min(len(indices), bisect_right(indices, high - 1) + 1)
+        return indices[first:last], k
+
+
+def downsample_lttb(points, threshold):
+    # Largest-Triangle-Three-Buckets: 每桶选取与相邻桶构成最大三角形面积的点
+    count = len(points)
+    if threshold < 3 or count <= threshold:
+        return points
+
+    result = [points[0]]
+    every = (count - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # 下一个桶的平均点
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, count)
+        avg_count = avg_end - avg_start
+        avg_x = avg_y = 0.0
+        for j in range(avg_start, avg_end):
+            avg_x += points[j][0]
+            avg_y += points[j][1]
+        avg_x /= avg_count
+        avg_y /= avg_count
+
+        # 当前桶中选取三角形面积最大的点
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        ax, ay = points[a]
+        max_area = -1.0
+        next_a = range_start
+        for j in range(range_start, range_end):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > max_area:
+                max_area = area
+                next_a = j
+        result.append(points[next_a])
+        a = next_a
+    result.append(points[-1])
+    return result
+
+
+DOWNSAMPLERS = {
+    'lttb': lambda points, columns: downsample_lttb(points, 2 * columns),
+}
+
+
+# 曲线使用 Mesh 绘制: 顶点格式为默认的 (x, y, u, v), 不使用纹理坐标
+# 索引为16位无符号整数, 每个 Mesh 的顶点数有上限
+MESH_MAX_VERTICES = 65535
+MESH_INDEX_CACHE = {}
+
+
+def mesh_indices(kind, count):
+    # 'line_strip': count 个顶点依次相连; 'quads': count 个方块, 每块拆为两个三角形
+    # 按类型缓存最长的索引表, 取前缀即可
+    cached = MESH_INDEX_CACHE.get(kind)
+    size = count * 6 if kind == 'quads' else count
+    if cached is None or len(cached) < size:
+        if kind == 'quads':
+            cached = list(chain.from_iterable(
+                (i, i + 1, i + 2, i, i + 2, i + 3) for i in range(0, count * 4, 4)
+            ))
+        else:
+            cached = list(range(count))
+        MESH_INDEX_CACHE[kind] = cached
+    return cached[:size]
+
+
+# X轴时间刻度的候选间隔 (秒)
+TIME_TICK_STEPS = (1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200,
+                   10800, 21600, 43200, 86400, 172800, 604800)
+
+
+# 坐标轴标签纹理缓存: (文字, 字号, 颜色) -> texture, 避免每次重绘都重新栅格化
+LABEL_TEXTURE_CACHE = {}
+LABEL_TEXTURE_CACHE_SIZE = 256
+
+
+def label_texture(text, font_size=10, color=(0, 0, 0, 1)):
+    key = (text, font_size, tuple(color))
+    texture = LABEL_TEXTURE_CACHE.get(key)
+    if texture is None:
+        if len(LABEL_TEXTURE_CACHE) >= LABEL_TEXTURE_CACHE_SIZE:
+            LABEL_TEXTURE_CACHE.clear()
+        with PROFILER.span('label.rasterize', 'graph'):
+            core_label = CoreLabel(text=text, font_size=font_size, color=color)
+            core_label.refresh()
+            texture = core_label.texture
+        LABEL_TEXTURE_CACHE[key] = texture
+    return texture
+
+
+class HistoryStore:
+    # 本地历史数据存储 (SQLite): 每条记录是某口井一段连续时间内的完整数据, 以列式二进制帧保存
+    # 查询时把时间窗口划分为已缓存区间和缺失区间, 只向服务器请求缺失部分
+    # 总容量超出预算时淘汰最久未使用的数据段
+    SEGMENT_MAX_ROWS = 20000
+
+    def __init__(self, path, budget=HISTORY_STORE_BUDGET):
+        self.budget = budget
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS segments ('
+            'id INTEGER PRIMARY KEY, well_id TEXT, well_name TEXT, '
+            'start_ts REAL, end_ts REAL, rows INTEGER, bytes INTEGER, '
+            'last_used REAL, payload BLOB)'
+        )
+        self.db.execute('CREATE INDEX IF NOT EXISTS segments_well_ts ON segments (well_id, start_ts)')
+        self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def plan(self, well_id, start_time, end_time):
+        # 返回按时间排序的 ('cached'/'missing', 起点, 终点) 区间列表
+        with self.lock:
+            segments = self.db.execute(
+                'SELECT start_ts, end_ts FROM segments '
+                'WHERE well_id = ? AND end_ts >= ? AND start_ts <= ? ORDER BY start_ts',
+                (str(well_id), start_time, end_time)
+            ).fetchall()
+        pieces = []
+        cursor = start_time
+        for segment_start, segment_end in segments:
+            if segment_start > cursor:
+                pieces.append(('missing', cursor, segment_start))
+            piece_end = min(end_time, segment_end)
+            if piece_end >= cursor:
+                if pieces and pieces[-1][0] == 'cached':
+                    pieces[-1] = ('cached', pieces[-1][1], piece_end)
+                else:
+                    pieces.append(('cached', max(cursor, segment_start), piece_end))
+                cursor = piece_end
+        if cursor < end_time:
+            pieces.append(('missing', cursor, end_time))
+        return pieces
+
+    @profiled('store.load', 'storage')
+    def load(self, well_id, start_time, end_time):
+        with self.lock:
+            segments = self.db.execute(
+                'SELECT id, well_name, payload FROM segments '
+                'WHERE well_id = ? AND end_ts >= ? AND start_ts <= ? ORDER BY start_ts',
+                (str(well_id), start_time, end_time)
+            ).fetchall()
+            self.db.executemany(
+                'UPDATE segments SET last_used = ? WHERE id = ?',
+                [(time.time(), segment[0]) for segment in segments]
+            )
+            self.db.commit()
+        dataset = HistoryDataset(segments[0][1] if segments else '')
+        for _, well_name, payload in segments:
+            dataset.merge(decode_column_blob(payload, well_name).between(start_time, end_time))
+        dataset.start_time = start_time
+        dataset.end_time = end_time
+        return dataset
+
+    @profiled('store.save', 'storage')
+    def save(self, well_id, dataset, start_time, end_time):
+        # 保存完整覆盖 [start_time, end_time] 的数据; 与相邻数据段合并, 避免产生大量小段
+        if end_time <= start_time:
+            return
+        well_id = str(well_id)
+        part = dataset.between(start_time, end_time)
+        with self.lock:
+            neighbours = self.db.execute(
+                'SELECT id, start_ts, end_ts, rows, payload FROM segments '
+                'WHERE well_id = ? AND end_ts >= ? AND start_ts <= ? ORDER BY start_ts',
+                (well_id, start_time, end_time)
+            ).fetchall()
+            if neighbours and sum(n[3] for n in neighbours) + len(part) <= self.SEGMENT_MAX_ROWS:
+                pieces = [(n[1], decode_column_blob(n[4])) for n in neighbours]
+                pieces.append((start_time, part))
+                pieces.sort(key=lambda piece: piece[0])
+                combined = HistoryDataset(dataset.well_name)
+                for _, piece in pieces:
+                    combined.merge(piece)
+                start_time = min(start_time, neighbours[0][1])
+                end_time = max(end_time, max(n[2] for n in neighbours))
+                part = combined
+                self.db.executemany('DELETE FROM segments WHERE id = ?', [(n[0],) for n in neighbours])
+            payload = encode_column_frame(part)
+            self.db.execute(
+                'INSERT INTO segments (well_id, well_name, start_ts, end_ts, rows, bytes, last_used, payload) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (well_id, dataset.well_name, start_time, end_time, len(part), len(payload),
+                 time.time(), payload)
+            )
+            self.evict()
+            self.db.commit()
+
+    def evict(self):
+        # 超出容量预算时删除最久未使用的数据段 (调用方需持有锁)
+        total = self.db.execute('SELECT COALESCE(SUM(bytes), 0) FROM segments').fetchone()[0]
+        while total > self.budget:
+            oldest = self.db.execute(
+                'SELECT id, bytes FROM segments ORDER BY last_used LIMIT 1'
+            ).fetchone()
+            if oldest is None:
+                break
+            self.db.execute('DELETE FROM segments WHERE id = ?', (oldest[0],))
+            total -= oldest[1]
+
+    def size(self):
+        with self.lock:
+            return self.db.execute('SELECT COALESCE(SUM(bytes), 0) FROM segments').fetchone()[0]
+
+
+class TileCache:
+    # 内存中的历史数据块缓存 (LRU): 以 (井号, 时间块起点) 为键, 每块是 [起点, 起点+tile_seconds) 内的完整数据
+    # "当前时间前" 每次查询的起止时间都不同, 按对齐的时间块缓存后重复查询仍能命中
+    # 缓存的数据块不会被修改, 使用时复制
+    def __init__(self, budget=HISTORY_TILE_BUDGET, tile_seconds=HISTORY_TILE_SECONDS):
+        self.budget = budget
+        self.tile_seconds = tile_seconds
+        self.lock = threading.Lock()
+        self.tiles = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def tile_starts(self, start_time, end_time):
+        # 覆盖 [start_time, end_time] 的各时间块起点
+        size = self.tile_seconds
+        first = int(start_time // size) * size
+        return range(first, int(end_time) + 1, size)
+
+    def get(self, well_id, tile_start):
+        key = (str(well_id), tile_start)
+        with self.lock:
+            tile = self.tiles.get(key)
+            if tile is None:
+                self.misses += 1
+                return None
+            self.tiles.move_to_end(key)
+            self.hits += 1
+            return tile
+
+    def put(self, well_id, tile_start, dataset):
+        key = (str(well_id), tile_start)
+        size = dataset.nbytes
+        with self.lock:
+            old = self.tiles.pop(key, None)
+            if old is not None:
+                self.bytes -= old.nbytes
+            if size > self.budget:
+                return
+            self.tiles[key] = dataset
+            self.bytes += size
+            while self.bytes > self.budget:
+                _, oldest = self.tiles.popitem(last=False)
+                self.bytes -= oldest.nbytes
+                self.evictions += 1
+
+    def put_range(self, well_id, dataset, start_time, end_time):
+        # dataset 包含 [start_time, end_time] 内的全部数据, 把其中完整的时间块切分后放入缓存
+        size = self.tile_seconds
+        timestamps = dataset.timestamps
+        for tile_start in self.tile_starts(start_time, end_time):
+            if tile_start < start_time or tile_start + size > end_time:
+                continue
+            tile = dataset.slice(bisect_left(timestamps, tile_start),
+                                 bisect_left(timestamps, tile_start + size))
+            tile.start_time = tile_start
+            tile.end_time = tile_start + size
+            self.put(well_id, tile_start, tile)
+
+    def clear(self):
+        with self.lock:
+            self.tiles.clear()
+            self.bytes = 0
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'tiles': len(self.tiles),
+                'bytes': self.bytes,
+                'budget': self.budget,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class SessionCache:
+    # 本地快照 (JSON文件): 用户信息和井号列表各自带有保存时间, 井号列表另存服务器返回的 ETag
+    # 写入时先写临时文件再替换, 中途退出也不会留下损坏的文件
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return snapshot if isinstance(snapshot, dict) else {}
+
+    def save(self, key, data, **fields):
+        snapshot = self.load()
+        snapshot[key] = dict(fields, data=data, saved_at=time.time())
+        self.write(snapshot)
+
+    def remove(self, key):
+        snapshot = self.load()
+        if snapshot.pop(key, None) is not None:
+            self.write(snapshot)
+
+    def write(self, snapshot):
+        temp_path = self.path + '.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"保存本地数据失败: {str(e)}")
+
+
+class CsvExporter:
+    # 逐批把数据集写入CSV文件 (可选gzip压缩), 每批只格式化 EXPORT_CHUNK_ROWS 行
+    # 先写入 .part 临时文件, 完成后再改名; 取消或出错时删除, 不会留下不完整的文件
+    HEADER = ['序号', '时间'] + [f"{PARAM_NAMES[code]}({code})" for code in PARAM_CODES]
+
+    def __init__(self, path, compress=False):
+        self.path = path
+        self.part_path = path + '.part'
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # utf-8-sig: 带BOM, 表格软件打开时中文表头不乱码
+        if compress:
+            self.file = gzip.open(self.part_path, 'wt', compresslevel=EXPORT_GZIP_LEVEL,
+                                  encoding='utf-8-sig', newline='')
+        else:
+            self.file = open(self.part_path, 'w', encoding='utf-8-sig', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(self.HEADER)
+        self.rows = 0
+        self.cursor = None  # 已写入的最大 index, 重叠的数据不重复写入
+
+    def write(self, dataset, low=0, high=None, report=None):
+        # 写入第 low 到 high-1 行; 每批写完调用 report(已写入行数), 返回 False 时停止并返回 False
+        high = len(dataset) if high is None else high
+        if self.cursor is not None:
+            low = max(low, bisect_right(dataset.index, self.cursor, low, max(low, high)))
+        fromtimestamp = datetime.fromtimestamp
+        for start in range(low, high, EXPORT_CHUNK_ROWS):
+            end = min(start + EXPORT_CHUNK_ROWS, high)
+            columns = [map(format_value, dataset.columns[code][start:end]) for code in PARAM_CODES]
+            times = (fromtimestamp(t).isoformat(' ', 'seconds') for t in dataset.timestamps[start:end])
+            self.writer.writerows(zip(dataset.index[start:end], times, *columns))
+            self.rows += end - start
+            self.cursor = dataset.index[end - 1]
+            if report is not None and not report(self.rows):
+                return False
+        return True
+
+    def finish(self):
+        self.file.close()
+        os.replace(self.part_path, self.path)
+        return self.path
+
+    def abort(self):
+        self.file.close()
+        try:
+            os.remove(self.part_path)
+        except OSError:
+            pass
+
+
+class RingBuffer:
+    # 固定容量的环形缓冲区: 预分配数组, head 指向下一个写入位置, 内存占用恒定
+    def __init__(self, capacity, typecode='d'):
+        self.capacity = capacity
+        self.data = array(typecode, [0]) * capacity
+        self.head = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        # 按时间顺序索引, 0 为最早的数据
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError('RingBuffer index out of range')
+        return self.data[(self.head - self.count + i) % self.capacity]
+
+    def append(self, value):
+        self.data[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def extend(self, values):
+        for value in values:
+            self.append(value)
+
+    def values(self):
+        start = (self.head - self.count) % self.capacity
+        if start + self.count <= self.capacity:
+            return self.data[start:start + self.count]
+        return self.data[start:] + self.data[:self.head]
+
+    def latest(self, default=None):
+        if not self.count:
+            return default
+        return self.data[self.head - 1]
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+
+
+class RealtimeBuffer:
+    # 实时数据缓冲: 时间戳和各参数分别存放在等长的环形缓冲区中
+    def __init__(self, capacity):
+        self.timestamps = RingBuffer(capacity)
+        self.columns = {code: RingBuffer(capacity) for code in PARAM_CODES}
+        self.last_index = None
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def extend(self, dataset):
+        # 只追加比已有数据更新的样本, 返回新样本在 dataset 中的起始位置
+        start = 0
+        if self.last_index is not None:
+            while start < len(dataset) and dataset.index[start] <= self.last_index:
+                start += 1
+        if start >= len(dataset):
+            return start
+        self.timestamps.extend(dataset.timestamps[start:])
+        for code, column in self.columns.items():
+            column.extend(dataset.columns[code][start:])
+        self.last_index = dataset.index[-1]
+        return start
+
+    def clear(self):
+        self.timestamps.clear()
+        for column in self.columns.values():
+            column.clear()
+        self.last_index = None
+
+
+class RollingStats:
+    # 滑动时间窗口内的统计值, 每个样本均摊 O(1): 均值和方差用 Welford 方法增量更新
+    # (移出窗口的样本反向更新), 最小/最大值用单调队列; 样本数有上限, 内存占用恒定
+    def __init__(self, window=ALARM_WINDOW, capacity=None):
+        self.window = window
+        self.capacity = capacity or int(window * REALTIME_MAX_RATE * 2)
+        self.samples = deque()    # (时间戳, 值)
+        self.min_queue = deque()  # 值递增, 队首为窗口内最小值
+        self.max_queue = deque()  # 值递减, 队首为窗口内最大值
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def __len__(self):
+        return len(self.samples)
+
+    def add(self, timestamp, value):
+        sample = (timestamp, value)
+        self.samples.append(sample)
+        delta = value - self.mean
+        self.mean += delta / len(self.samples)
+        self.m2 += delta * (value - self.mean)
+        while self.min_queue and self.min_queue[-1][1] >= value:
+            self.min_queue.pop()
+        self.min_queue.append(sample)
+        while self.max_queue and self.max_queue[-1][1] <= value:
+            self.max_queue.pop()
+        self.max_queue.append(sample)
+        cutoff = timestamp - self.window
+        while self.samples[0][0] <= cutoff or len(self.samples) > self.capacity:
+            self.remove()
+
+    def remove(self):
+        sample = self.samples.popleft()
+        count = len(self.samples)
+        if count:
+            delta = sample[1] - self.mean
+            self.mean -= delta / count
+            self.m2 = max(0.0, self.m2 - delta * (sample[1] - self.mean))
+        else:
+            self.mean = self.m2 = 0.0
+        # 单调队列中保存的是同一个元组, 队首就是被移出的样本时一并移出
+        if self.min_queue[0] is sample:
+            self.min_queue.popleft()
+        if self.max_queue[0] is sample:
+            self.max_queue.popleft()
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / len(self.samples)) if self.samples else 0.0
+
+    @property
+    def minimum(self):
+        return self.min_queue[0][1] if self.min_queue else None
+
+    @property
+    def maximum(self):
+        return self.max_queue[0][1] if self.max_queue else None
+
+    @property
+    def latest(self):
+        return self.samples[-1][1] if self.samples else None
+
+    @property
+    def rate(self):
+        # 窗口内首尾样本之间的平均变化率 (每秒)
+        if len(self.samples) < 2:
+            return 0.0
+        (t0, v0), (t1, v1) = self.samples[0], self.samples[-1]
+        return (v1 - v0) / (t1 - t0) if t1 > t0 else 0.0
+
+
+def load_alarm_rules(path):
+    # 读取 alarms.json 中的报警规则, 文件不存在或格式错误时使用默认规则
+    try:
+        with open(path, encoding='utf-8') as f:
+            rules = json.load(f)
+        return [
+            {'code': rule['code'], 'kind': rule['kind'], 'limit': float(rule['limit']),
+             'clear': float(rule.get('clear', rule['limit']))}
+            for rule in rules
+            if rule['code'] in PARAM_CODES and rule['kind'] in ALARM_KIND_NAMES
+        ]
+    except FileNotFoundError:
+        return list(ALARM_RULES)
+    except (OSError, ValueError, TypeError, KeyError) as e:
+        print(f"报警规则格式错误, 使用默认规则: {str(e)}")
+        return list(ALARM_RULES)
+
+
+class AlarmEngine:
+    # 按井和参数保存滑动统计, 每个新样本更新统计后检查该参数的报警规则 (带回差, 不会反复跳变)
+    # 报警出现或解除时调用 on_change(), active 中保存当前所有报警
+    def __init__(self, rules=ALARM_RULES, window=ALARM_WINDOW, on_change=None):
+        self.window = window
+        self.on_change = on_change
+        self.rules = {code: [] for code in PARAM_CODES}
+        for number, rule in enumerate(rules):
+            self.rules[rule['code']].append((number, rule))
+        self.channels = {}  # (well_id, code) -> RollingStats
+        self.active = {}    # (well_id, 规则编号) -> 报警信息
+
+    def stats(self, well_id, code):
+        channel = self.channels.get((well_id, code))
+        if channel is None:
+            channel = self.channels[(well_id, code)] = RollingStats(self.window)
+        return channel
+
+    @profiled('alarms.feed', 'app')
+    def feed(self, well_id, dataset, start=0):
+        # 处理数据集中第 start 行之后的样本
+        changed = False
+        timestamps = dataset.timestamps
+        for code in PARAM_CODES:
+            channel = self.stats(well_id, code)
+            rules = self.rules[code]
+            column = dataset.columns[code]
+            for i in range(start, len(dataset)):
+                channel.add(timestamps[i], column[i])
+                for number, rule in rules:
+                    changed |= self.evaluate(well_id, number, rule, channel, timestamps[i])
+        if changed and self.on_change is not None:
+            self.on_change()
+
+    def evaluate(self, well_id, number, rule, channel, timestamp):
+        # 返回报警状态是否变化
+        kind = rule['kind']
+        value = abs(channel.rate) if kind == 'rate' else channel.latest
+        key = (well_id, number)
+        if key not in self.active:
+            exceeded = value < rule['limit'] if kind == 'low' else value > rule['limit']
+            if exceeded:
+                self.active[key] = dict(rule, well_id=well_id, value=value, since=timestamp)
+            return exceeded
+        cleared = value > rule['clear'] if kind == 'low' else value < rule['clear']
+        if cleared:
+            del self.active[key]
+        return cleared
+
+    def forget(self, well_id):
+        # 不再接收该井的数据: 清除统计和报警
+        for key in [key for key in self.channels if key[0] == well_id]:
+            del self.channels[key]
+        keys = [key for key in self.active if key[0] == well_id]
+        for key in keys:
+            del self.active[key]
+        if keys and self.on_change is not None:
+            self.on_change()
+
+    def alarms(self):
+        # 当前报警, 按开始时间排序
+        return sorted(self.active.values(), key=lambda alarm: alarm['since'])
+
+
+class GraphSeries:
+    # 曲线图中的一条曲线: 独立的Y轴范围、颜色和绘图指令组, 横坐标与其他曲线共用
+    # 隐藏时只把指令组移出画布, 不影响其他曲线
+    def __init__(self, color):
+        self.ys = array('d')
+        self.min_value = 0
+        self.max_value = 100
+        self.visible = True
+        self.stale = True
+        self.pyramid = None
+        self.reduced_cache = None
+        self.line_meshes = []
+        self.marker_meshes = []
+        self.color = Color(*color)
+        self.lines = InstructionGroup()
+        self.markers = InstructionGroup()
+        self.group = InstructionGroup()
+        for instruction in (self.color, self.lines, self.markers):
+            self.group.add(instruction)
+
 
 class CustomGraph(Widget):
+    # Y轴刻度显示的范围; 各曲线按各自的范围归一化显示
     min_value = NumericProperty(0)
     max_value = NumericProperty(100)
-    points = ListProperty([])
+    # 降采样方式: 'minmax' (极值金字塔) / 'lttb' / 'none', 每个像素列约保留2个点
+    downsample = OptionProperty('minmax', options=('minmax', 'lttb', 'none'))
+    # 当前显示的横坐标范围 (0-100%), 双指缩放和拖动平移时改变
+    view_start = NumericProperty(0)
+    view_end = NumericProperty(100)
+    # 横坐标 0% 和 100% 对应的时间戳, 设置后X轴标签显示实际时间
+    time_range = ListProperty([])
+    # 是否响应缩放/平移手势
+    zoomable = True
+    # 缩放后至少显示的样本数
+    MIN_VISIBLE_POINTS = 10
     
     def __init__(self, **kwargs):
+        self.x_values = array('d')
+        self.series = {}
+        self.view_key = None
+        self.active_touches = []
         super().__init__(**kwargs)
-        self.bind(size=self.redraw)
-        self.bind(pos=self.redraw)
-        self.bind(min_value=self.redraw)
-        self.bind(max_value=self.redraw)
-        self.bind(points=self.redraw)
         self.line_color = (1, 0, 0, 1)  # 默认红色
         self.bg_color = (1, 1, 1, 1)    # 白色背景
         self.grid_color = (0.8, 0.8, 0.8, 1)  # 浅灰色网格
         self.axis_color = (0, 0, 0, 1)  # 黑色坐标轴
         self.label_color = (0, 0, 0, 1)  # 黑色标签
+        
+        # 分层保留绘图指令, 属性变化时只重建受影响的图层
+        # 所有图层使用控件内的局部坐标, 位置变化只需更新平移
+        self.translate = Translate(*self.pos)
+        self.grid_layer = InstructionGroup()
+        self.label_layer = InstructionGroup()
+        # line_layer 供子类直接绘制单条曲线 (颜色由 set_line_color 设置), series_layer 存放各曲线的指令组
+        self.data_color = Color(*self.line_color)
+        self.line_layer = InstructionGroup()
+        self.series_layer = InstructionGroup()
+        self.canvas.add(PushMatrix())
+        self.canvas.add(self.translate)
+        self.canvas.add(self.grid_layer)
+        self.canvas.add(self.label_layer)
+        self.canvas.add(self.data_color)
+        self.canvas.add(self.line_layer)
+        self.canvas.add(self.series_layer)
+        self.canvas.add(PopMatrix())
+        
+        # 同一帧内的多次属性变化合并为一次重绘
+        self.dirty_layers = set()
+        self.redraw_trigger = Clock.create_trigger(self.flush_redraw)
+        self.bind(pos=self.update_translate)
+        self.bind(size=self.redraw)
+        self.bind(min_value=self.on_range_changed)
+        self.bind(max_value=self.on_range_changed)
+        self.bind(downsample=self.on_data_changed)
+        self.bind(view_start=self.on_data_changed)
+        self.bind(view_end=self.on_data_changed)
+        self.bind(time_range=self.on_range_changed)
         self.redraw()
 
     def set_line_color(self, color):
+        # 只更新颜色指令, 无需重绘
         self.line_color = color
-        self.redraw()
+        self.data_color.rgba = color
+    
+    def update_translate(self, *args):
+        self.translate.xy = self.pos
+    
+    def mark_dirty(self, *layers):
+        self.dirty_layers.update(layers)
+        self.redraw_trigger()
     
     def redraw(self, *args):
-        self.canvas.clear()
-        
-        with self.canvas:
-            # 绘制背景
-            Color(*self.bg_color)
-            Rectangle(pos=self.pos, size=self.size)
-            
-            # 绘制网格和坐标轴
-            self.draw_grid_and_axes()
-            
-            # 绘制曲线
-            if self.points:
-                self.draw_line()
+        self.mark_dirty('grid', 'labels', 'line')
     
-    def draw_grid_and_axes(self):
-        padding = 20
-        width, height = self.size
+    def on_range_changed(self, *args):
+        self.mark_dirty('labels')
+    
+    def on_data_changed(self, *args):
+        self.mark_dirty('labels', 'line')
+    
+    @property
+    def has_data(self):
+        return len(self.x_values) > 0 and bool(self.series)
+    
+    def set_x_values(self, xs):
+        # 所有曲线共用的横坐标 (0-100%, 升序), 变化后所有曲线都需要重绘
+        self.x_values = xs
+        for series in self.series.values():
+            series.stale = True
+        self.mark_dirty('labels', 'line')
+    
+    def set_series(self, name, ys, min_value, max_value, color=None):
+        # 添加或更新一条曲线, 只重绘这一条
+        series = self.series.get(name)
+        if series is None:
+            series = GraphSeries(color or self.line_color)
+            self.series[name] = series
+            self.series_layer.add(series.group)
+        elif color is not None:
+            series.color.rgba = color
+        series.ys = ys
+        series.min_value = min_value
+        series.max_value = max_value
+        series.stale = True
+        self.mark_dirty('line')
+        return series
+    
+    def set_series_visible(self, name, visible):
+        # 显示/隐藏一条曲线: 只把它的指令组加入或移出画布, 隐藏期间错过的更新在显示时补画
+        series = self.series.get(name)
+        if series is None or series.visible == visible:
+            return
+        series.visible = visible
+        if visible:
+            self.series_layer.add(series.group)
+            if series.stale:
+                self.mark_dirty('line')
+        else:
+            self.series_layer.remove(series.group)
+    
+    def clear_series(self):
+        self.series.clear()
+        self.series_layer.clear()
+        self.x_values = array('d')
+        self.mark_dirty('labels', 'line')
+    
+    def reset_view(self):
+        self.view_start = 0
+        self.view_end = 100
+    
+    def set_view(self, start, end):
+        # 保持显示范围在 0-100% 之内, 并限制最大放大倍数: 显示范围内至少有 MIN_VISIBLE_POINTS 个点
+        # 按中心附近的点计算, 数据密度不均匀 (例如聚合数据中拼接了原始数据) 时也能放大到局部细节
+        xs = self.x_values
+        min_span = 100.0
+        if len(xs) > self.MIN_VISIBLE_POINTS:
+            i = bisect_left(xs, (start + end) / 2)
+            low = max(0, min(i - self.MIN_VISIBLE_POINTS // 2, len(xs) - 1 - self.MIN_VISIBLE_POINTS))
+            min_span = xs[low + self.MIN_VISIBLE_POINTS] - xs[low]
+        span = max(min_span, min(100.0, end - start))
+        start = max(0.0, min(start, 100.0 - span))
+        self.view_start = start
+        self.view_end = start + span
+    
+    def view_x(self, x):
+        # 控件坐标转换为数据横坐标
+        padding = 20
+        grid_width = max(1, self.width - 2 * padding)
+        span = self.view_end - self.view_start
+        return self.view_start + (x - self.x - padding) / grid_width * span
+    
+    def zoom_at(self, x, factor):
+        # 以 x 处为中心缩放, factor < 1 为放大
+        anchor = self.view_x(x)
+        self.set_view(anchor - (anchor - self.view_start) * factor,
+                      anchor + (self.view_end - anchor) * factor)
+    
+    def pan_by(self, dx):
+        padding = 20
+        grid_width = max(1, self.width - 2 * padding)
+        shift = -dx / grid_width * (self.view_end - self.view_start)
+        self.set_view(self.view_start + shift, self.view_end + shift)
+    
+    def on_touch_down(self, touch):
+        if not self.zoomable or not self.has_data or not self.collide_point(*touch.pos):
+            return super().on_touch_down(touch)
+        if touch.is_mouse_scrolling:
+            # 鼠标滚轮缩放 (桌面调试)
+            if touch.button in ('scrolldown', 'scrollup'):
+                self.zoom_at(touch.x, 0.8 if touch.button == 'scrolldown' else 1.25)
+            return True
+        if touch.is_double_tap:
+            self.reset_view()
+            return True
+        touch.grab(self)
+        self.active_touches.append(touch)
+        return True
+    
+    def on_touch_move(self, touch):
+        if touch.grab_current is not self:
+            return super().on_touch_move(touch)
+        touches = self.active_touches
+        if len(touches) == 1:
+            self.pan_by(touch.dx)
+        elif touch in touches[:2]:
+            # 双指缩放: 按两指水平间距的变化缩放, 中点保持不动
+            other = touches[1] if touch is touches[0] else touches[0]
+            before = abs(touch.px - other.x)
+            after = abs(touch.x - other.x)
+            if before > 1 and after > 1:
+                self.zoom_at((touch.x + other.x) / 2, before / after)
+        return True
+    
+    def on_touch_up(self, touch):
+        if touch.grab_current is not self:
+            return super().on_touch_up(touch)
+        touch.ungrab(self)
+        if touch in self.active_touches:
+            self.active_touches.remove(touch)
+        return True
+    
+    def flush_redraw(self, *args):
+        dirty = self.dirty_layers
+        self.dirty_layers = set()
+        if 'grid' in dirty:
+            with PROFILER.span('graph.grid', 'graph'):
+                self.draw_grid_and_axes()
+        if 'labels' in dirty:
+            with PROFILER.span('graph.labels', 'graph'):
+                self.draw_axis_labels()
+        if 'line' in dirty:
+            with PROFILER.span('graph.line', 'graph'):
+                self.draw_line()
+    
+    def draw_grid_and_axes(self):
+        padding = 20
+        width, height = self.size
         grid_width = width - 2 * padding
         grid_height = height - 2 * padding
+        layer = self.grid_layer
+        layer.clear()
+        
+        # 绘制背景
+        layer.add(Color(*self.bg_color))
+        layer.add(Rectangle(pos=(0, 0), size=self.size))
         
         # 绘制网格
-        Color(*self.grid_color)
+        layer.add(Color(*self.grid_color))
         
         # 水平网格线 (10条)
         for i in range(11):
             y = padding + grid_height * i / 10
-            Line(points=[padding, y, width - padding, y], width=0.5)
+            layer.add(Line(points=[padding, y, width - padding, y], width=0.5))
         
         # 垂直网格线 (10条)
         for i in range(11):
             x = padding + grid_width * i / 10
-            Line(points=[x, padding, x, height - padding], width=0.5)
+            layer.add(Line(points=[x, padding, x, height - padding], width=0.5))
         
         # 绘制坐标轴
-        Color(*self.axis_color)
+        layer.add(Color(*self.axis_color))
         # X轴
-        Line(points=[padding, padding, width - padding, padding], width=1.5)
+        layer.add(Line(points=[padding, padding, width - padding, padding], width=1.5))
         # Y轴
-        Line(points=[padding, padding, padding, height - padding], width=1.5)
+        layer.add(Line(points=[padding, padding, padding, height - padding], width=1.5))
+    
+    def draw_axis_labels(self):
+        padding = 20
+        width, height = self.size
+        grid_height = height - 2 * padding
+        layer = self.label_layer
+        layer.clear()
         
         # 绘制刻度标签
-        Color(*self.label_color)
+        layer.add(Color(*self.label_color))
         # Y轴标签
         value_range = self.max_value - self.min_value
         for i in range(11):
             value = self.min_value + value_range * i / 10
             y = padding + grid_height * i / 10
-            
-            # 使用 CoreLabel 创建文本标签
-            core_label = CoreLabel(
-                text=f"{value:.1f}",
-                font_size=10,
-                color=self.label_color
-            )
-            core_label.refresh()
-            
-            # 获取纹理
-            texture = core_label.texture
+            texture = label_texture(f"{value:.1f}", 10, self.label_color)
             if texture:
                 # 计算位置（左下角为原点）
-                pos_x = self.pos[0] + 5
-                pos_y = self.pos[1] + y - texture.height / 2
-                
-                # 绘制纹理
-                Rectangle(
+                layer.add(Rectangle(
                     texture=texture,
-                    pos=(pos_x, pos_y),
+                    pos=(5, y - texture.height / 2),
                     size=texture.size
-                )
+                ))
         
         # X轴标签（时间）
-        if self.points:
-            # 使用 CoreLabel 创建第一个标签
-            core_label_start = CoreLabel(text="0", font_size=10, color=self.label_color)
-            core_label_start.refresh()
-            texture_start = core_label_start.texture
+        if self.has_data and len(self.time_range) == 2:
+            self.draw_time_labels(layer, padding, width - 2 * padding)
+        elif self.has_data:
+            texture_start = label_texture(f"{self.view_start:.0f}%", 10, self.label_color)
             if texture_start:
-                # 计算位置
-                pos_x = self.pos[0] + padding
-                pos_y = self.pos[1] + padding - 15
-                Rectangle(
+                layer.add(Rectangle(
                     texture=texture_start,
-                    pos=(pos_x, pos_y),
+                    pos=(padding, padding - 15),
                     size=texture_start.size
-                )
+                ))
             
-            # 使用 CoreLabel 创建最后一个标签
-            core_label_end = CoreLabel(text="100%", font_size=10, color=self.label_color)
-            core_label_end.refresh()
-            texture_end = core_label_end.texture
+            texture_end = label_texture(f"{self.view_end:.0f}%", 10, self.label_color)
             if texture_end:
-                # 计算位置
-                pos_x = self.pos[0] + width - padding - 30
-                pos_y = self.pos[1] + padding - 15
-                Rectangle(
+                layer.add(Rectangle(
                     texture=texture_end,
-                    pos=(pos_x, pos_y),
+                    pos=(width - padding - 30, padding - 15),
                     size=texture_end.size
-                )
+                ))
+    
+    def draw_time_labels(self, layer, padding, grid_width):
+        # 刻度取整到合适的时间间隔, 平移时标签文字不变, 可以复用纹理缓存
+        time_start, time_end = self.time_range
+        time_scale = (time_end - time_start) / 100.0
+        view_from = time_start + self.view_start * time_scale
+        view_to = time_start + self.view_end * time_scale
+        span = view_to - view_from
+        if span <= 0:
+            return
+        step = next((step for step in TIME_TICK_STEPS if span / step <= 5), TIME_TICK_STEPS[-1])
+        if step >= 86400:
+            fmt = '%m-%d'
+        elif span > 86400:
+            fmt = '%m-%d %H:%M'
+        elif step >= 60:
+            fmt = '%H:%M'
+        else:
+            fmt = '%H:%M:%S'
+        
+        # 按本地时间对齐刻度
+        offset = time.localtime(view_from).tm_gmtoff
+        tick = math.ceil((view_from + offset) / step) * step - offset
+        x_scale = grid_width / span
+        while tick <= view_to:
+            x = padding + (tick - view_from) * x_scale
+            layer.add(Line(points=[x, padding, x, padding - 4], width=1))
+            texture = label_texture(datetime.fromtimestamp(tick).strftime(fmt), 10, self.label_color)
+            if texture:
+                layer.add(Rectangle(
+                    texture=texture,
+                    pos=(x - texture.width / 2, padding - 4 - texture.height),
+                    size=texture.size
+                ))
+            tick += step
+    
+    def visible_points(self, series, columns):
+        # 返回 (可见范围内的点, 是否经过抽稀, 第一个点在整条曲线中的序号)
+        xs = self.x_values
+        ys = series.ys
+        pyramid = series.pyramid
+        if pyramid is None or pyramid.xs is not xs or pyramid.count != len(ys):
+            pyramid = series.pyramid = MinMaxPyramid(xs, ys)
+        if self.downsample == 'minmax':
+            indices, level = pyramid.visible(self.view_start, self.view_end, columns)
+            if not len(indices):
+                return [], False, 0
+            return [(xs[i], ys[i]) for i in indices], level > 0, indices[0]
+        
+        # 其他方式: 先截取可见部分, 降采样结果在范围不变时直接复用
+        key = (id(xs), len(ys), columns, self.downsample, self.view_start, self.view_end)
+        if series.reduced_cache and series.reduced_cache[0] == key:
+            return series.reduced_cache[1]
+        indices, _ = pyramid.visible(self.view_start, self.view_end, len(ys))
+        if not len(indices):
+            return [], False, 0
+        visible = [(xs[i], ys[i]) for i in indices]
+        downsampler = DOWNSAMPLERS.get(self.downsample)
+        reduced = downsampler(visible, columns) if downsampler else visible
+        series.reduced_cache = (key, (reduced, len(reduced) < len(visible), indices[0]))
+        return series.reduced_cache[1]
+    
+    def update_meshes(self, layer, meshes, mode, chunks):
+        # chunks: [(顶点, 索引)]; 复用已有的 Mesh 只替换顶点, 顶点数不变时索引不重新上传
+        while len(meshes) < len(chunks):
+            mesh = Mesh(mode=mode)
+            layer.add(mesh)
+            meshes.append(mesh)
+        while len(meshes) > len(chunks):
+            layer.remove(meshes.pop())
+        for mesh, (vertices, indices) in zip(meshes, chunks):
+            if len(mesh.indices) != len(indices):
+                mesh.indices = indices
+            mesh.vertices = vertices
     
     def draw_line(self):
-        if not self.points:
+        # 尺寸或显示范围变化时重绘所有可见曲线, 否则只重绘数据有变化的曲线
+        view_key = (tuple(self.size), self.view_start, self.view_end, self.downsample)
+        redraw_all = view_key != self.view_key
+        self.view_key = view_key
+        for series in self.series.values():
+            if redraw_all:
+                series.stale = True
+            if series.visible and series.stale:
+                self.draw_series(series)
+                series.stale = False
+    
+    def draw_series(self, series):
+        if not len(self.x_values) or not len(series.ys):
+            self.update_meshes(series.lines, series.line_meshes, 'line_strip', [])
+            self.update_meshes(series.markers, series.marker_meshes, 'triangles', [])
             return
             
         padding = 20
         width, height = self.size
         grid_width = width - 2 * padding
         grid_height = height - 2 * padding
-        value_range = self.max_value - self.min_value
+        min_value = series.min_value
+        max_value = series.max_value
+        y_scale = grid_height / (max_value - min_value or 1)
+        view_start = self.view_start
+        x_scale = grid_width / ((self.view_end - view_start) or 1)
         
-        # 计算实际坐标点
-        scaled_points = []
-        for x, y in self.points:
-            # 确保值在范围内
-            y = max(self.min_value, min(y, self.max_value))
-            
-            # 计算在画布上的位置
-            x_pos = self.pos[0] + padding + grid_width * x / 100
-            y_pos = self.pos[1] + padding + grid_height * (y - self.min_value) / value_range
-            scaled_points.extend([x_pos, y_pos])
-        
-        # 绘制曲线
-        Color(*self.line_color)
-        Line(points=scaled_points, width=1.5)
-        
-        # 绘制数据点（每5个点画一个）
-        for i in range(0, len(scaled_points), 10):
-            if i+1 < len(scaled_points):
-                x = scaled_points[i]
-                y = scaled_points[i+1]
-                Ellipse(pos=(x-2, y-2), size=(4, 4))
+        # 只取可见范围, 点数远多于像素列时使用抽稀后的数据
+        points, reduced, first = self.visible_points(series, max(1, int(grid_width)))
+        
+        # 一次性计算所有顶点坐标, 数值限制在Y轴范围内
+        x_offset = padding - view_start * x_scale
+        y_offset = padding - min_value * y_scale
+        vertices = list(chain.from_iterable(
+            (x_offset + x * x_scale,
+             y_offset + (min_value if y < min_value else max_value if y > max_value else y) * y_scale,
+             0, 0)
+            for x, y in points
+        ))
+        
+        # 两端超出绘图区域的线段截断到边界
+        left, right = padding, width - padding
+        if len(vertices) >= 8:
+            for end, inner, bound in ((0, 4, left), (len(vertices) - 4, len(vertices) - 8, right)):
+                x0, x1 = vertices[end], vertices[inner]
+                if (x0 < bound if end == 0 else x0 > bound) and x1 != x0:
+                    ratio = (bound - x0) / (x1 - x0)
+                    vertices[end] = bound
+                    vertices[end + 1] += (vertices[inner + 1] - vertices[end + 1]) * ratio
+        
+        # 绘制曲线: 每个 Mesh 最多 MESH_MAX_VERTICES 个顶点, 相邻两段共用一个顶点保证连续
+        chunks = []
+        count = len(vertices) // 4
+        for start in range(0, max(1, count - 1), MESH_MAX_VERTICES - 1):
+            end = min(count, start + MESH_MAX_VERTICES)
+            chunks.append((vertices[4 * start:4 * end], mesh_indices('line_strip', end - start)))
+        self.update_meshes(series.lines, series.line_meshes, 'line_strip', chunks)
+        
+        # 抽稀后的点过于密集, 不再绘制数据点
+        if reduced:
+            self.update_meshes(series.markers, series.marker_meshes, 'triangles', [])
+            return
+        
+        # 绘制数据点（每5个点画一个）, 按在整条曲线中的序号选取, 平移时位置不跳动
+        # 每个数据点是一个 4x4 的方块 (4个顶点, 2个三角形)
+        centers = [(vertices[i], vertices[i + 1])
+                   for i in range(-first % 5 * 4, len(vertices), 20)
+                   if left <= vertices[i] <= right]
+        marker_vertices = list(chain.from_iterable(
+            (x - 2, y - 2, 0, 0, x + 2, y - 2, 0, 0, x + 2, y + 2, 0, 0, x - 2, y + 2, 0, 0)
+            for x, y in centers
+        ))
+        chunks = []
+        per_mesh = MESH_MAX_VERTICES // 4
+        for start in range(0, len(centers), per_mesh):
+            end = min(len(centers), start + per_mesh)
+            chunks.append((marker_vertices[16 * start:16 * end], mesh_indices('quads', end - start)))
+        self.update_meshes(series.markers, series.marker_meshes, 'triangles', chunks)
+
+class RealtimeGraph(CustomGraph):
+    # 实时曲线: 顶点以原始数据单位 (秒, 数值) 分块追加, 每次只上传最后一块
+    # 滚动和缩放只更新变换矩阵, 超出时间窗口的块整体移除, 内存占用恒定
+    window = NumericProperty(REALTIME_WINDOW)
+    CHUNK_SIZE = 256
+    zoomable = False
+    
+    def __init__(self, **kwargs):
+        self.chunks = deque()
+        self.time_origin = None
+        self.latest_time = 0
+        super().__init__(**kwargs)
+        self.downsample = 'none'
+        self.bind(window=self.on_range_changed)
+        
+        # 曲线限制在绘图区域内
+        self.clip_rect = Rectangle()
+        self.unclip_rect = Rectangle()
+        self.data_translate = Translate()
+        self.data_scale = Scale(1, 1, 1)
+        self.chunk_group = InstructionGroup()
+        for instruction in (StencilPush(), self.clip_rect, StencilUse(),
+                            PushMatrix(), self.data_translate, self.data_scale,
+                            self.chunk_group, PopMatrix(),
+                            StencilUnUse(), self.unclip_rect, StencilPop()):
+            self.line_layer.add(instruction)
+    
+    def on_range_changed(self, *args):
+        # 变换矩阵取决于Y轴范围和时间窗口
+        self.mark_dirty('labels', 'line')
+    
+    def reset(self):
+        self.chunks.clear()
+        self.chunk_group.clear()
+        self.time_origin = None
+        self.latest_time = 0
+        self.min_value = 0
+        self.max_value = 100
+        self.mark_dirty('line')
+    
+    def append_samples(self, timestamps, values):
+        if not timestamps:
+            return
+        if self.time_origin is None:
+            self.time_origin = timestamps[0]
+            low, high = min(values), max(values)
+            padding = (high - low) * 0.1 or 1
+            self.min_value = low - padding
+            self.max_value = high + padding
+        origin = self.time_origin
+        
+        chunk = self.chunks[-1] if self.chunks else None
+        touched = []
+        for t, value in zip(timestamps, values):
+            if chunk is None or len(chunk[1]) >= 2 * self.CHUNK_SIZE:
+                # 新块从上一块的最后一个点开始, 保证曲线连续
+                chunk = [Line(points=[], width=1), chunk[1][-2:] if chunk else [], 0]
+                self.chunks.append(chunk)
+                self.chunk_group.add(chunk[0])
+            chunk[1].extend((t - origin, value))
+            chunk[2] = t - origin
+            if not touched or touched[-1] is not chunk:
+                touched.append(chunk)
+        for chunk in touched:
+            chunk[0].points = chunk[1]
+        self.latest_time = timestamps[-1] - origin
+        
+        # 移除完全滑出时间窗口的块
+        window_start = self.latest_time - self.window
+        while len(self.chunks) > 1 and self.chunks[0][2] < window_start:
+            self.chunk_group.remove(self.chunks.popleft()[0])
+        
+        # 超出当前Y轴范围时扩大范围（留10%的余量）
+        low, high = min(values), max(values)
+        if low < self.min_value or high > self.max_value:
+            low = min(low, self.min_value)
+            high = max(high, self.max_value)
+            padding = (high - low) * 0.1
+            self.min_value = low - padding
+            self.max_value = high + padding
+        self.mark_dirty('line')
+    
+    def draw_line(self):
+        # 只更新裁剪区域和变换矩阵, 不重建顶点
+        padding = 20
+        width, height = self.size
+        grid_width = max(1, width - 2 * padding)
+        grid_height = max(1, height - 2 * padding)
+        self.clip_rect.pos = self.unclip_rect.pos = (padding, padding)
+        self.clip_rect.size = self.unclip_rect.size = (grid_width, grid_height)
+        
+        scale_x = grid_width / self.window
+        scale_y = grid_height / ((self.max_value - self.min_value) or 1)
+        window_start = self.latest_time - self.window
+        self.data_scale.x = scale_x
+        self.data_scale.y = scale_y
+        self.data_translate.xy = (padding - window_start * scale_x,
+                                  padding - self.min_value * scale_y)
+
+
+class TableRow(BoxLayout):
+    # 表格中的一行: 固定数量的单元格标签, 滚动时重新填充文字即可复用
+    def __init__(self, cols=7, row_height=30, **kwargs):
+        super().__init__(size_hint_y=None, height=row_height, spacing=5, **kwargs)
+        self.index = -1
+        self.cells = []
+        for _ in range(cols):
+            cell = Label()
+            self.cells.append(cell)
+            self.add_widget(cell)
+
+    def set_values(self, values):
+        for cell, value in zip(self.cells, values):
+            cell.text = value
+
+
+class DateTimePicker(BoxLayout):
+    # 日期时间选择: 日期 (最近 days 天)、小时、分钟 (5分钟间隔) 三个下拉框
+    def __init__(self, value, days=HISTORY_RANGE_DAYS, **kwargs):
+        super().__init__(spacing=2, **kwargs)
+        self.days = days
+        self.date_spinner = Spinner(size_hint_x=0.5)
+        self.hour_spinner = Spinner(values=[f"{h:02d}" for h in range(24)], size_hint_x=0.25)
+        self.minute_spinner = Spinner(values=[f"{m:02d}" for m in range(0, 60, 5)], size_hint_x=0.25)
+        self.add_widget(self.date_spinner)
+        self.add_widget(self.hour_spinner)
+        self.add_widget(self.minute_spinner)
+        self.set_value(value)
+
+    def refresh_dates(self):
+        # 界面建好后会一直保留, 跨过午夜后要重新生成日期列表, 否则"今天"不在可选范围内
+        today = datetime.now().date()
+        self.date_spinner.values = [(today - timedelta(days=i)).isoformat() for i in range(self.days)]
+
+    def set_value(self, value):
+        self.refresh_dates()
+        self.date_spinner.text = value.date().isoformat()
+        self.hour_spinner.text = f"{value.hour:02d}"
+        self.minute_spinner.text = f"{value.minute // 5 * 5:02d}"
+
+    @property
+    def value(self):
+        return datetime.fromisoformat(
+            f"{self.date_spinner.text} {self.hour_spinner.text}:{self.minute_spinner.text}:00")
+
+
+class VirtualTable(ScrollView):
+    # 虚拟化表格: 只为可见区域创建行控件, 滚动时复用并按需从数据源取值
+    # 数据源只需提供 len() 和 row_values(i), 行数再多内存占用也保持不变
+    def __init__(self, cols=7, row_height=30, **kwargs):
+        super().__init__(**kwargs)
+        self.cols = cols
+        self.row_height = row_height
+        self.source = None
+        self.rows = []
+        self.content = RelativeLayout(size_hint_y=None, height=0)
+        self.add_widget(self.content)
+        self.bind(scroll_y=self.update_rows, height=self.update_rows)
+
+    def set_source(self, source):
+        self.source = source
+        self.scroll_y = 1
+        self.refresh()
+
+    def refresh(self):
+        # 数据源内容变化后调用, 强制重新填充所有可见行
+        count = len(self.source) if self.source is not None else 0
+        self.content.height = count * self.row_height
+        for row in self.rows:
+            row.index = -1
+        self.update_rows()
+
+    @profiled('table.update_rows', 'ui')
+    def update_rows(self, *args):
+        count = len(self.source) if self.source is not None else 0
+        row_height = self.row_height
+        pool_size = min(count, int(self.height // row_height) + 2)
+
+        # 行控件池大小只取决于可见高度
+        while len(self.rows) < pool_size:
+            row = TableRow(cols=self.cols, row_height=row_height)
+            self.rows.append(row)
+            self.content.add_widget(row)
+        while len(self.rows) > pool_size:
+            self.content.remove_widget(self.rows.pop())
+        if not pool_size:
+            return
+
+        content_height = self.content.height
+        scrollable = max(0, content_height - self.height)
+        offset = (1 - self.scroll_y) * scrollable
+        first = int(offset // row_height)
+        first = max(0, min(first, count - pool_size))
+
+        for k, row in enumerate(self.rows):
+            i = first + k
+            row.y = content_height - (i + 1) * row_height
+            if row.index != i:
+                row.index = i
+                row.set_values(self.source.row_values(i))
+
 
 class LoginScreen(Screen):
     def __init__(self, **kwargs):
@@ -207,7 +2375,7 @@ class LoginScreen(Screen):
         
         # 按钮区域
         btn_layout = BoxLayout(spacing=10, size_hint_y=0.2)
-        login_btn = Button(
+        self.login_btn = Button(
             text="登录", 
             on_press=self.login,
             background_color=(0.2, 0.6, 0.4, 1),
@@ -219,7 +2387,7 @@ class LoginScreen(Screen):
             background_color=(0.6, 0.4, 0.2, 1),
             size_hint_x=0.4
         )
-        btn_layout.add_widget(login_btn)
+        btn_layout.add_widget(self.login_btn)
         btn_layout.add_widget(register_btn)
         
         layout.add_widget(title)
@@ -233,20 +2401,38 @@ class LoginScreen(Screen):
             self.show_message("请输入11位手机号")
             return
             
+        self.login_btn.text = "登录中..."
+        app = App.get_running_app()
+        app.executor.submit(
+            'login',
+            lambda: app.api.post('/api/login', json={'phone': phone}),
+            on_success=lambda response: self.on_login_response(response, phone),
+            on_error=self.on_login_error,
+            signature=phone
+        )
+
+    def on_login_response(self, response, phone):
+        self.login_btn.text = "登录"
         try:
-            response = requests.post(f"{SERVER_URL}/api/login", json={'phone': phone})
             if response.status_code == 200:
                 user_data = response.json()
                 app = App.get_running_app()
-                app.user_data = user_data
+                app.login(user_data, phone)
+                # 登录成功后在后台加载井号列表, 进入查询界面时通常已经就绪
+                app.load_wells()
                 self.manager.current = 'main'
             else:
                 error_msg = response.json().get('message', '登录失败')
                 self.show_message(error_msg)
-        except requests.exceptions.ConnectionError:
-            self.show_message("无法连接到服务器，请检查网络")
         except Exception as e:
             self.show_message(f"登录错误: {str(e)}")
+
+    def on_login_error(self, error):
+        self.login_btn.text = "登录"
+        if is_connection_error(error):
+            self.show_message("无法连接到服务器，请检查网络")
+        else:
+            self.show_message(f"登录错误: {str(error)}")
     
     def show_message(self, message):
         # 在实际应用中，可以添加一个弹出框显示消息
@@ -255,235 +2441,1183 @@ class LoginScreen(Screen):
     def show_register(self, instance):
         self.manager.current = 'register'
 
-class RegisterScreen(Screen):
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        
-        layout = BoxLayout(orientation='vertical', padding=20, spacing=15)
-        
-        # 标题
-        title = Label(
-            text="新用户注册", 
-            font_size=24, 
-            size_hint_y=0.15,
-            bold=True,
-            color=(0.2, 0.4, 0.6, 1)
+class RegisterScreen(Screen):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        
+        layout = BoxLayout(orientation='vertical', padding=20, spacing=15)
+        
+        # 标题
+        title = Label(
+            text="新用户注册", 
+            font_size=24, 
+            size_hint_y=0.15,
+            bold=True,
+            color=(0.2, 0.4, 0.6, 1)
+        )
+        
+        # 注册表单
+        form = GridLayout(cols=2, spacing=10, size_hint_y=0.6)
+        
+        form.add_widget(Label(text="姓名:", bold=True))
+        self.name_input = TextInput(
+            multiline=False, 
+            hint_text="请输入姓名",
+            size_hint_y=None,
+            height=40
+        )
+        form.add_widget(self.name_input)
+        
+        form.add_widget(Label(text="手机号:", bold=True))
+        self.phone_input = TextInput(
+            multiline=False, 
+            input_filter='int',
+            hint_text="请输入11位手机号",
+            size_hint_y=None,
+            height=40
+        )
+        form.add_widget(self.phone_input)
+        
+        form.add_widget(Label(text="公司:", bold=True))
+        self.company_input = TextInput(
+            multiline=False, 
+            hint_text="请输入公司名称",
+            size_hint_y=None,
+            height=40
+        )
+        form.add_widget(self.company_input)
+        
+        # 按钮区域
+        btn_layout = BoxLayout(spacing=10, size_hint_y=0.15)
+        self.submit_btn = Button(
+            text="提交", 
+            on_press=self.register,
+            background_color=(0.2, 0.6, 0.4, 1)
+        )
+        back_btn = Button(
+            text="返回", 
+            on_press=self.back_to_login,
+            background_color=(0.8, 0.3, 0.3, 1)
+        )
+        btn_layout.add_widget(back_btn)
+        btn_layout.add_widget(self.submit_btn)
+        
+        layout.add_widget(title)
+        layout.add_widget(form)
+        layout.add_widget(btn_layout)
+        self.add_widget(layout)
+    
+    def register(self, instance):
+        name = self.name_input.text.strip()
+        phone = self.phone_input.text.strip()
+        company = self.company_input.text.strip()
+        
+        if not name:
+            self.show_message("请输入姓名")
+            return
+        if not phone or len(phone) != 11:
+            self.show_message("请输入11位手机号")
+            return
+        if not company:
+            self.show_message("请输入公司名称")
+            return
+        
+        data = {
+            'name': name,
+            'phone': phone,
+            'company': company
+        }
+        
+        self.submit_btn.text = "提交中..."
+        app = App.get_running_app()
+        app.executor.submit(
+            'register',
+            lambda: app.api.post('/api/register', json=data),
+            on_success=self.on_register_response,
+            on_error=self.on_register_error,
+            signature=(name, phone, company)
+        )
+
+    def on_register_response(self, response):
+        self.submit_btn.text = "提交"
+        try:
+            if response.status_code == 200:
+                self.show_message("注册成功！")
+                self.back_to_login(None)
+            else:
+                error_msg = response.json().get('message', '注册失败')
+                self.show_message(error_msg)
+        except Exception as e:
+            self.show_message(f"注册错误: {str(e)}")
+
+    def on_register_error(self, error):
+        self.submit_btn.text = "提交"
+        if is_connection_error(error):
+            self.show_message("无法连接到服务器，请检查网络")
+        else:
+            self.show_message(f"注册错误: {str(error)}")
+    
+    def show_message(self, message):
+        # 在实际应用中，可以添加一个弹出框显示消息
+        print(message)
+    
+    def back_to_login(self, instance):
+        self.manager.current = 'login'
+
+class MainScreen(Screen):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        
+        main_layout = BoxLayout(orientation='vertical')
+        
+        # 顶部用户信息栏
+        user_bar = BoxLayout(
+            size_hint_y=0.1,
+            padding=10,
+            spacing=10
+        )
+        self.user_label = Label(
+            text="", 
+            font_size=18,
+            halign='left',
+            valign='middle',
+            size_hint_x=0.8
+        )
+        logout_btn = Button(
+            text="退出", 
+            size_hint_x=0.2,
+            background_color=(0.8, 0.3, 0.3, 1),
+            on_press=self.logout
+        )
+        user_bar.add_widget(self.user_label)
+        user_bar.add_widget(logout_btn)
+        
+        # 主内容区域
+        content = BoxLayout(orientation='vertical')
+        
+        # 欢迎信息
+        self.welcome_label = Label(
+            text="欢迎使用钻井参数监测系统",
+            font_size=22,
+            bold=True,
+            color=(0.2, 0.4, 0.6, 1),
+            size_hint_y=0.2
+        )
+        content.add_widget(self.welcome_label)
+        
+        # 功能按钮区域
+        btn_bar = BoxLayout(
+            size_hint_y=0.3,
+            padding=20,
+            spacing=20
+        )
+        realtime_btn = Button(
+            text="实时数据", 
+            font_size=18,
+            background_color=(0.2, 0.6, 0.4, 1),
+            on_press=self.show_realtime
+        )
+        history_btn = Button(
+            text="历史记录", 
+            font_size=18,
+            background_color=(0.4, 0.4, 0.8, 1),
+            on_press=self.show_history
+        )
+        settings_btn = Button(
+            text="系统设置", 
+            font_size=18,
+            background_color=(0.8, 0.5, 0.2, 1),
+            on_press=self.show_settings
+        )
+        compare_btn = Button(
+            text="多井对比", 
+            font_size=18,
+            background_color=(0.3, 0.5, 0.7, 1),
+            on_press=self.show_compare
+        )
+        btn_bar.add_widget(realtime_btn)
+        btn_bar.add_widget(history_btn)
+        btn_bar.add_widget(compare_btn)
+        btn_bar.add_widget(settings_btn)
+        
+        # 状态信息区域
+        status_bar = BoxLayout(
+            orientation='vertical',
+            size_hint_y=0.3,
+            padding=10
+        )
+        self.status_label = Label(
+            text="系统状态: 正常",
+            font_size=16,
+            color=(0, 0.6, 0, 1)
+        )
+        self.last_update_label = Label(
+            text="最后更新时间: --",
+            font_size=14
+        )
+        status_bar.add_widget(self.status_label)
+        status_bar.add_widget(self.last_update_label)
+        
+        content.add_widget(btn_bar)
+        content.add_widget(status_bar)
+        
+        main_layout.add_widget(user_bar)
+        main_layout.add_widget(content)
+        self.add_widget(main_layout)
+        
+        # 报警出现或解除时更新状态栏
+        app = App.get_running_app()
+        app.bind(alarm_status=self.show_alarms)
+        self.show_alarms(app, app.alarm_status)
+    
+    def on_pre_enter(self):
+        self.show_user()
+        
+        # 更新最后更新时间
+        self.last_update_label.text = f"最后更新时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    
+    def show_alarms(self, app, text):
+        if text:
+            self.status_label.text = f"报警: {text}"
+            self.status_label.color = (0.9, 0.1, 0.1, 1)
+        else:
+            self.status_label.text = "系统状态: 正常"
+            self.status_label.color = (0, 0.6, 0, 1)
+    
+    def show_user(self):
+        app = App.get_running_app()
+        if hasattr(app, 'user_data'):
+            user = app.user_data
+            self.user_label.text = f"{user['Name']} | {user['Company']}"
+    
+    def show_realtime(self, instance):
+        # 切换到实时数据界面
+        self.manager.current = 'realtime'
+    
+    def show_history(self, instance):
+        # 切换到历史数据界面
+        self.manager.current = 'history'
+    
+    def show_compare(self, instance):
+        # 切换到多井对比界面
+        self.manager.current = 'compare'
+    
+    def show_settings(self, instance):
+        # 切换到设置界面
+        self.manager.current = 'settings'
+    
+    def logout(self, instance):
+        # 清除用户数据 (包括本地保存的登录状态)
+        App.get_running_app().logout()
+        self.manager.current = 'login'
+
+class HistoryScreen(Screen):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        
+        main_layout = BoxLayout(orientation='vertical')
+        
+        # 顶部导航栏
+        nav_bar = BoxLayout(
+            size_hint_y=0.08,
+            padding=5
+        )
+        back_btn = Button(
+            text="返回", 
+            size_hint_x=0.2,
+            background_color=(0.8, 0.3, 0.3, 1),
+            on_press=self.back_to_main
+        )
+        title = Label(
+            text="历史数据查询", 
+            font_size=20,
+            bold=True
+        )
+        nav_bar.add_widget(back_btn)
+        nav_bar.add_widget(title)
+        
+        # 查询条件区域
+        query_panel = BoxLayout(
+            orientation='vertical', 
+            size_hint_y=0.25,
+            padding=10,
+            spacing=5
+        )
+        
+        # 时间选择模式
+        time_mode_layout = BoxLayout(size_hint_y=0.3, spacing=10)
+        time_mode_layout.add_widget(Label(text="时间范围:", size_hint_x=0.3))
+        self.time_mode = Spinner(
+            text='当前时间前', 
+            values=('当前时间前', '时间范围'),
+            size_hint_x=0.7
+        )
+        time_mode_layout.add_widget(self.time_mode)
+        self.time_mode.bind(text=self.on_time_mode)
+        
+        # 时间值选择
+        self.time_value_layout = BoxLayout(size_hint_y=0.3, spacing=10)
+        self.time_value_layout.add_widget(Label(text="小时:", size_hint_x=0.3))
+        self.hours_spinner = Spinner(
+            text='1', 
+            values=[str(i) for i in range(1, 25)],
+            size_hint_x=0.3
+        )
+        self.time_value_layout.add_widget(self.hours_spinner)
+        self.time_value_layout.add_widget(Label(text="分钟:", size_hint_x=0.3))
+        self.minutes_spinner = Spinner(
+            text='0', 
+            values=[str(i) for i in range(0, 60, 5)],
+            size_hint_x=0.3
+        )
+        self.time_value_layout.add_widget(self.minutes_spinner)
+        self.hours_widgets = list(reversed(self.time_value_layout.children))
+        
+        # "时间范围"模式: 开始和结束时间, 默认为最近一天
+        now = datetime.now()
+        self.start_picker = DateTimePicker(now - timedelta(days=1))
+        self.end_picker = DateTimePicker(now)
+        self.range_widgets = [
+            Label(text="从", size_hint_x=0.08), self.start_picker,
+            Label(text="至", size_hint_x=0.08), self.end_picker,
+        ]
+        
+        # 井号选择
+        well_layout = BoxLayout(size_hint_y=0.3, spacing=10)
+        well_layout.add_widget(Label(text="井号:", size_hint_x=0.3))
+        self.well_spinner = Spinner(
+            text='加载中...', 
+            size_hint_x=0.7,
+            background_color=(0.9, 0.9, 0.9, 1)
+        )
+        well_layout.add_widget(self.well_spinner)
+        
+        # 查询按钮
+        query_btn_layout = BoxLayout(size_hint_y=0.1, spacing=10)
+        self.query_btn = Button(
+            text="查询数据", 
+            size_hint_x=0.45,
+            background_color=(0.2, 0.6, 0.4, 1),
+            on_press=self.query_data
+        )
+        self.cancel_btn = Button(
+            text="取消", 
+            size_hint_x=0.15,
+            disabled=True,
+            background_color=(0.8, 0.3, 0.3, 1),
+            on_press=self.cancel_query
+        )
+        # 导出当前井号和时间范围的数据为CSV文件 (可选gzip压缩), 导出中再次点击取消
+        self.export_btn = Button(
+            text="导出CSV", 
+            size_hint_x=0.25,
+            background_color=(0.2, 0.4, 0.6, 1),
+            on_press=self.export_data
+        )
+        self.gzip_btn = ToggleButton(
+            text="gzip", 
+            size_hint_x=0.15
+        )
+        query_btn_layout.add_widget(self.query_btn)
+        query_btn_layout.add_widget(self.cancel_btn)
+        query_btn_layout.add_widget(self.export_btn)
+        query_btn_layout.add_widget(self.gzip_btn)
+        
+        query_panel.add_widget(time_mode_layout)
+        query_panel.add_widget(self.time_value_layout)
+        query_panel.add_widget(well_layout)
+        query_panel.add_widget(query_btn_layout)
+        
+        # 数据显示区域
+        display_area = BoxLayout(orientation='vertical', size_hint_y=0.67)
+        
+        # 井号标签
+        self.well_label = Label(
+            text="井号: --", 
+            size_hint_y=0.05,
+            font_size=16,
+            bold=True,
+            color=(0.2, 0.4, 0.6, 1)
+        )
+        display_area.add_widget(self.well_label)
+        
+        # 参数开关按钮: 五条曲线叠加显示, 按下的参数显示曲线
+        self.param_buttons = BoxLayout(size_hint_y=0.08, spacing=5)
+        for code in PARAM_CODES:
+            btn = ToggleButton(
+                text=PARAM_NAMES[code], 
+                state='down',
+                background_color=PARAM_COLORS[code],
+                background_normal='',
+                color=(1, 1, 1, 1)
+            )
+            btn.bind(on_press=lambda x, c=code: self.toggle_parameter(c, x.state == 'down'))
+            self.param_buttons.add_widget(btn)
+        
+        # Y轴刻度默认显示第一个参数的范围
+        self.current_param = 'A01'
+        self.visible_params = set(PARAM_CODES)
+        
+        display_area.add_widget(self.param_buttons)
+        
+        # 数据表格容器
+        table_container = BoxLayout(orientation='vertical', size_hint_y=0.4)
+        
+        # 表头固定在表格上方
+        header_row = TableRow(row_height=40)
+        header_row.set_values(["序号", "指重", "泵压", "扭矩", "排量", "转速", "时间"])
+        for cell in header_row.cells:
+            cell.bold = True
+            cell.color = (0, 0, 0, 1)
+        table_container.add_widget(header_row)
+        
+        self.table = VirtualTable(cols=7, row_height=30)
+        table_container.add_widget(self.table)
+        display_area.add_widget(table_container)
+        
+        # 曲线图容器
+        graph_container = BoxLayout(size_hint_y=0.47)
+        self.graph = CustomGraph()
+        graph_container.add_widget(self.graph)
+        display_area.add_widget(graph_container)
+        
+        main_layout.add_widget(nav_bar)
+        main_layout.add_widget(query_panel)
+        main_layout.add_widget(display_area)
+        self.add_widget(main_layout)
+        
+        # 当前井最近一次查询的数据 (井号 -> 数据集, 最多一项), 用于增量刷新
+        self.well_datasets = {}
+        self.loading_token = None
+        self.loading_dataset = None
+        # 聚合查询的结果 (概览) 及其井号; 缩放停止后按可见范围获取更精细的数据
+        self.overview = None
+        self.overview_well = None
+        self.detail_trigger = Clock.create_trigger(self.check_detail, 0.4)
+        self.graph.bind(view_start=self.detail_trigger, view_end=self.detail_trigger)
+        # 导出可能持续较长时间, 使用单独的线程, 不占用查询的线程
+        self.export_executor = RequestExecutor(max_workers=1)
+        
+        # 井号列表在登录后已开始加载
+        App.get_running_app().bind_well_spinner(self.well_spinner)
+    
+    def on_pre_enter(self):
+        self.start_picker.refresh_dates()
+        self.end_picker.refresh_dates()
+    
+    def on_time_mode(self, spinner, text):
+        self.time_value_layout.clear_widgets()
+        widgets = self.hours_widgets if text == '当前时间前' else self.range_widgets
+        for widget in widgets:
+            self.time_value_layout.add_widget(widget)
+    
+    def query_window(self):
+        # 当前选择的井号和时间范围: 返回 (well_id, 是否为时间范围模式, 查询参数), 无效时返回 None
+        selected_well = self.well_spinner.text
+        if selected_well not in App.get_running_app().well_options:
+            return None
+            
+        try:
+            well_id = selected_well.split('-')[0]
+        except:
+            return None
+            
+        # 计算时间范围
+        now = datetime.now()
+        ranged = self.time_mode.text != '当前时间前'
+        if not ranged:
+            hours = int(self.hours_spinner.text)
+            minutes = int(self.minutes_spinner.text)
+            start_time = now - timedelta(hours=hours, minutes=minutes)
+            end_time = now
+        else:
+            start_time = self.start_picker.value
+            end_time = min(self.end_picker.value, now)
+            if start_time >= end_time:
+                print("开始时间须早于结束时间")
+                return None
+        
+        data = {
+            'well_id': well_id,
+            'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S'),
+            'end_time': end_time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+        return well_id, ranged, data
+    
+    def query_data(self, instance):
+        window = self.query_window()
+        if window is None:
+            return
+        well_id, ranged, data = window
+        app = App.get_running_app()
+        
+        # 已有数据覆盖新窗口的起点时, 只请求 high-water mark 之后的新数据
+        start_ts = datetime.fromisoformat(data['start_time']).timestamp()
+        end_ts = datetime.fromisoformat(data['end_time']).timestamp()
+        previous = None if ranged else self.well_datasets.get(well_id)
+        if previous is not None and previous.cursor is not None and previous.start_time <= start_ts:
+            data['since_index'] = previous.cursor
+            # 上次查询中尚未放入时间块缓存的部分 (最后一个时间块和稳定期): 与新数据合并后得到完整的时间块
+            # 在界面线程中复制, 后台线程不访问界面正在使用的数据集
+            tile_size = app.tiles.tile_seconds
+            seed_start = max(previous.start_time,
+                             (previous.timestamps[-1] - HISTORY_STORE_SETTLE) // tile_size * tile_size)
+            seed = previous.between(seed_start, previous.timestamps[-1])
+
+        # 同一次查询的各批数据共享同一个标记
+        token = object()
+
+        def make_chunk(dataset, meta):
+            dataset.start_time = start_ts
+            dataset.end_time = end_ts
+            return {
+                'token': token,
+                'well_id': well_id,
+                'dataset': dataset,
+                # 服务器返回 cursor 表示支持增量查询, 否则返回的是完整窗口
+                'incremental': 'since_index' in data and 'cursor' in meta
+            }
+
+        def fetch_incremental(report):
+            # 在后台线程中下载并解码, 每批数据构建为列式数据集后交给界面显示
+            # 新数据同时合并到 seed 中, 已稳定的部分写入本地存储, 完整的时间块放入缓存,
+            # 之后重复查询、切换井号或离线时仍能命中
+            received = seed
+
+            def on_chunk(meta, chunk):
+                received.merge(chunk)
+                return report(make_chunk(chunk, meta))
+
+            meta, dataset = fetch_drilling_data(app.api, data, on_chunk)
+            if meta is None or meta.get('status') != 'success':
+                return meta
+            received.merge(dataset)
+            settled = min(end_ts, time.time() - HISTORY_STORE_SETTLE)
+            app.store.save(well_id, received, seed.start_time, settled)
+            app.tiles.put_range(well_id, received, seed.start_time, settled)
+            meta.update(make_chunk(dataset, meta))
+            return meta
+
+        def fetch_with_store(report):
+            # 查询窗口按固定时间块对齐: 内存中已有的时间块直接使用, 相邻的缺失块合并为一个区间
+            # 缺失区间再按本地存储划分, 已存储的直接读取, 缺失的向服务器请求后写入本地
+            # 无法连接服务器时跳过缺失部分, 仍然显示本地数据
+            import requests
+
+            meta = {'status': 'success', 'well_name': ''}
+            pending = []
+
+            def emit(chunk):
+                # 只显示查询窗口内的数据; 下一批到达后才交给界面, 最后一批作为返回值
+                chunk = chunk.between(start_ts, end_ts)
+                if pending:
+                    if not report(make_chunk(pending.pop(), meta)):
+                        return False
+                pending.append(chunk)
+                return True
+
+            def fetch_range(range_start, range_end):
+                # 返回 (区间内的全部数据, 是否完整); 取消或服务器返回错误时数据为 None
+                received = HistoryDataset()
+                complete = True
+                for kind, piece_start, piece_end in app.store.plan(well_id, range_start, range_end):
+                    if kind == 'cached':
+                        chunk = app.store.load(well_id, piece_start, piece_end)
+                        received.merge(chunk)
+                        if not emit(chunk):
+                            return None, False
+                        continue
+
+                    piece_data = dict(
+                        data,
+                        start_time=datetime.fromtimestamp(piece_start).strftime('%Y-%m-%d %H:%M:%S'),
+                        end_time=datetime.fromtimestamp(piece_end).strftime('%Y-%m-%d %H:%M:%S')
+                    )
+                    piece = HistoryDataset()
+
+                    def on_chunk(piece_meta, chunk):
+                        piece.merge(chunk)
+                        return emit(chunk)
+
+                    try:
+                        piece_meta, tail = fetch_drilling_data(app.api, piece_data, on_chunk)
+                    except requests.exceptions.RequestException:
+                        meta['offline'] = True
+                        complete = False
+                        continue
+                    if piece_meta is None:
+                        return None, False
+                    if piece_meta.get('status') != 'success':
+                        meta.update(piece_meta)
+                        return None, False
+                    piece.well_name = piece_meta.get('well_name') or piece.well_name
+                    piece.merge(tail)
+                    if not emit(tail):
+                        return None, False
+                    app.store.save(well_id, piece, piece_start,
+                                   min(piece_end, time.time() - HISTORY_STORE_SETTLE))
+                    received.merge(piece)
+                return received, complete
+
+            tile_size = app.tiles.tile_seconds
+            tiles = [(tile_start, app.tiles.get(well_id, tile_start))
+                     for tile_start in app.tiles.tile_starts(start_ts, end_ts)]
+            for missing, group in groupby(tiles, key=lambda item: item[1] is None):
+                group = list(group)
+                if not missing:
+                    chunk = HistoryDataset()
+                    for _, tile in group:
+                        chunk.merge(tile)
+                    meta['well_name'] = meta['well_name'] or chunk.well_name
+                    if not emit(chunk):
+                        return None
+                    continue
+
+                # 请求完整的时间块以便缓存, 但不超过当前时间
+                range_start = group[0][0]
+                range_end = min(group[-1][0] + tile_size, time.time())
+                received, complete = fetch_range(range_start, range_end)
+                if received is None:
+                    return None if meta['status'] == 'success' else meta
+                meta['well_name'] = meta['well_name'] or received.well_name
+                if complete:
+                    # 最近一段时间的数据可能尚未写入服务器, 不缓存
+                    app.tiles.put_range(well_id, received, range_start,
+                                        min(range_end, time.time() - HISTORY_STORE_SETTLE))
+
+            if meta.get('offline') and not pending:
+                raise requests.exceptions.ConnectionError("无法连接到服务器")
+            dataset = pending[0] if pending else HistoryDataset(meta['well_name'])
+            dataset.well_name = dataset.well_name or meta['well_name']
+            meta.update(make_chunk(dataset, meta))
+            return meta
+
+        def fetch_aggregated(report):
+            meta, dataset = fetch_aggregate(app.api, data, buckets)
+            if meta.get('status') != 'success':
+                return meta
+            meta.update(make_chunk(dataset, meta))
+            return meta
+
+        # 时间范围较长时原始数据远多于屏幕像素, 请求每像素一个桶的聚合数据
+        width = max(int(self.graph.width), 100)
+        buckets = min(width, AGGREGATE_MAX_BUCKETS)
+        if ranged and (end_ts - start_ts) / HISTORY_SAMPLE_SECONDS > width * RAW_ROWS_PER_PIXEL:
+            fetch = fetch_aggregated
+        elif 'since_index' in data:
+            fetch = fetch_incremental
+        else:
+            fetch = fetch_with_store
+
+        # 查询条件相同的重复点击合并为一次请求, 条件变化则取代旧请求
+        signature = (well_id, self.time_mode.text, self.hours_spinner.text, self.minutes_spinner.text,
+                     data['start_time'] if ranged else None, data['end_time'] if ranged else None)
+        self.query_btn.text = "查询中..."
+        self.cancel_btn.disabled = False
+        app.executor.submit(
+            'query', fetch,
+            on_success=self.on_query_result,
+            on_error=self.on_query_error,
+            on_progress=self.on_query_chunk,
+            signature=signature
         )
+
+    def cancel_query(self, instance):
+        # 取消下载, 已加载的数据保留显示
+        App.get_running_app().executor.cancel('query')
+        self.finish_query()
+
+    def finish_query(self):
+        self.loading_token = None
+        self.loading_dataset = None
+        self.query_btn.text = "查询数据"
+        self.cancel_btn.disabled = True
+
+    @profiled('history.on_query_chunk', 'ui')
+    def on_query_chunk(self, chunk):
+        dataset = chunk['dataset']
+        target = self.loading_dataset if chunk['token'] is self.loading_token else None
+        if target is None:
+            # 第一批数据: 增量查询合并到已有数据并裁掉滑出窗口的部分, 否则替换
+            previous = self.well_datasets.get(chunk['well_id'])
+            if chunk['incremental'] and previous is not None:
+                previous.merge(dataset, dataset.start_time)
+                dataset = previous
+            self.loading_token = chunk['token']
+            self.loading_dataset = dataset
+            App.get_running_app().executor.cancel('detail')
+            if isinstance(dataset, AggregateDataset):
+                # 聚合数据不能用于增量刷新
+                self.overview = dataset
+                self.overview_well = chunk['well_id']
+            else:
+                self.overview = None
+                # 只保留当前井的数据用于增量刷新, 其他井的数据已在时间块缓存和本地存储中, 按预算淘汰
+                self.well_datasets = {chunk['well_id']: dataset}
+            self.dataset = dataset
+            self.display_data()
+        else:
+            if not len(dataset):
+                return
+            target.merge(dataset)
+            self.table.refresh()
+            self.update_graph()
+        self.query_btn.text = f"已加载 {len(self.loading_dataset)} 条..."
+
+    def on_query_result(self, result):
+        if result is None:
+            return
+        if result['status'] == 'success':
+            self.on_query_chunk(result)
+            if result.get('offline'):
+                self.well_label.text = f"井号: {self.dataset.well_name} (离线数据)"
+        else:
+            print(f"查询失败: {result.get('message')}")
+        self.finish_query()
+
+    def on_query_error(self, error):
+        self.finish_query()
+        if is_connection_error(error):
+            print("无法连接到服务器")
+        else:
+            print(f"查询错误: {str(error)}")
+    
+    def export_data(self, instance):
+        if self.export_executor.is_busy('export'):
+            self.export_executor.cancel('export')
+            self.finish_export("导出已取消")
+            return
+        window = self.query_window()
+        if window is None:
+            return
+        well_id, ranged, data = window
+        app = App.get_running_app()
+        start_ts = datetime.fromisoformat(data['start_time']).timestamp()
+        end_ts = datetime.fromisoformat(data['end_time']).timestamp()
         
-        # 注册表单
-        form = GridLayout(cols=2, spacing=10, size_hint_y=0.6)
+        # 已加载的原始数据覆盖窗口起点时先从内存写出 (复制一份, 界面线程可能继续追加),
+        # 之后的部分再从服务器按 high-water mark 增量请求; 否则整个窗口从服务器流式下载
+        local = self.well_datasets.get(well_id)
+        snapshot = None
+        request = data
+        if local is not None and local.start_time is not None and local.start_time <= start_ts:
+            snapshot = local.between(start_ts, end_ts)
+            if local.end_time is not None and local.end_time >= end_ts:
+                request = None
+            elif len(snapshot):
+                request = dict(data, since_index=snapshot.cursor)
         
-        form.add_widget(Label(text="姓名:", bold=True))
-        self.name_input = TextInput(
-            multiline=False, 
-            hint_text="请输入姓名",
-            size_hint_y=None,
-            height=40
-        )
-        form.add_widget(self.name_input)
+        compress = self.gzip_btn.state == 'down'
+        name = "{}_{}_{}.csv".format(well_id, data['start_time'], data['end_time'])
+        name = name.replace('-', '').replace(':', '').replace(' ', '')
+        path = os.path.join(app.user_data_dir, 'exports', name + ('.gz' if compress else ''))
         
-        form.add_widget(Label(text="手机号:", bold=True))
-        self.phone_input = TextInput(
-            multiline=False, 
-            input_filter='int',
-            hint_text="请输入11位手机号",
-            size_hint_y=None,
-            height=40
-        )
-        form.add_widget(self.phone_input)
+        def export(report):
+            exporter = CsvExporter(path, compress)
+            try:
+                completed = snapshot is None or exporter.write(snapshot, report=report)
+                if completed and request is not None:
+                    # 服务器的每批数据写入文件后即丢弃
+                    meta, tail = fetch_drilling_data(
+                        app.api, request,
+                        lambda meta, chunk: exporter.write(chunk, report=report)
+                    )
+                    if meta is not None and meta.get('status') != 'success':
+                        raise RuntimeError(meta.get('message', '查询失败'))
+                    completed = meta is not None and exporter.write(tail, report=report)
+            except BaseException:
+                exporter.abort()
+                raise
+            if not completed:
+                exporter.abort()
+                return None
+            return exporter.finish(), exporter.rows
         
-        form.add_widget(Label(text="公司:", bold=True))
-        self.company_input = TextInput(
-            multiline=False, 
-            hint_text="请输入公司名称",
-            size_hint_y=None,
-            height=40
+        expected = max(1, int((end_ts - start_ts) / HISTORY_SAMPLE_SECONDS) + 1)
+        self.export_btn.text = "取消导出"
+        self.export_executor.submit(
+            'export', export,
+            on_success=self.on_export_done,
+            on_error=self.on_export_error,
+            on_progress=lambda rows: self.on_export_progress(rows, expected)
         )
-        form.add_widget(self.company_input)
+    
+    def on_export_progress(self, rows, expected):
+        self.export_btn.text = f"取消 {min(99, rows * 100 // expected)}%"
+    
+    def on_export_done(self, result):
+        if result is None:
+            return
+        path, rows = result
+        self.finish_export(f"已导出 {rows} 条数据: {path}")
+    
+    def on_export_error(self, error):
+        if is_connection_error(error):
+            self.finish_export("导出失败: 无法连接到服务器")
+        else:
+            self.finish_export(f"导出失败: {str(error)}")
+    
+    def finish_export(self, message):
+        self.export_btn.text = "导出CSV"
+        print(message)
+    
+    def shutdown(self):
+        # 退出时取消导出, 后台线程写完当前一批后删除临时文件
+        self.export_executor.cancel('export')
+        self.export_executor.shutdown()
+    
+    @profiled('history.display_data', 'ui')
+    def display_data(self):
+        # 更新井号标签
+        self.well_label.text = f"井号: {self.dataset.well_name}"
         
-        # 按钮区域
-        btn_layout = BoxLayout(spacing=10, size_hint_y=0.15)
-        submit_btn = Button(
-            text="提交", 
-            on_press=self.register,
-            background_color=(0.2, 0.6, 0.4, 1)
-        )
-        back_btn = Button(
-            text="返回", 
-            on_press=self.back_to_login,
-            background_color=(0.8, 0.3, 0.3, 1)
-        )
-        btn_layout.add_widget(back_btn)
-        btn_layout.add_widget(submit_btn)
+        # 表格直接读取列式数据, 只渲染可见行 (聚合数据每个时间桶一行)
+        self.table.set_source(self.dataset.table_source())
         
-        layout.add_widget(title)
-        layout.add_widget(form)
-        layout.add_widget(btn_layout)
-        self.add_widget(layout)
+        # 更新曲线, 新数据从完整时间范围开始显示
+        self.graph.reset_view()
+        self.update_graph()
     
-    def register(self, instance):
-        name = self.name_input.text.strip()
-        phone = self.phone_input.text.strip()
-        company = self.company_input.text.strip()
-        
-        if not name:
-            self.show_message("请输入姓名")
+    @profiled('history.update_graph', 'ui')
+    def update_graph(self):
+        # 数据变化时更新所有曲线: 横坐标只计算一次, 各曲线共用
+        dataset = getattr(self, 'dataset', None)
+        if dataset is None:
             return
-        if not phone or len(phone) != 11:
-            self.show_message("请输入11位手机号")
+        graph = self.graph
+        graph.time_range = [dataset.timestamps[0], dataset.timestamps[-1]] if len(dataset) else []
+        graph.set_x_values(dataset.x_positions)
+        
+        # 每条曲线使用各自的Y轴范围（留10%的余量）, 极值均已在加载时计算
+        for code in PARAM_CODES:
+            min_val = dataset.min_values[code]
+            max_val = dataset.max_values[code]
+            padding = (max_val - min_val) * 0.1
+            graph.set_series(code, dataset.columns[code], max(0, min_val - padding),
+                             max_val + padding, PARAM_COLORS[code])
+            graph.set_series_visible(code, code in self.visible_params)
+        self.select_parameter(self.current_param)
+    
+    def view_times(self):
+        # 当前显示范围对应的时间 (曲线横坐标按数据集的首尾时间归一化)
+        timestamps = self.dataset.timestamps
+        scale = (timestamps[-1] - timestamps[0]) / 100.0
+        return (timestamps[0] + self.graph.view_start * scale,
+                timestamps[0] + self.graph.view_end * scale)
+    
+    def check_detail(self, *args):
+        # 可见范围内的桶少于像素数的一半时, 获取该范围 (左右各扩展一半) 更精细的数据:
+        # 范围足够窄时为原始数据, 否则为按像素宽度重新聚合的数据
+        overview = self.overview
+        if overview is None or len(self.dataset) < 2:
             return
-        if not company:
-            self.show_message("请输入公司名称")
+        start, end = self.view_times()
+        span = end - start
+        width = max(self.graph.width, 100)
+        detail = self.dataset.detail
+        if detail is not None and detail.start_time <= start and end <= detail.end_time:
+            resolution = getattr(detail, 'bucket_seconds', 0)
+        else:
+            resolution = overview.bucket_seconds
+        if not resolution or span / resolution >= width / 2:
             return
         
+        # 窗口与概览的桶边界对齐, 替换的桶不会只覆盖一半
+        seconds = overview.bucket_seconds
+        window_start = max(overview.start_time, (start - span / 2) // seconds * seconds)
+        window_end = min(overview.end_time, math.ceil((end + span / 2) / seconds) * seconds - 1)
+        app = App.get_running_app()
+        # 下拉框可能已切换到其他井, 明细必须与概览是同一口井
+        well_id = self.overview_well
         data = {
-            'name': name,
-            'phone': phone,
-            'company': company
+            'well_id': well_id,
+            'start_time': datetime.fromtimestamp(window_start).strftime('%Y-%m-%d %H:%M:%S'),
+            'end_time': datetime.fromtimestamp(window_end).strftime('%Y-%m-%d %H:%M:%S')
         }
+        raw = (window_end - window_start) / HISTORY_SAMPLE_SECONDS <= width * RAW_ROWS_PER_PIXEL
+        buckets = min(int(width * (window_end - window_start) / span), AGGREGATE_MAX_BUCKETS)
         
-        try:
-            response = requests.post(f"{SERVER_URL}/api/register", json=data)
-            if response.status_code == 200:
-                self.show_message("注册成功！")
-                self.back_to_login(instance)
+        def fetch():
+            if raw:
+                meta, dataset = fetch_drilling_data(app.api, data)
             else:
-                error_msg = response.json().get('message', '注册失败')
-                self.show_message(error_msg)
-        except requests.exceptions.ConnectionError:
-            self.show_message("无法连接到服务器，请检查网络")
-        except Exception as e:
-            self.show_message(f"注册错误: {str(e)}")
+                meta, dataset = fetch_aggregate(app.api, data, buckets)
+            if meta.get('status') != 'success':
+                raise RuntimeError(meta.get('message', '查询失败'))
+            dataset.start_time = window_start
+            dataset.end_time = window_end
+            return dataset
+        
+        app.executor.submit(
+            'detail', fetch,
+            on_success=lambda dataset: self.on_detail(overview, dataset),
+            on_error=lambda error: print(f"明细数据查询错误: {str(error)}"),
+            signature=(well_id, window_start, window_end)
+        )
     
-    def show_message(self, message):
-        # 在实际应用中，可以添加一个弹出框显示消息
-        print(message)
+    def on_detail(self, overview, detail):
+        # 明细替换概览中对应的桶, 保持当前显示的时间范围不变
+        if overview is not self.overview or not len(detail):
+            return
+        start, end = self.view_times()
+        self.dataset = overview.with_detail(detail)
+        self.table.set_source(self.dataset.table_source())
+        self.update_graph()
+        timestamps = self.dataset.timestamps
+        scale = 100.0 / (timestamps[-1] - timestamps[0])
+        self.graph.set_view((start - timestamps[0]) * scale, (end - timestamps[0]) * scale)
     
-    def back_to_login(self, instance):
-        self.manager.current = 'login'
+    def select_parameter(self, param_code):
+        # Y轴刻度显示该参数的范围, 不影响曲线
+        self.current_param = param_code
+        series = self.graph.series.get(param_code)
+        if series is None:
+            return
+        self.graph.min_value = series.min_value
+        self.graph.max_value = series.max_value
+    
+    def toggle_parameter(self, param_code, visible):
+        # 只显示/隐藏该参数的曲线, 其他曲线不重绘
+        if visible:
+            self.visible_params.add(param_code)
+        else:
+            self.visible_params.discard(param_code)
+        self.graph.set_series_visible(param_code, visible)
+        if visible:
+            self.select_parameter(param_code)
+        elif param_code == self.current_param:
+            shown = [code for code in PARAM_CODES if code in self.visible_params]
+            if shown:
+                self.select_parameter(shown[0])
+    
+    def back_to_main(self, instance):
+        self.manager.current = 'main'
 
-class MainScreen(Screen):
+class RealtimeScreen(Screen):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         
         main_layout = BoxLayout(orientation='vertical')
         
-        # 顶部用户信息栏
-        user_bar = BoxLayout(
-            size_hint_y=0.1,
-            padding=10,
-            spacing=10
-        )
-        self.user_label = Label(
-            text="", 
-            font_size=18,
-            halign='left',
-            valign='middle',
-            size_hint_x=0.8
+        # 顶部导航栏
+        nav_bar = BoxLayout(
+            size_hint_y=0.08,
+            padding=5,
+            spacing=5
         )
-        logout_btn = Button(
-            text="退出", 
+        back_btn = Button(
+            text="返回", 
             size_hint_x=0.2,
             background_color=(0.8, 0.3, 0.3, 1),
-            on_press=self.logout
-        )
-        user_bar.add_widget(self.user_label)
-        user_bar.add_widget(logout_btn)
-        
-        # 主内容区域
-        content = BoxLayout(orientation='vertical')
-        
-        # 欢迎信息
-        self.welcome_label = Label(
-            text="欢迎使用钻井参数监测系统",
-            font_size=22,
-            bold=True,
-            color=(0.2, 0.4, 0.6, 1),
-            size_hint_y=0.2
-        )
-        content.add_widget(self.welcome_label)
-        
-        # 功能按钮区域
-        btn_bar = BoxLayout(
-            size_hint_y=0.3,
-            padding=20,
-            spacing=20
+            on_press=self.back_to_main
         )
-        realtime_btn = Button(
+        title = Label(
             text="实时数据", 
-            font_size=18,
-            background_color=(0.2, 0.6, 0.4, 1),
-            on_press=self.show_realtime
-        )
-        history_btn = Button(
-            text="历史记录", 
-            font_size=18,
-            background_color=(0.4, 0.4, 0.8, 1),
-            on_press=self.show_history
+            font_size=20,
+            bold=True,
+            size_hint_x=0.25
         )
-        settings_btn = Button(
-            text="系统设置", 
-            font_size=18,
-            background_color=(0.8, 0.5, 0.2, 1),
-            on_press=self.show_settings
+        self.well_spinner = Spinner(
+            text='加载中...', 
+            size_hint_x=0.35,
+            background_color=(0.9, 0.9, 0.9, 1)
         )
-        btn_bar.add_widget(realtime_btn)
-        btn_bar.add_widget(history_btn)
-        btn_bar.add_widget(settings_btn)
+        self.well_spinner.bind(text=self.on_well_changed)
+        # 选择后离开本界面也继续在后台监测该井的报警
+        self.alarm_btn = ToggleButton(text="报警监测", size_hint_x=0.2)
+        self.alarm_btn.bind(on_release=self.on_alarm_toggled)
+        nav_bar.add_widget(back_btn)
+        nav_bar.add_widget(title)
+        nav_bar.add_widget(self.well_spinner)
+        nav_bar.add_widget(self.alarm_btn)
+        main_layout.add_widget(nav_bar)
         
-        # 状态信息区域
-        status_bar = BoxLayout(
-            orientation='vertical',
-            size_hint_y=0.3,
-            padding=10
-        )
-        self.status_label = Label(
-            text="系统状态: 正常",
-            font_size=16,
-            color=(0, 0.6, 0, 1)
-        )
-        self.last_update_label = Label(
+        # 每个参数一条实时曲线
+        self.value_labels = {}
+        self.graphs = {}
+        for code in PARAM_CODES:
+            row = BoxLayout(orientation='vertical', size_hint_y=0.17)
+            value_label = Label(
+                text=f"{PARAM_NAMES[code]}: --",
+                size_hint_y=0.2,
+                font_size=14,
+                bold=True
+            )
+            graph = RealtimeGraph()
+            graph.set_line_color(PARAM_COLORS[code])
+            row.add_widget(value_label)
+            row.add_widget(graph)
+            main_layout.add_widget(row)
+            self.value_labels[code] = value_label
+            self.graphs[code] = graph
+        
+        self.update_label = Label(
             text="最后更新时间: --",
+            size_hint_y=0.07,
             font_size=14
         )
-        status_bar.add_widget(self.status_label)
-        status_bar.add_widget(self.last_update_label)
+        main_layout.add_widget(self.update_label)
+        self.add_widget(main_layout)
         
-        content.add_widget(btn_bar)
-        content.add_widget(status_bar)
+        self.buffer = RealtimeBuffer(REALTIME_WINDOW * REALTIME_MAX_RATE)
+        self.well_id = None
+        # 先轮询一次取得最近的时间窗口, 之后改用推送; 推送断开期间继续轮询
+        self.stream = None
+        self.push_supported = True
         
-        main_layout.add_widget(user_bar)
-        main_layout.add_widget(content)
-        self.add_widget(main_layout)
+        # 轮询由调度器在本界面显示时运行 (进入界面时立即运行一次)
+        app = App.get_running_app()
+        app.bind_well_spinner(self.well_spinner)
+        app.scheduler.add('realtime', self.poll_data, REALTIME_POLL_INTERVAL, screen=self.name)
     
-    def on_pre_enter(self):
+    def on_leave(self):
         app = App.get_running_app()
-        if hasattr(app, 'user_data'):
-            user = app.user_data
-            self.user_label.text = f"{user['Name']} | {user['Company']}"
+        app.executor.cancel('realtime')
+        self.stop_stream()
+        app.set_realtime_well(None)
+    
+    def on_well_changed(self, spinner, text):
+        # 切换井号时清空缓冲区和曲线
+        app = App.get_running_app()
+        app.executor.cancel('realtime')
+        self.stop_stream()
+        app.set_realtime_well(None)
+        self.alarm_btn.state = 'down' if text.split('-')[0] in app.alarm_wells else 'normal'
+        self.buffer.clear()
+        for graph in self.graphs.values():
+            graph.reset()
+        for code, label in self.value_labels.items():
+            label.text = f"{PARAM_NAMES[code]}: --"
+        self.well_id = None
+    
+    def on_alarm_toggled(self, button):
+        app = App.get_running_app()
+        selected_well = self.well_spinner.text
+        if selected_well not in app.well_options:
+            button.state = 'normal'
+            return
+        if not app.set_alarm_well(selected_well.split('-')[0], button.state == 'down'):
+            button.state = 'normal'
+            self.update_label.text = f"最多同时监测 {ALARM_MAX_WELLS} 口井的报警"
+    
+    def start_stream(self):
+        if not self.push_supported or self.stream is not None or self.well_id is None:
+            return
+        self.stream = LiveStream(App.get_running_app().api, self.well_id, self.on_samples,
+                                 self.on_stream_state, self.buffer.last_index)
+        self.stream.start()
+    
+    def stop_stream(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream = None
+    
+    def on_stream_state(self, state):
+        if state == 'unsupported':
+            # 旧版服务器没有推送接口, 继续按间隔轮询
+            self.push_supported = False
+            self.stream = None
+        elif state == 'reconnecting':
+            self.update_label.text = "推送连接中断, 正在重连..."
+    
+    def poll_data(self, *args):
+        app = App.get_running_app()
+        selected_well = self.well_spinner.text
+        if selected_well not in app.well_options or app.executor.is_busy('realtime'):
+            return
+        if self.stream is not None and self.stream.state == 'connected':
+            return
+        self.well_id = selected_well.split('-')[0]
+        # 该井在报警监测中时, 应用改用本界面收到的数据, 不再单独连接
+        app.set_realtime_well(self.well_id)
         
-        # 更新最后更新时间
-        self.last_update_label.text = f"最后更新时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        # 从最后一条数据的时间开始请求, 首次请求整个时间窗口
+        now = datetime.now()
+        last_time = self.buffer.timestamps.latest()
+        if last_time is None:
+            start_time = now - timedelta(seconds=REALTIME_WINDOW)
+        else:
+            start_time = datetime.fromtimestamp(last_time)
+        data = {
+            'well_id': self.well_id,
+            'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S'),
+            'end_time': now.strftime('%Y-%m-%d %H:%M:%S')
+        }
+        if self.buffer.last_index is not None:
+            # 支持增量查询的服务器只返回 since_index 之后的数据
+            data['since_index'] = self.buffer.last_index
+        
+        def fetch():
+            start = time.perf_counter()
+            meta, dataset = fetch_drilling_data(app.api, data)
+            if meta.get('status') != 'success':
+                raise RuntimeError(meta.get('message', '查询失败'))
+            return dataset, time.perf_counter() - start
+        
+        app.executor.submit(
+            'realtime', fetch,
+            on_success=self.on_poll_result,
+            on_error=self.on_poll_error
+        )
     
-    def show_realtime(self, instance):
-        # 切换到实时数据界面
-        self.manager.current = 'realtime'
+    def on_poll_result(self, result):
+        dataset, elapsed = result
+        App.get_running_app().scheduler.report('realtime', True, elapsed)
+        self.on_samples(dataset)
+        if self.stream is not None:
+            self.stream.resume_from(self.buffer.last_index)
+        else:
+            self.start_stream()
     
-    def show_history(self, instance):
-        # 切换到历史数据界面
-        self.manager.current = 'history'
+    @profiled('realtime.on_samples', 'ui')
+    def on_samples(self, dataset):
+        App.get_running_app().on_monitor_samples(self.well_id, dataset)
+        start = self.buffer.extend(dataset)
+        if start >= len(dataset):
+            return
+        
+        # 只把新样本追加到曲线
+        timestamps = dataset.timestamps[start:]
+        for code in PARAM_CODES:
+            values = dataset.columns[code][start:]
+            self.graphs[code].append_samples(timestamps, values)
+            self.value_labels[code].text = f"{PARAM_NAMES[code]}: {format_value(values[-1])}"
+        last_time = datetime.fromtimestamp(timestamps[-1])
+        self.update_label.text = f"最后更新时间: {last_time.strftime('%Y-%m-%d %H:%M:%S')}"
     
-    def show_settings(self, instance):
-        # 切换到设置界面
-        self.manager.current = 'settings'
+    def on_poll_error(self, error):
+        App.get_running_app().scheduler.report('realtime', False)
+        if is_connection_error(error):
+            self.update_label.text = "无法连接到服务器"
+        else:
+            self.update_label.text = f"查询错误: {str(error)}"
     
-    def logout(self, instance):
-        # 清除用户数据
-        if hasattr(App.get_running_app(), 'user_data'):
-            del App.get_running_app().user_data
-        self.manager.current = 'login'
+    def back_to_main(self, instance):
+        self.manager.current = 'main'
 
-class HistoryScreen(Screen):
+class TimeAxis:
+    # 多个曲线图共用的时间轴: 横坐标都按同一个查询窗口归一化 (0-100%)
+    # 各井采样时刻相同时直接共用已计算的横坐标数组
+    def __init__(self, start_time, end_time):
+        self.start_time = start_time
+        self.end_time = end_time
+        self.scale = 100.0 / max(end_time - start_time, 1)
+        self.cache = []  # [(时间戳, 横坐标)]
+
+    def positions(self, timestamps):
+        for cached, xs in self.cache:
+            if cached == timestamps:
+                return xs
+        start = self.start_time
+        scale = self.scale
+        xs = array('d', [(t - start) * scale for t in timestamps])
+        self.cache.append((timestamps, xs))
+        return xs
+
+
+class CompareScreen(Screen):
+    # 多井对比: 同一时间窗口内多口井的同一参数上下排列, 共用时间轴, 缩放/平移同步
+    # 各井并发查询, 同时进行的查询数不超过 COMPARE_MAX_IN_FLIGHT, 每口井的数据到达后立即显示
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         
@@ -501,281 +3635,795 @@ class HistoryScreen(Screen):
             on_press=self.back_to_main
         )
         title = Label(
-            text="历史数据查询", 
+            text="多井对比", 
             font_size=20,
             bold=True
         )
         nav_bar.add_widget(back_btn)
         nav_bar.add_widget(title)
+        main_layout.add_widget(nav_bar)
         
-        # 查询条件区域
-        query_panel = BoxLayout(
-            orientation='vertical', 
-            size_hint_y=0.25,
-            padding=10,
-            spacing=5
-        )
+        # 井号多选
+        self.well_grid = GridLayout(cols=3, spacing=5, padding=5, size_hint_y=0.14)
+        self.well_buttons = {}
+        main_layout.add_widget(self.well_grid)
         
-        # 时间选择模式
-        time_mode_layout = BoxLayout(size_hint_y=0.3, spacing=10)
-        time_mode_layout.add_widget(Label(text="时间范围:", size_hint_x=0.3))
-        self.time_mode = Spinner(
-            text='当前时间前', 
-            values=('当前时间前', '时间范围'),
-            size_hint_x=0.7
+        # 参数、时间窗口和查询按钮
+        controls = BoxLayout(size_hint_y=0.08, spacing=5, padding=5)
+        self.param_spinner = Spinner(
+            text=PARAM_NAMES['A01'], 
+            values=[PARAM_NAMES[code] for code in PARAM_CODES],
+            size_hint_x=0.3
         )
-        time_mode_layout.add_widget(self.time_mode)
-        
-        # 时间值选择
-        self.time_value_layout = BoxLayout(size_hint_y=0.3, spacing=10)
-        self.time_value_layout.add_widget(Label(text="小时:", size_hint_x=0.3))
+        self.param_spinner.bind(text=self.on_param_changed)
         self.hours_spinner = Spinner(
             text='1', 
             values=[str(i) for i in range(1, 25)],
-            size_hint_x=0.3
-        )
-        self.time_value_layout.add_widget(self.hours_spinner)
-        self.time_value_layout.add_widget(Label(text="分钟:", size_hint_x=0.3))
-        self.minutes_spinner = Spinner(
-            text='0', 
-            values=[str(i) for i in range(0, 60, 5)],
-            size_hint_x=0.3
-        )
-        self.time_value_layout.add_widget(self.minutes_spinner)
-        
-        # 井号选择
-        well_layout = BoxLayout(size_hint_y=0.3, spacing=10)
-        well_layout.add_widget(Label(text="井号:", size_hint_x=0.3))
-        self.well_spinner = Spinner(
-            text='加载中...', 
-            size_hint_x=0.7,
-            background_color=(0.9, 0.9, 0.9, 1)
+            size_hint_x=0.2
         )
-        well_layout.add_widget(self.well_spinner)
-        
-        # 查询按钮
-        query_btn = Button(
-            text="查询数据", 
-            size_hint_y=0.1,
+        self.query_btn = Button(
+            text="对比", 
+            size_hint_x=0.5,
             background_color=(0.2, 0.6, 0.4, 1),
             on_press=self.query_data
         )
+        controls.add_widget(self.param_spinner)
+        controls.add_widget(self.hours_spinner)
+        controls.add_widget(Label(text="小时", size_hint_x=0.1))
+        controls.add_widget(self.query_btn)
+        main_layout.add_widget(controls)
         
-        query_panel.add_widget(time_mode_layout)
-        query_panel.add_widget(self.time_value_layout)
-        query_panel.add_widget(well_layout)
-        query_panel.add_widget(query_btn)
-        
-        # 数据显示区域
-        display_area = BoxLayout(orientation='vertical', size_hint_y=0.67)
-        
-        # 井号标签
-        self.well_label = Label(
-            text="井号: --", 
-            size_hint_y=0.05,
-            font_size=16,
-            bold=True,
-            color=(0.2, 0.4, 0.6, 1)
-        )
-        display_area.add_widget(self.well_label)
-        
-        # 参数选择按钮
-        self.param_buttons = BoxLayout(size_hint_y=0.08, spacing=5)
-        params = [
-            ('指重', 'A01', (0, 1, 0)),        # green
-            ('泵压', 'A02', (0.5, 0, 0.5)),    # purple
-            ('扭矩', 'A03', (1, 0, 0)),        # red
-            ('排量', 'A04', (1, 1, 0)),        # yellow
-            ('转速', 'A05', (0, 0, 0))         # black
-        ]
-        for name, code, color in params:
-            btn = ToggleButton(
-                text=name, 
-                group='params',
-                background_color=color + (1,),
-                background_normal='',
-                color=(1, 1, 1, 1)
-            )
-            btn.bind(on_press=lambda x, c=code: self.select_parameter(c))
-            self.param_buttons.add_widget(btn)
-        
-        # 默认选择第一个参数
-        self.param_buttons.children[-1].state = 'down'
-        self.current_param = 'A01'
-        
-        display_area.add_widget(self.param_buttons)
-        
-        # 数据表格容器
-        table_container = BoxLayout(size_hint_y=0.4)
-        self.table_scroll = ScrollView()
-        self.table_layout = GridLayout(cols=7, size_hint_y=None, spacing=5)
-        self.table_layout.bind(minimum_height=self.table_layout.setter('height'))
-        self.table_scroll.add_widget(self.table_layout)
-        table_container.add_widget(self.table_scroll)
-        display_area.add_widget(table_container)
-        
-        # 曲线图容器
-        graph_container = BoxLayout(size_hint_y=0.47)
-        self.graph = CustomGraph()
-        graph_container.add_widget(self.graph)
-        display_area.add_widget(graph_container)
-        
-        main_layout.add_widget(nav_bar)
-        main_layout.add_widget(query_panel)
-        main_layout.add_widget(display_area)
+        # 每口井一个曲线图, 上下排列
+        self.graphs_box = BoxLayout(orientation='vertical', spacing=5, size_hint_y=0.7)
+        main_layout.add_widget(self.graphs_box)
         self.add_widget(main_layout)
         
-        # 加载井号列表
-        Clock.schedule_once(self.load_wells)
+        self.executor = RequestExecutor(max_workers=COMPARE_MAX_IN_FLIGHT)
+        self.axis = None
+        self.panels = {}   # 井号 -> (标签, 曲线图)
+        self.datasets = {}
+        self.pending = set()
+        
+        app = App.get_running_app()
+        app.bind(well_options=self.update_well_buttons)
+        self.update_well_buttons()
+        if not app.well_options:
+            app.load_wells()
     
-    def load_wells(self, dt):
-        try:
-            response = requests.get(f"{SERVER_URL}/api/wells", timeout=5)
-            if response.status_code == 200:
-                wells = response.json()
-                well_options = [f"{w['ID']}-{w['WELL']}" for w in wells]
-                self.well_spinner.values = well_options
-                if well_options:
-                    self.well_spinner.text = well_options[0]
-            else:
-                self.well_spinner.text = "加载失败"
-        except requests.exceptions.ConnectionError:
-            self.well_spinner.text = "无法连接服务器"
-        except Exception as e:
-            self.well_spinner.text = f"错误: {str(e)}"
+    def update_well_buttons(self, *args):
+        selected = self.selected_wells()
+        self.well_grid.clear_widgets()
+        self.well_buttons = {}
+        for option in App.get_running_app().well_options:
+            btn = ToggleButton(text=option, state='down' if option in selected else 'normal')
+            btn.bind(on_press=self.on_well_toggled)
+            self.well_grid.add_widget(btn)
+            self.well_buttons[option] = btn
+    
+    def selected_wells(self):
+        return [option for option, btn in self.well_buttons.items() if btn.state == 'down']
+    
+    def on_well_toggled(self, btn):
+        if btn.state == 'down' and len(self.selected_wells()) > COMPARE_MAX_WELLS:
+            btn.state = 'normal'
+            print(f"最多同时对比{COMPARE_MAX_WELLS}口井")
     
     def query_data(self, instance):
-        selected_well = self.well_spinner.text
-        if not selected_well or selected_well == "加载中...":
-            return
-            
-        try:
-            well_id = selected_well.split('-')[0]
-        except:
+        wells = self.selected_wells()
+        if not wells:
             return
-            
-        # 计算时间范围
-        now = datetime.now()
-        if self.time_mode.text == '当前时间前':
-            hours = int(self.hours_spinner.text)
-            minutes = int(self.minutes_spinner.text)
-            start_time = now - timedelta(hours=hours, minutes=minutes)
-            end_time = now
-        else:
-            # 简化处理 - 在实际应用中应添加日期时间选择器
-            start_time = now - timedelta(hours=1)
-            end_time = now
         
+        # 所有井使用同一个时间窗口, 时间轴只计算一次
+        now = datetime.now()
+        start_time = now - timedelta(hours=int(self.hours_spinner.text))
         data = {
-            'well_id': well_id,
             'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S'),
-            'end_time': end_time.strftime('%Y-%m-%d %H:%M:%S')
+            'end_time': now.strftime('%Y-%m-%d %H:%M:%S')
         }
+        self.axis = TimeAxis(datetime.fromisoformat(data['start_time']).timestamp(),
+                             datetime.fromisoformat(data['end_time']).timestamp())
+        for well_id in list(self.panels):
+            self.executor.cancel(f"well:{well_id}")
+        self.build_panels(wells)
         
-        try:
-            response = requests.post(f"{SERVER_URL}/api/drilling_data", json=data, timeout=10)
-            if response.status_code == 200:
-                result = response.json()
-                if result['status'] == 'success':
-                    self.data = result
-                    self.display_data()
-                else:
-                    print(f"查询失败: {result.get('message')}")
-            else:
-                print(f"服务器错误: {response.status_code}")
-        except requests.exceptions.ConnectionError:
-            print("无法连接到服务器")
-        except Exception as e:
-            print(f"查询错误: {str(e)}")
-    
-    def display_data(self):
-        # 更新井号标签
-        self.well_label.text = f"井号: {self.data['well_name']}"
-        
-        # 清空表格
-        self.table_layout.clear_widgets()
-        
-        # 添加表头
-        headers = ["序号", "指重", "泵压", "扭矩", "排量", "转速", "时间"]
-        for header in headers:
-            header_label = Label(
-                text=header, 
-                bold=True,
-                color=(0, 0, 0, 1),
-                size_hint_y=None,
-                height=40
+        app = App.get_running_app()
+        self.pending = set(self.panels)
+        for well_id in self.panels:
+            well_data = dict(data, well_id=well_id)
+            
+            def fetch(well_data=well_data):
+                meta, dataset = fetch_drilling_data(app.api, well_data)
+                if meta.get('status') != 'success':
+                    raise RuntimeError(meta.get('message', '查询失败'))
+                return dataset
+            
+            # 查询排队等待线程池中的空闲线程, 同时进行的不超过 COMPARE_MAX_IN_FLIGHT 个
+            self.executor.submit(
+                f"well:{well_id}", fetch,
+                on_success=lambda dataset, well_id=well_id: self.on_well_data(well_id, dataset),
+                on_error=lambda error, well_id=well_id: self.on_well_error(well_id, error)
             )
-            self.table_layout.add_widget(header_label)
-        
-        # 添加数据行
-        for row in self.data['data']:
-            for key in ['index', 'A01', 'A02', 'A03', 'A04', 'A05', 'DT']:
-                value = row[key]
-                # 时间只显示时分秒
-                if key == 'DT' and len(value) > 10:
-                    value = value[11:19]
-                
-                data_label = Label(
-                    text=str(value), 
-                    size_hint_y=None,
-                    height=30
-                )
-                self.table_layout.add_widget(data_label)
-        
-        # 更新曲线
-        self.select_parameter(self.current_param)
+        self.update_progress()
     
-    def select_parameter(self, param_code):
-        if not hasattr(self, 'data') or not self.data or not self.data.get('data'):
+    def build_panels(self, wells):
+        self.graphs_box.clear_widgets()
+        self.panels = {}
+        self.datasets = {}
+        for option in wells:
+            well_id = option.split('-')[0]
+            panel = BoxLayout(orientation='vertical')
+            label = Label(text=f"{option}: 加载中...", size_hint_y=0.15, font_size=14, bold=True)
+            graph = CustomGraph()
+            graph.time_range = [self.axis.start_time, self.axis.end_time]
+            graph.bind(view_start=self.sync_view, view_end=self.sync_view)
+            panel.add_widget(label)
+            panel.add_widget(graph)
+            self.graphs_box.add_widget(panel)
+            self.panels[well_id] = (label, graph)
+    
+    def sync_view(self, graph, value):
+        # 缩放/平移一个曲线图时其他曲线图跟随 (数值相同时不会再次触发)
+        for _, other in self.panels.values():
+            if other is not graph:
+                other.view_start = graph.view_start
+                other.view_end = graph.view_end
+    
+    @profiled('compare.on_well_data', 'ui')
+    def on_well_data(self, well_id, dataset):
+        self.pending.discard(well_id)
+        if well_id not in self.panels:
             return
-            
-        self.current_param = param_code
-        
-        # 设置曲线颜色
-        param_colors = {
-            'A01': (0, 1, 0, 1),    # green
-            'A02': (0.5, 0, 0.5, 1), # purple
-            'A03': (1, 0, 0, 1),     # red
-            'A04': (1, 1, 0, 1),     # yellow
-            'A05': (0, 0, 0, 1)      # black
-        }
-        self.graph.set_line_color(param_colors.get(param_code, (1, 0, 0, 1)))
-        
-        # 准备曲线数据
-        points = []
-        timestamps = [datetime.strptime(row['DT'], '%Y-%m-%d %H:%M:%S') for row in self.data['data']]
-        
-        if timestamps:
-            min_time = min(timestamps)
-            max_time = max(timestamps)
-            time_range = (max_time - min_time).total_seconds()
-            
-            for i, row in enumerate(self.data['data']):
-                time_val = datetime.strptime(row['DT'], '%Y-%m-%d %H:%M:%S')
-                x = ((time_val - min_time).total_seconds() / time_range) * 100 if time_range > 0 else i
-                y = row[param_code]
-                points.append((x, y))
-        
-        # 设置Y轴范围（留10%的余量）
-        min_val = min(y for x, y in points) if points else 0
-        max_val = max(y for x, y in points) if points else 100
+        self.datasets[well_id] = dataset
+        label, graph = self.panels[well_id]
+        label.text = f"{dataset.well_name or well_id}: {len(dataset)} 条"
+        graph.set_x_values(self.axis.positions(dataset.timestamps))
+        self.show_parameter(well_id)
+        self.update_progress()
+    
+    def on_well_error(self, well_id, error):
+        self.pending.discard(well_id)
+        if well_id in self.panels:
+            message = "无法连接到服务器" if is_connection_error(error) else str(error)
+            self.panels[well_id][0].text = f"{well_id}: {message}"
+        self.update_progress()
+    
+    def update_progress(self):
+        if self.pending:
+            self.query_btn.text = f"查询中 ({len(self.panels) - len(self.pending)}/{len(self.panels)})..."
+        else:
+            self.query_btn.text = "对比"
+    
+    def selected_param(self):
+        return next(code for code in PARAM_CODES if PARAM_NAMES[code] == self.param_spinner.text)
+    
+    def show_parameter(self, well_id):
+        code = self.selected_param()
+        dataset = self.datasets[well_id]
+        graph = self.panels[well_id][1]
+        min_val = dataset.min_values[code]
+        max_val = dataset.max_values[code]
         padding = (max_val - min_val) * 0.1
-        
-        self.graph.min_value = max(0, min_val - padding)
-        self.graph.max_value = max_val + padding
-        self.graph.points = points
+        graph.set_series('value', dataset.columns[code], max(0, min_val - padding),
+                         max_val + padding, PARAM_COLORS[code])
+        graph.min_value = max(0, min_val - padding)
+        graph.max_value = max_val + padding
+    
+    def on_param_changed(self, spinner, text):
+        for well_id in self.datasets:
+            self.show_parameter(well_id)
     
     def back_to_main(self, instance):
         self.manager.current = 'main'
 
+    def shutdown(self):
+        self.executor.shutdown()
+
+
+class DebugOverlay(BoxLayout):
+    # 性能调试浮层: 显示最近的帧间隔和各环节耗时, 可把记录导出为 trace 文件
+    def __init__(self, profiler, **kwargs):
+        super().__init__(
+            orientation='vertical',
+            size_hint=(None, None),
+            size=(380, 300),
+            padding=5,
+            **kwargs
+        )
+        self.profiler = profiler
+        self.message = ''
+        with self.canvas.before:
+            Color(0, 0, 0, 0.6)
+            self.bg = Rectangle(pos=self.pos, size=self.size)
+        self.bind(pos=self.update_bg, size=self.update_bg)
+        
+        self.info_label = Label(font_size=11, halign='left', valign='top', color=(1, 1, 1, 1))
+        self.info_label.bind(size=self.info_label.setter('text_size'))
+        self.dump_btn = Button(
+            text="导出trace",
+            size_hint_y=None,
+            height=30,
+            on_press=self.dump_trace
+        )
+        self.add_widget(self.info_label)
+        self.add_widget(self.dump_btn)
+        Clock.schedule_interval(self.refresh, 0.5)
+    
+    def update_bg(self, *args):
+        self.bg.pos = self.pos
+        self.bg.size = self.size
+    
+    def refresh(self, dt):
+        frames = self.profiler.frame_stats()
+        lines = [f"{frames['fps']:.1f} fps  平均 {frames['avg_ms']:.1f}ms  "
+                 f"最长 {frames['max_ms']:.1f}ms  丢帧 {frames['dropped']}"]
+        # 最近5秒内总耗时最多的环节
+        for name, (count, total, longest) in self.profiler.span_summary()[:6]:
+            lines.append(f"{name}: {count}次 共{total * 1000:.1f}ms 最长{longest * 1000:.1f}ms")
+        # 刷新任务的当前间隔和下次运行时间
+        schedule = App.get_running_app().scheduler.describe()
+        rtt = f"{schedule['rtt'] * 1000:.0f}ms" if schedule['rtt'] is not None else '--'
+        battery = f"{schedule['battery'][0]:.0f}%" if schedule['battery'] is not None else '--'
+        lines.append(f"刷新: RTT {rtt} 电量 {battery}{' (后台暂停)' if schedule['paused'] else ''}")
+        for job in schedule['jobs']:
+            state = f"{job['next_in']:.1f}s后" if job['active'] else '暂停'
+            lines.append(f"  {job['name']}: 每{job['interval']:.1f}s 失败{job['failures']} {state}")
+        if self.message:
+            lines.append(self.message)
+        self.info_label.text = '\n'.join(lines)
+    
+    def dump_trace(self, instance):
+        # 导出到应用数据目录, 可用 chrome://tracing 或 Perfetto 打开
+        app = App.get_running_app()
+        path = os.path.join(app.user_data_dir, f"trace-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+        try:
+            self.profiler.dump(path)
+            self.message = f"已导出: {path}"
+        except OSError as e:
+            self.message = f"导出失败: {str(e)}"
+
+
+def read_battery():
+    # 电量 (百分比, 是否在充电); 桌面环境、未安装 plyer 或读取失败时返回 None
+    try:
+        from plyer import battery
+        status = battery.status
+    except Exception:
+        return None
+    if not status or status.get('percentage') is None:
+        return None
+    return status['percentage'], bool(status.get('isCharging'))
+
+
+class RefreshJob:
+    def __init__(self, name, callback, interval, screen=None):
+        self.name = name
+        self.callback = callback
+        self.interval = interval  # 基本间隔 (秒)
+        self.screen = screen      # 只在该界面显示时运行, None 表示始终运行
+        self.failures = 0         # 连续失败次数
+        self.runs = 0
+        self.last_run = None
+        self.next_run = 0
+
+
+class RefreshScheduler:
+    # 统一调度所有周期刷新任务, 只用一个 Clock 事件在最早到期的任务时触发
+    # 任务所属界面不在前台或应用进入后台时暂停, 恢复后已到期的任务立即运行
+    # 任务的请求完成后调用 report() 报告结果和耗时, 用于出错退避和按往返时间延长间隔
+    def __init__(self, manager):
+        self.manager = manager
+        self.jobs = {}
+        self.paused = False
+        self.rtt = None      # 平滑的往返时间 (秒)
+        self.battery = None  # (电量百分比, 是否在充电), 未知时为 None
+        self.event = None
+        manager.bind(current=self.reschedule)
+
+    def add(self, name, callback, interval, screen=None, delay=0):
+        job = RefreshJob(name, callback, interval, screen)
+        job.next_run = time.monotonic() + delay
+        self.jobs[name] = job
+        self.reschedule()
+        return job
+
+    def remove(self, name):
+        self.jobs.pop(name, None)
+        self.reschedule()
+
+    def is_active(self, job):
+        return not self.paused and (job.screen is None or self.manager.current == job.screen)
+
+    def interval(self, job):
+        interval = job.interval
+        if job.failures:
+            interval = min(interval * 2 ** job.failures, max(job.interval, REFRESH_MAX_INTERVAL))
+        if self.rtt is not None:
+            interval = max(interval, self.rtt * REFRESH_RTT_MULTIPLE)
+        if self.battery is not None and self.battery[0] < REFRESH_LOW_BATTERY and not self.battery[1]:
+            interval *= REFRESH_LOW_BATTERY_FACTOR
+        return interval
+
+    def report(self, name, ok=True, elapsed=None):
+        # 成功时恢复基本间隔, 失败 (包括超时) 时退避; 下次运行时间从本次开始时刻重新计算
+        if ok and elapsed is not None:
+            self.rtt = elapsed if self.rtt is None else self.rtt + REFRESH_RTT_SMOOTHING * (elapsed - self.rtt)
+        job = self.jobs.get(name)
+        if job is None:
+            return
+        job.failures = 0 if ok else job.failures + 1
+        if job.last_run is not None:
+            job.next_run = job.last_run + self.interval(job)
+        self.reschedule()
+
+    def pause(self):
+        self.paused = True
+        self.reschedule()
+
+    def resume(self):
+        self.paused = False
+        self.reschedule()
+
+    def reschedule(self, *args):
+        if self.event is not None:
+            self.event.cancel()
+            self.event = None
+        due = [job.next_run for job in self.jobs.values() if self.is_active(job)]
+        if due:
+            self.event = Clock.schedule_once(self.tick, max(0, min(due) - time.monotonic()))
+
+    def tick(self, dt):
+        self.event = None
+        now = time.monotonic()
+        for job in list(self.jobs.values()):
+            # Clock 可能提前几毫秒触发
+            if self.is_active(job) and job.next_run <= now + 0.01:
+                job.last_run = now
+                job.next_run = now + self.interval(job)
+                job.runs += 1
+                job.callback()
+        self.reschedule()
+
+    def describe(self):
+        # 当前的调度情况, 用于调试
+        now = time.monotonic()
+        return {
+            'paused': self.paused,
+            'rtt': self.rtt,
+            'battery': self.battery,
+            'jobs': [{
+                'name': job.name,
+                'screen': job.screen,
+                'active': self.is_active(job),
+                'interval': self.interval(job),
+                'base_interval': job.interval,
+                'failures': job.failures,
+                'runs': job.runs,
+                'next_in': max(0.0, job.next_run - now),
+            } for job in self.jobs.values()],
+        }
+
+
+class LazyScreenManager(ScreenManager):
+    # 除登录界面外, 各界面先登记构建函数, 第一次切换到该界面 (或 get_screen) 时才构建
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.factories = {}
+
+    def register(self, name, factory):
+        self.factories[name] = factory
+
+    def has_screen(self, name):
+        return name in self.factories or super().has_screen(name)
+
+    def get_screen(self, name):
+        factory = self.factories.pop(name, None)
+        if factory is not None:
+            with PROFILER.span(f"screen.build.{name}", 'ui'):
+                self.add_widget(factory(name=name))
+        return super().get_screen(name)
+
+
 class DrillingApp(App):
+    # 井号列表由各界面共享
+    well_options = ListProperty([])
+    wells_status = StringProperty('加载中...')
+    # 当前报警的摘要, 无报警时为空
+    alarm_status = StringProperty('')
+
     def build(self):
-        self.sm = ScreenManager()
-        self.sm.add_widget(LoginScreen(name='login'))
-        self.sm.add_widget(RegisterScreen(name='register'))
-        self.sm.add_widget(MainScreen(name='main'))
-        self.sm.add_widget(HistoryScreen(name='history'))
-        return self.sm
+        build_start = time.perf_counter()
+        self.startup_times = {'imports': build_start - STARTUP_TIME}
+        self.executor = RequestExecutor(max_workers=2)
+        # 报警监测的轮询使用单独的线程, 不占用界面请求的线程
+        self.monitor_executor = RequestExecutor(max_workers=1)
+        # 连接池: 后台请求线程、多井对比的并发查询、导出、实时推送、报警监测的轮询和长连接各自需要一个连接
+        self.api = ApiClient(SERVER_URL, pool_size=2 + COMPARE_MAX_IN_FLIGHT + 2 + 1 + ALARM_MAX_WELLS)
+        self.history_store = None
+        self.store_lock = threading.Lock()
+        self.tiles = TileCache()
+        self.alarms = AlarmEngine(load_alarm_rules(os.path.join(self.user_data_dir, 'alarms.json')),
+                                  on_change=self.update_alarm_status)
+        # 报警监测: 正在监测的井号, well_id -> 推送通道 (服务器不支持推送时为 None, 改为轮询),
+        # 以及各井已处理的最大 index; 实时数据界面正在显示的井使用界面收到的数据, 不单独连接
+        self.monitored = set()
+        self.monitors = {}
+        self.monitor_index = {}
+        self.realtime_well = None
+        self.sm = LazyScreenManager()
+        self.sm.register('login', LoginScreen)
+        self.sm.register('register', RegisterScreen)
+        self.sm.register('main', MainScreen)
+        self.sm.register('history', HistoryScreen)
+        self.sm.register('realtime', RealtimeScreen)
+        self.sm.register('compare', CompareScreen)
+        # 周期刷新: 井号列表和登录状态在恢复快照或登录时已验证过, 一个间隔后再开始
+        self.scheduler = RefreshScheduler(self.sm)
+        self.scheduler.add('wells', self.load_wells, WELLS_REFRESH_INTERVAL, delay=WELLS_REFRESH_INTERVAL)
+        self.scheduler.add('session', self.refresh_session, SESSION_REFRESH_INTERVAL,
+                           delay=SESSION_REFRESH_INTERVAL)
+        
+        # 从本地快照恢复: 井号列表直接填入下拉框, 登录未过期时跳过登录界面
+        self.session_cache = SessionCache(os.path.join(self.user_data_dir, 'session.json'))
+        snapshot = self.session_cache.load()
+        wells = snapshot.get('wells')
+        self.wells_etag = None
+        if wells:
+            self.set_wells(wells['data'])
+            self.wells_etag = wells.get('etag')
+        user = snapshot.get('user')
+        self.restored = bool(user) and time.time() - user['saved_at'] < SESSION_MAX_AGE
+        if self.restored:
+            self.user_data = user['data']
+            self.phone = user.get('phone')
+        # 用户选择监测报警的井号
+        alarm_wells = snapshot.get('alarm_wells')
+        self.alarm_wells = list(alarm_wells['data']) if alarm_wells else []
+        self.sm.current = 'main' if self.restored else 'login'
+        self.bind(well_options=self.update_monitors)
+        Window.bind(on_flip=self.on_first_frame)
+        
+        root = self.sm
+        if PROFILER.enabled:
+            # 启用性能记录时在界面右上角叠加调试浮层
+            PROFILER.start_frame_timer()
+            root = FloatLayout()
+            root.add_widget(self.sm)
+            root.add_widget(DebugOverlay(PROFILER, pos_hint={'right': 1, 'top': 1}))
+        self.startup_times['build'] = time.perf_counter() - build_start
+        return root
+
+    def on_first_frame(self, *args):
+        # 第一个界面显示到屏幕上: 记录冷启动各阶段耗时, 然后在后台验证本地快照或预先导入网络库
+        Window.unbind(on_flip=self.on_first_frame)
+        now = time.perf_counter()
+        self.startup_times['first_frame'] = now - STARTUP_TIME
+        if PROFILER.enabled:
+            PROFILER.record('startup.first_frame', 'app', STARTUP_TIME, now)
+        print("启动耗时: 导入 {imports:.3f}s, 构建 {build:.3f}s, 首帧 {first_frame:.3f}s".format(
+            **self.startup_times))
+        if self.restored:
+            self.revalidate_user()
+            self.load_wells()
+        else:
+            self.executor.submit('warmup', self.api.ensure_session)
+        # 电量检查需要导入 plyer, 放在首帧之后
+        self.scheduler.add('battery', self.check_battery, BATTERY_CHECK_INTERVAL)
+        # 报警监测的推送连接也在首帧之后再建立
+        self.update_monitors()
+    
+    def on_pause(self):
+        # 进入后台: 暂停所有刷新并断开实时推送; 回到前台后从最后一条数据继续获取, 不会缺少数据
+        self.scheduler.pause()
+        self.stop_monitors()
+        if 'realtime' in self.sm.screen_names:
+            self.sm.get_screen('realtime').stop_stream()
+        return True
+    
+    def on_resume(self):
+        self.scheduler.resume()
+        self.update_monitors()
+    
+    def check_battery(self):
+        self.scheduler.battery = read_battery()
+
+    def login(self, user_data, phone):
+        # 登录时输入的手机号与用户信息一起保存, 用于之后重新验证 (服务器返回的用户信息中不一定有手机号)
+        self.user_data = user_data
+        self.phone = phone
+        self.session_cache.save('user', user_data, phone=phone)
+        self.update_monitors()
+
+    def logout(self):
+        if hasattr(self, 'user_data'):
+            del self.user_data
+        self.session_cache.remove('user')
+        self.update_monitors()
+
+    def revalidate_user(self):
+        # 用保存的手机号在后台重新登录: 服务器明确拒绝时回到登录界面, 无法连接时继续使用本地快照
+        phone = self.phone
+        if not phone:
+            return  # 旧版快照没有保存手机号, 无法验证, 继续使用快照
+
+        def on_response(response):
+            self.scheduler.report('session', response.status_code < 500, response.elapsed.total_seconds())
+            if not hasattr(self, 'user_data'):
+                return  # 验证期间已退出登录
+            if response.status_code == 200:
+                self.login(response.json(), phone)
+                if self.sm.current == 'main':
+                    self.sm.get_screen('main').show_user()
+            elif 400 <= response.status_code < 500:
+                self.logout()
+                self.sm.current = 'login'
+
+        self.executor.submit(
+            'login',
+            lambda: self.api.post('/api/login', json={'phone': phone}),
+            on_success=on_response,
+            on_error=self.on_session_error,
+            signature=phone
+        )
+
+    def on_session_error(self, error):
+        self.scheduler.report('session', False)
+        print(f"登录状态验证失败: {str(error)}")
+
+    def refresh_session(self):
+        # 登录期间定期验证账号是否仍然有效
+        if hasattr(self, 'user_data'):
+            self.revalidate_user()
+
+    @property
+    def store(self):
+        # 本地历史数据存储在第一次查询时才打开 (可能在后台线程中)
+        with self.store_lock:
+            if self.history_store is None:
+                self.history_store = HistoryStore(os.path.join(self.user_data_dir, 'history.db'))
+            return self.history_store
+
+    def load_wells(self, *args):
+        # 带上次的 ETag 请求, 列表未变化时服务器只返回 304
+        if not self.well_options:
+            self.wells_status = '加载中...'
+        etag = self.wells_etag
+
+        def fetch():
+            # 返回 ((井号列表, ETag) 或 None, 请求耗时); 列表未变化时为 None
+            start = time.perf_counter()
+            headers = {'If-None-Match': etag} if etag else {}
+            response = self.api.get('/api/wells', headers=headers)
+            elapsed = time.perf_counter() - start
+            if response.status_code == 304:
+                return (None, etag), elapsed
+            if response.status_code != 200:
+                return None, elapsed
+            return (response.json(), response.headers.get('ETag')), elapsed
+
+        self.executor.submit(
+            'wells', fetch,
+            on_success=self.on_wells_loaded,
+            on_error=self.on_wells_error,
+            signature='wells'
+        )
+
+    def set_wells(self, wells):
+        self.well_options = [f"{w['ID']}-{w['WELL']}" for w in wells]
+        self.wells_status = ''
+
+    def on_wells_loaded(self, response):
+        result, elapsed = response
+        self.scheduler.report('wells', result is not None, elapsed)
+        if result is None:
+            if not self.well_options:
+                self.wells_status = "加载失败"
+            return
+        wells, etag = result
+        if wells is None:
+            # 未变化, 只更新快照的验证时间
+            wells = self.session_cache.load().get('wells', {}).get('data')
+            if wells is None:
+                return
+        else:
+            self.set_wells(wells)
+        self.wells_etag = etag
+        self.session_cache.save('wells', wells, etag=etag)
+
+    def on_wells_error(self, error):
+        self.scheduler.report('wells', False)
+        if self.well_options:
+            # 继续使用本地保存的列表
+            return
+        if is_connection_error(error):
+            self.wells_status = "无法连接服务器"
+        else:
+            self.wells_status = f"错误: {str(error)}"
+
+    def set_alarm_well(self, well_id, enabled):
+        # 用户选择是否在后台监测某口井的报警, 保存在本地快照中; 超过 ALARM_MAX_WELLS 时返回 False
+        if enabled and well_id not in self.alarm_wells:
+            if len(self.alarm_wells) >= ALARM_MAX_WELLS:
+                return False
+            self.alarm_wells.append(well_id)
+        elif not enabled and well_id in self.alarm_wells:
+            self.alarm_wells.remove(well_id)
+        else:
+            return True
+        self.session_cache.save('alarm_wells', self.alarm_wells)
+        self.update_monitors()
+        return True
+    
+    def set_realtime_well(self, well_id):
+        # 实时数据界面开始 (或停止, well_id 为 None) 显示某口井
+        if well_id != self.realtime_well:
+            self.realtime_well = well_id
+            self.update_monitors()
+    
+    def update_monitors(self, *args):
+        # 登录期间在后台接收用户选择的各井实时数据交给报警引擎, 与当前界面无关
+        # 实时数据界面正在显示的井由界面转交收到的数据, 不再建立第二个推送连接
+        # 推送通道从上次处理的 index 继续, 暂停期间的数据在服务器保留的范围内补发
+        wells = set()
+        if hasattr(self, 'user_data'):
+            known = {option.split('-')[0] for option in self.well_options}
+            wells = {well_id for well_id in self.alarm_wells if well_id in known}
+        for well_id in self.monitored - wells:
+            self.monitor_index.pop(well_id, None)
+            self.alarms.forget(well_id)
+        self.monitored = wells
+        paused = self.scheduler.paused
+        for well_id in [well_id for well_id in self.monitors
+                        if paused or well_id not in wells or well_id == self.realtime_well]:
+            stream = self.monitors.pop(well_id)
+            if stream is not None:
+                stream.stop()
+        if paused:
+            return
+        for well_id in self.alarm_wells:
+            if well_id in wells and well_id not in self.monitors and well_id != self.realtime_well:
+                stream = LiveStream(
+                    self.api, well_id,
+                    lambda dataset, well_id=well_id: self.on_monitor_samples(well_id, dataset),
+                    lambda state, well_id=well_id: self.on_monitor_state(well_id, state),
+                    self.monitor_index.get(well_id)
+                )
+                self.monitors[well_id] = stream
+                stream.start()
+        self.update_monitor_poll()
+    
+    def stop_monitors(self):
+        # 断开所有推送 (保留统计和报警状态), 之后 update_monitors 重新连接
+        self.monitor_executor.cancel('monitor')
+        for well_id, stream in list(self.monitors.items()):
+            if stream is not None:
+                stream.stop()
+            del self.monitors[well_id]
+        self.update_monitor_poll()
+    
+    def on_monitor_state(self, well_id, state):
+        if state == 'unsupported' and well_id in self.monitors:
+            # 旧版服务器没有推送接口, 由 poll_monitors 按间隔轮询
+            self.monitors[well_id] = None
+        self.update_monitor_poll()
+    
+    def update_monitor_poll(self):
+        # 只在有井需要轮询 (不支持推送或推送正在重连) 时登记轮询任务, 其余时间调度器不必为此唤醒
+        polled = any(stream is None or stream.state == 'reconnecting' for stream in self.monitors.values())
+        if polled and 'alarms' not in self.scheduler.jobs:
+            self.scheduler.add('alarms', self.poll_monitors, ALARM_POLL_INTERVAL)
+        elif not polled and 'alarms' in self.scheduler.jobs:
+            self.scheduler.remove('alarms')
+    
+    def on_monitor_samples(self, well_id, dataset):
+        # 只处理比已处理数据更新的样本 (轮询、推送补发和实时数据界面转交的数据可能重叠)
+        if well_id not in self.monitored:
+            return
+        last = self.monitor_index.get(well_id)
+        start = 0 if last is None else bisect_right(dataset.index, last)
+        if start < len(dataset):
+            self.monitor_index[well_id] = dataset.index[-1]
+            self.alarms.feed(well_id, dataset, start)
+    
+    def poll_monitors(self):
+        # 调度器定期运行: 查询不支持推送或推送正在重连的各井最近的数据 (支持增量查询时只返回新数据)
+        wells = [well_id for well_id, stream in self.monitors.items()
+                 if stream is None or stream.state == 'reconnecting']
+        if not wells or self.monitor_executor.is_busy('monitor'):
+            return
+        now = datetime.now()
+        queries = []
+        for well_id in wells:
+            data = {
+                'well_id': well_id,
+                'start_time': (now - timedelta(seconds=ALARM_WINDOW)).strftime('%Y-%m-%d %H:%M:%S'),
+                'end_time': now.strftime('%Y-%m-%d %H:%M:%S')
+            }
+            if well_id in self.monitor_index:
+                data['since_index'] = self.monitor_index[well_id]
+            queries.append(data)
+        
+        def fetch():
+            # 各井分别处理错误, 一口井查询失败不影响其他井
+            results = []
+            elapsed = 0
+            for data in queries:
+                start = time.perf_counter()
+                try:
+                    meta, dataset = fetch_drilling_data(self.api, data)
+                except Exception as e:
+                    print(f"报警监测查询错误 ({data['well_id']}号井): {str(e)}")
+                    continue
+                if meta.get('status') != 'success':
+                    print(f"报警监测查询失败 ({data['well_id']}号井): {meta.get('message')}")
+                    continue
+                elapsed += time.perf_counter() - start
+                results.append((data['well_id'], dataset))
+            return results, elapsed / max(1, len(results))
+        
+        self.monitor_executor.submit(
+            'monitor', fetch,
+            on_success=self.on_monitor_poll,
+            on_error=lambda error: self.scheduler.report('alarms', False)
+        )
+    
+    def on_monitor_poll(self, result):
+        # 全部失败时退避, 部分成功时按成功的查询计算往返时间
+        results, elapsed = result
+        self.scheduler.report('alarms', bool(results), elapsed if results else None)
+        for well_id, dataset in results:
+            self.on_monitor_samples(well_id, dataset)
+            stream = self.monitors.get(well_id)
+            if stream is not None:
+                # 推送重连后不必再补发轮询已取得的数据
+                stream.resume_from(self.monitor_index.get(well_id))
+    
+    def update_alarm_status(self):
+        # 最早出现的两条报警显示详情, 其余只显示数量
+        alarms = self.alarms.alarms()
+        names = dict(option.split('-', 1) for option in self.well_options)
+        texts = []
+        for alarm in alarms[:2]:
+            well = names.get(str(alarm['well_id']), f"{alarm['well_id']}号井")
+            sign = '<' if alarm['kind'] == 'low' else '>'
+            unit = '/s' if alarm['kind'] == 'rate' else ''
+            texts.append(f"{well} {PARAM_NAMES[alarm['code']]}{ALARM_KIND_NAMES[alarm['kind']]}"
+                         f" ({sign}{format_value(alarm['limit'])}{unit})")
+        if len(alarms) > 2:
+            texts.append(f"等{len(alarms)}项")
+        self.alarm_status = ', '.join(texts)
+    
+    def bind_well_spinner(self, spinner):
+        # 井号列表或加载状态变化时同步更新下拉框
+        def update(*args):
+            spinner.values = self.well_options
+            if self.wells_status:
+                spinner.text = self.wells_status
+            elif self.well_options and spinner.text not in self.well_options:
+                spinner.text = self.well_options[0]
+
+        self.bind(well_options=update, wells_status=update)
+        update()
+        if not self.well_options:
+            # 登录时的加载失败或尚未完成 (重复的请求会被合并)
+            self.load_wells()
+
+    def on_stop(self):
+        if PROFILER.enabled:
+            # 退出时保留最后一次的记录
+            PROFILER.stop_frame_timer()
+            PROFILER.dump(os.path.join(self.user_data_dir, 'trace-last.json'))
+        if 'realtime' in self.sm.screen_names:
+            self.sm.get_screen('realtime').stop_stream()
+        self.stop_monitors()
+        self.monitor_executor.shutdown()
+        if 'history' in self.sm.screen_names:
+            self.sm.get_screen('history').shutdown()
+        if 'compare' in self.sm.screen_names:
+            self.sm.get_screen('compare').shutdown()
+        self.executor.shutdown()
+        self.api.close()
+        if self.history_store is not None:
+            self.history_store.close()
 
 if __name__ == '__main__':
     DrillingApp().run()
\ No newline at end of file
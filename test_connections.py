@@ -0,0 +1,139 @@
+import os
+import tempfile
+import time
+import zlib
+from datetime import datetime
+
+import pytest
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+
+import mock_server
+from kivy.clock import Clock
+from my_phone_app_kivy import (COMPARE_MAX_IN_FLIGHT, ApiClient, DrillingApp, fetch_drilling_data,
+                               iter_raw_chunks)
+
+# 连接复用和并发上限测试 - 使用本地模拟服务器, 不需要连接树莓派
+# 运行: python -m pytest test_connections.py
+
+# 各传输格式对应的模拟服务器配置
+WIRE_FORMATS = {
+    'columns': {},
+    'ndjson': {'supports_columns': False},
+    'json': {'supports_columns': False, 'supports_stream': False},
+}
+
+
+def time_range(seconds):
+    end = datetime.now()
+    start = datetime.fromtimestamp(end.timestamp() - seconds)
+    return start.strftime('%Y-%m-%d %H:%M:%S'), end.strftime('%Y-%m-%d %H:%M:%S')
+
+
+@pytest.fixture
+def server_factory():
+    servers = []
+
+    def start(**options):
+        server = mock_server.MockServer(**options)
+        server.start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.mark.parametrize('wire_format', sorted(WIRE_FORMATS))
+def test_repeated_requests_reuse_one_connection(server_factory, wire_format):
+    # 顺序发出的请求 (包括读完流式响应之后) 都复用同一个 keep-alive 连接
+    server = server_factory(**WIRE_FORMATS[wire_format])
+    api = ApiClient(server.url)
+    start_time, end_time = time_range(600)
+    data = {'well_id': 1, 'start_time': start_time, 'end_time': end_time}
+    try:
+        for _ in range(5):
+            assert api.get('/api/wells').status_code == 200
+            meta, dataset = fetch_drilling_data(api, data)
+            assert meta['status'] == 'success'
+            assert len(dataset) > 0
+    finally:
+        api.close()
+    assert server.connection_count == 1
+
+
+class RawStream:
+    # 模拟 requests 响应的 raw 属性, 按固定大小分块返回原始字节
+    def __init__(self, body):
+        self.body = body
+
+    def stream(self, size, decode_content=False):
+        for start in range(0, len(self.body), 7):
+            yield self.body[start:start + 7]
+
+
+class RawResponse:
+    def __init__(self, body, encoding):
+        self.headers = {'Content-Encoding': encoding}
+        self.raw = RawStream(body)
+
+
+@pytest.mark.parametrize('encoding, wbits', [('gzip', 31), ('deflate', 15), ('deflate', -15)])
+def test_raw_chunks_decode_advertised_encodings(encoding, wbits):
+    # 请求头声明的 gzip/deflate 都要解压; deflate 同时接受带 zlib 头和裸流两种形式
+    body = b'{"status": "success"}\n' * 50
+    compressor = zlib.compressobj(6, zlib.DEFLATED, wbits)
+    payload = compressor.compress(body) + compressor.flush()
+    counter = [0, 0]
+    assert b''.join(iter_raw_chunks(RawResponse(payload, encoding), counter)) == body
+    assert counter == [len(payload), len(body)]
+
+
+class CompareTestApp(DrillingApp):
+    # 本地存储放在临时目录, 不影响真实的应用数据
+    def __init__(self, data_dir, **kwargs):
+        super().__init__(**kwargs)
+        self.test_data_dir = data_dir
+
+    @property
+    def user_data_dir(self):
+        return self.test_data_dir
+
+
+def pump(condition, timeout=30):
+    # 运行 Clock 直到条件满足, 后台请求的结果通过 Clock 回到界面
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+        Clock.tick()
+    return condition()
+
+
+def test_compare_fetches_respect_in_flight_limit(server_factory):
+    # 多井对比同时选择6口井: 服务器上同时处理的数据查询不超过 COMPARE_MAX_IN_FLIGHT
+    server = server_factory(stream_delay=0.05)
+    server.wells += [{'ID': i, 'WELL': f'模拟{i}井'} for i in range(len(server.wells) + 1, 7)]
+    with tempfile.TemporaryDirectory() as data_dir:
+        app = CompareTestApp(data_dir)
+        app.build()
+        app.api = ApiClient(server.url, pool_size=2 + COMPARE_MAX_IN_FLIGHT)
+        screen = app.sm.get_screen('compare')
+        try:
+            app.load_wells()
+            assert pump(lambda: len(app.well_options) == 6)
+            app.sm.current = 'compare'
+            for button in screen.well_buttons.values():
+                button.state = 'down'
+                screen.on_well_toggled(button)
+            assert len(screen.selected_wells()) == 6
+
+            screen.query_data(None)
+            assert pump(lambda: len(screen.datasets) == 6)
+        finally:
+            screen.shutdown()
+            app.executor.shutdown()
+            app.api.close()
+    assert server.max_in_flight > 1
+    assert server.max_in_flight <= COMPARE_MAX_IN_FLIGHT
@@ -0,0 +1,107 @@
+import os
+import tempfile
+from datetime import datetime
+
+import pytest
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+
+from my_phone_app_kivy import PARAM_CODES, AggregateDataset, DrillingApp, HistoryDataset
+
+# 历史数据聚合/明细拼接测试 - 不需要连接服务器
+# 运行: python -m pytest test_history.py
+
+BUCKET_SECONDS = 600
+BUCKET_COUNT = 200
+# 与桶边界对齐到整小时, 便于构造跨桶的明细窗口
+BASE_TIME = datetime(2026, 1, 1).timestamp()
+
+
+def make_overview(well_name='模拟1井'):
+    # 每桶的最小/最大/平均值取桶序号, 方便核对哪些桶被替换
+    starts = [BASE_TIME + i * BUCKET_SECONDS for i in range(BUCKET_COUNT)]
+    values = [float(i) for i in range(BUCKET_COUNT)]
+    overview = AggregateDataset.from_result({
+        'well_name': well_name,
+        'aggregate': {
+            'bucket_seconds': BUCKET_SECONDS,
+            'ts': starts,
+            'count': [BUCKET_SECONDS // 5] * BUCKET_COUNT,
+            'min': {code: values for code in PARAM_CODES},
+            'max': {code: values for code in PARAM_CODES},
+            'mean': {code: values for code in PARAM_CODES},
+        },
+    })
+    overview.start_time = starts[0]
+    overview.end_time = starts[-1] + BUCKET_SECONDS - 1
+    return overview
+
+
+def make_detail(start_time, end_time, step=5):
+    rows = []
+    ts = start_time
+    while ts <= end_time:
+        row = {'index': int(ts), 'DT': datetime.fromtimestamp(ts).isoformat(sep=' ')}
+        row.update((code, -1.0) for code in PARAM_CODES)
+        rows.append(row)
+        ts += step
+    detail = HistoryDataset.from_rows(rows)
+    detail.start_time = start_time
+    detail.end_time = end_time
+    return detail
+
+
+@pytest.mark.parametrize('offset', [0, BUCKET_SECONDS // 2, BUCKET_SECONDS - 5])
+def test_with_detail_drops_overlapping_buckets(offset):
+    # 明细窗口起点可能落在桶中间: 与窗口有重叠的桶都要去掉, 时间戳保持严格递增
+    overview = make_overview()
+    start = BASE_TIME + 10 * BUCKET_SECONDS + offset
+    end = BASE_TIME + 20 * BUCKET_SECONDS - 1
+    detail = make_detail(start, end)
+    spliced = overview.with_detail(detail)
+
+    timestamps = spliced.timestamps
+    assert all(a < b for a, b in zip(timestamps, timestamps[1:]))
+    # 剩下的每个桶都与明细窗口没有重叠
+    kept = {int(value) for value in spliced.columns['A01'] if value >= 0}
+    for i in kept:
+        bucket_start = BASE_TIME + i * BUCKET_SECONDS
+        assert bucket_start + BUCKET_SECONDS <= start or bucket_start > end
+    assert kept == set(range(10)) | set(range(20, BUCKET_COUNT))
+    assert len(spliced) == 2 * len(kept) + len(detail)
+
+
+class HistoryTestApp(DrillingApp):
+    # 本地存储放在临时目录, 不影响真实的应用数据
+    def __init__(self, data_dir, **kwargs):
+        super().__init__(**kwargs)
+        self.test_data_dir = data_dir
+
+    @property
+    def user_data_dir(self):
+        return self.test_data_dir
+
+
+def test_detail_is_requested_for_the_overview_well():
+    # 概览加载后下拉框切换到其他井再放大: 明细仍按概览所属的井请求
+    with tempfile.TemporaryDirectory() as data_dir:
+        app = HistoryTestApp(data_dir)
+        app.build()
+        screen = app.sm.get_screen('history')
+        submitted = []
+        app.executor.submit = lambda key, fn, **kwargs: submitted.append((key, kwargs.get('signature')))
+        try:
+            app.well_options = ['1-模拟1井', '2-模拟2井']
+            overview = make_overview()
+            screen.on_query_chunk({'token': object(), 'well_id': '1', 'dataset': overview,
+                                   'incremental': False})
+            screen.well_spinner.text = '2-模拟2井'
+            screen.graph.set_view(40, 45)
+            screen.check_detail()
+        finally:
+            app.executor.shutdown()
+            app.api.close()
+    details = [signature for key, signature in submitted if key == 'detail']
+    assert details
+    assert all(signature[0] == '1' for signature in details)